@@ -0,0 +1,171 @@
+"""
+Runs every parser against the recorded HTML in benchmarks/fixtures, with no
+network, and reports p50/p95 parse time, peak memory and extraction accuracy
+per parser.
+
+Usage:
+    python benchmarks/fixture_benchmark.py                     # report only
+    python benchmarks/fixture_benchmark.py --check             # exit 1 if slower than baseline.json
+    python benchmarks/fixture_benchmark.py --update-baseline   # store this run as the baseline
+
+Add fixtures with benchmarks/record_fixtures.py.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src', 'parsers'))
+
+import book
+
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+MANIFEST = os.path.join(FIXTURE_DIR, "manifest.json")
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# How much slower than the baseline a parser may get before --check fails,
+# and a floor so sub-millisecond jitter never fails a run
+TOLERANCE = 0.25
+MIN_SLOWDOWN_MS = 0.5
+
+
+def load_fixtures(manifest: str = MANIFEST) -> List[Dict]:
+    """Reads the manifest and attaches each fixture's HTML."""
+    with open(manifest) as f:
+        fixtures = json.load(f)["fixtures"]
+    for fixture in fixtures:
+        with open(os.path.join(os.path.dirname(manifest), fixture["file"]), encoding="utf-8") as f:
+            fixture["html"] = f.read()
+    return fixtures
+
+
+def extract(fixture: Dict) -> Optional[book.Book]:
+    """Runs the fixture's parser on its HTML. Returns None when the parser reports not found."""
+    parser = importlib.import_module(fixture["parser"])
+    # Parsers print progress; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            return parser.parse_html(fixture["html"], fixture["isbn"], fixture["url"])
+        except book.BookError:
+            return None
+
+
+def is_accurate(fixture: Dict, result: Optional[book.Book]) -> bool:
+    expected = fixture["expected"]
+    if expected is None or result is None:
+        return expected is None and result is None
+    return result.title == expected["title"] and abs(result.price - expected["price"]) < 0.005
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def run(fixtures: List[Dict], runs: int = 20) -> Dict[str, Dict]:
+    """
+    Benchmarks each parser over its fixtures.
+
+    Args:
+        fixtures: Output of load_fixtures
+        runs: Timed parses per fixture
+
+    Returns:
+        Dict[str, Dict]: Parser name to fixtures, p50_ms, p95_ms, peak_kb and accuracy
+    """
+    by_parser: Dict[str, List[Dict]] = {}
+    for fixture in fixtures:
+        by_parser.setdefault(fixture["parser"], []).append(fixture)
+
+    report = {}
+    for parser, cases in sorted(by_parser.items()):
+        timings, peak, correct = [], 0, 0
+        # Import outside tracemalloc so module loading is not counted as parse memory
+        importlib.import_module(parser)
+        for fixture in cases:
+            # Untimed first pass checks accuracy and measures memory
+            tracemalloc.start()
+            result = extract(fixture)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            correct += is_accurate(fixture, result)
+
+            for _ in range(runs):
+                started = time.perf_counter()
+                extract(fixture)
+                timings.append((time.perf_counter() - started) * 1000)
+
+        report[parser] = {
+            "fixtures": len(cases),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "peak_kb": round(peak / 1024, 1),
+            "accuracy": round(correct / len(cases), 3),
+        }
+    return report
+
+
+def regressions(report: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float = TOLERANCE) -> List[str]:
+    """Lists every parser that got slower or less accurate than its baseline."""
+    problems = []
+    for parser, current in report.items():
+        before = baseline.get(parser)
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            limit = max(before[metric] * (1 + tolerance), before[metric] + MIN_SLOWDOWN_MS)
+            if current[metric] > limit:
+                problems.append(f"{parser}: {metric} {current[metric]} > {limit:.3f} (baseline {before[metric]})")
+        if current["accuracy"] < before["accuracy"]:
+            problems.append(f"{parser}: accuracy {current['accuracy']} < baseline {before['accuracy']}")
+    return problems
+
+
+def print_report(report: Dict[str, Dict]):
+    print(f"{'parser':<20} {'fixtures':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak KB':>9} {'accuracy':>9}")
+    for parser, row in report.items():
+        print(f"{parser:<20} {row['fixtures']:>8} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+              f"{row['peak_kb']:>9.1f} {row['accuracy']:>9.0%}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Offline parser benchmark over recorded fixtures")
+    arg_parser.add_argument("--runs", type=int, default=20, help="timed parses per fixture")
+    arg_parser.add_argument("--check", action="store_true", help="fail when slower or less accurate than the baseline")
+    arg_parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown, e.g. 0.25 for 25%%")
+    arg_parser.add_argument("--update-baseline", action="store_true", help=f"write this run to {BASELINE}")
+    args = arg_parser.parse_args()
+
+    report = run(load_fixtures(), args.runs)
+    print_report(report)
+
+    if args.update_baseline:
+        with open(BASELINE, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE}")
+
+    if args.check:
+        if not os.path.exists(BASELINE):
+            sys.exit(f"No baseline at {BASELINE}; run with --update-baseline first")
+        with open(BASELINE) as f:
+            problems = regressions(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
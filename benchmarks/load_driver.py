@@ -0,0 +1,249 @@
+"""
+Drives REST and Socket.IO search traffic at one or more flask_server.py
+processes and reports throughput, latency percentiles and error rates for
+each worker count / concurrency combination.
+
+With --workers, the driver starts that many servers itself (on consecutive
+ports from --base-port) pointed at the mock retailers, and spreads traffic
+over them round-robin. Otherwise it targets the --target URLs as they are.
+
+Usage:
+    python benchmarks/mock_retailers.py --latency 0.3 --jitter 0.2 --error-rate 0.02 &
+    python benchmarks/load_driver.py --workers 1,2,4 --concurrency 8,32 --duration 30 \
+        --server-env BOOKMARK_PRICE_TTL=0 --server-env BOOKMARK_PRICE_STALE_TTL=0
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+import socketio
+
+from fixture_benchmark import percentile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+
+# Without websocket-client the Socket.IO client warns on every connect and falls back to polling
+logging.getLogger("engineio.client").setLevel(logging.ERROR)
+
+# Seconds to wait for one search to finish before counting it as an error
+REQUEST_TIMEOUT = 60
+
+
+def load_queries() -> Dict[str, List[str]]:
+    """ISBNs from the fixture manifest and titles from the recorded Google Books answer."""
+    with open(os.path.join(FIXTURE_DIR, "manifest.json")) as f:
+        isbns = sorted({str(fixture["isbn"]) for fixture in json.load(f)["fixtures"]})
+    with open(os.path.join(FIXTURE_DIR, "google_books_volumes.json")) as f:
+        titles = [item["volumeInfo"]["title"] for item in json.load(f)["items"]]
+    return {"isbns": isbns, "titles": titles}
+
+
+class Results:
+    """Thread-safe collection of (kind, latency seconds, outcome) samples."""
+
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, latency: float, outcome: str):
+        with self._lock:
+            self.samples.append((kind, latency, outcome))
+
+    def summary(self, elapsed: float) -> Dict[str, Dict]:
+        rows = {}
+        kinds = sorted({kind for kind, _, _ in self.samples})
+        for kind in ["all"] + kinds:
+            samples = [s for s in self.samples if kind == "all" or s[0] == kind]
+            if not samples:
+                continue
+            latencies = [latency * 1000 for _, latency, _ in samples]
+            errors = sum(1 for _, _, outcome in samples if outcome == "error")
+            rows[kind] = {
+                "requests": len(samples),
+                "throughput": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p90_ms": round(percentile(latencies, 90), 1),
+                "p95_ms": round(percentile(latencies, 95), 1),
+                "p99_ms": round(percentile(latencies, 99), 1),
+                "error_rate": round(errors / len(samples), 4),
+                "not_found": sum(1 for _, _, outcome in samples if outcome == "not_found"),
+            }
+        return rows
+
+
+def rest_search(http: requests.Session, target: str, queries: Dict[str, List[str]]) -> str:
+    if random.random() < 0.5:
+        resp = http.post(f"{target}/api/search/isbn", json={"isbn": random.choice(queries["isbns"])},
+                         timeout=REQUEST_TIMEOUT)
+    else:
+        resp = http.post(f"{target}/api/search/book", json={"book_name": random.choice(queries["titles"])},
+                         timeout=REQUEST_TIMEOUT)
+    if resp.status_code >= 500:
+        return "error"
+    return "ok" if resp.status_code == 200 else "not_found"
+
+
+class SocketUser:
+    """One connected Socket.IO client that runs a search and waits for its answer."""
+
+    def __init__(self, target: str):
+        self.client = socketio.Client(reconnection=False)
+        self._done = threading.Event()
+        self._outcome = "error"
+        self.client.on("search_results", lambda data: self._finish("ok"))
+        self.client.on("search_error", lambda data: self._finish("not_found"))
+        self.client.connect(target, wait_timeout=10)
+
+    def _finish(self, outcome: str):
+        self._outcome = outcome
+        self._done.set()
+
+    def search(self, query: str) -> str:
+        self._done.clear()
+        self._outcome = "error"
+        self.client.emit("Go_button_pushed", {"search": query})
+        if not self._done.wait(REQUEST_TIMEOUT):
+            return "error"
+        return self._outcome
+
+    def close(self):
+        self.client.disconnect()
+
+
+def run_level(targets: List[str], concurrency: int, duration: float, socket_share: float,
+              queries: Dict[str, List[str]]) -> Dict[str, Dict]:
+    """Runs `concurrency` virtual users for `duration` seconds and summarizes what they saw."""
+    results = Results()
+    stop_at = time.monotonic() + duration
+    next_target = itertools.cycle(targets)
+    target_lock = threading.Lock()
+
+    def user(index: int):
+        with target_lock:
+            target = next(next_target)
+        kind = "socket" if index < round(concurrency * socket_share) else "rest"
+        http = requests.Session()
+        sock = None
+        try:
+            if kind == "socket":
+                sock = SocketUser(target)
+            while time.monotonic() < stop_at:
+                started = time.monotonic()
+                try:
+                    if sock is not None:
+                        outcome = sock.search(random.choice(queries["isbns"] + queries["titles"]))
+                    else:
+                        outcome = rest_search(http, target, queries)
+                except Exception:
+                    outcome = "error"
+                results.add(kind, time.monotonic() - started, outcome)
+        except Exception:
+            results.add(kind, 0.0, "error")
+        finally:
+            if sock is not None:
+                sock.close()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(duration + REQUEST_TIMEOUT)
+    return results.summary(time.monotonic() - started)
+
+
+def start_servers(count: int, base_port: int, upstream: str, extra_env: List[str]) -> List[subprocess.Popen]:
+    env = dict(os.environ, BOOKMARK_DEBUG="0", BOOKMARK_UPSTREAM_BASE=upstream)
+    for entry in extra_env:
+        key, value = entry.split("=", 1)
+        env[key] = value
+    servers = []
+    for i in range(count):
+        servers.append(subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "src", "flask_server.py")],
+            cwd=ROOT, env=dict(env, BOOKMARK_PORT=str(base_port + i)),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+    for i in range(count):
+        _wait_healthy(f"http://127.0.0.1:{base_port + i}")
+    return servers
+
+
+def _wait_healthy(target: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{target}/api/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{target} did not become healthy")
+
+
+def stop_servers(servers: List[subprocess.Popen]):
+    for server in servers:
+        server.terminate()
+    for server in servers:
+        server.wait(10)
+
+
+def print_rows(workers: Optional[int], concurrency: int, rows: Dict[str, Dict]):
+    for kind, row in rows.items():
+        print(f"{workers or '-':>7} {concurrency:>11} {kind:<6} {row['requests']:>8} {row['throughput']:>9.2f} "
+              f"{row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+              f"{row['error_rate']:>7.2%} {row['not_found']:>9}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Load test flask_server.py with REST and Socket.IO searches")
+    arg_parser.add_argument("--target", default="http://127.0.0.1:3000", help="comma-separated server URLs")
+    arg_parser.add_argument("--workers", help="comma-separated server counts to start, e.g. 1,2,4")
+    arg_parser.add_argument("--base-port", type=int, default=3100)
+    arg_parser.add_argument("--upstream", default="http://127.0.0.1:9100", help="mock_retailers.py URL")
+    arg_parser.add_argument("--server-env", action="append", default=[], help="KEY=VALUE for started servers")
+    arg_parser.add_argument("--concurrency", default="8", help="comma-separated virtual user counts")
+    arg_parser.add_argument("--duration", type=float, default=20, help="seconds per level")
+    arg_parser.add_argument("--socket-share", type=float, default=0.3, help="share of users on Socket.IO")
+    arg_parser.add_argument("--json", help="also write every result row to this file")
+    args = arg_parser.parse_args()
+
+    queries = load_queries()
+    levels = [int(c) for c in args.concurrency.split(",")]
+    worker_counts = [int(w) for w in args.workers.split(",")] if args.workers else [None]
+    report = []
+
+    print(f"{'workers':>7} {'concurrency':>11} {'kind':<6} {'requests':>8} {'req/s':>9} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'not found':>9}")
+    for workers in worker_counts:
+        servers = []
+        if workers:
+            servers = start_servers(workers, args.base_port, args.upstream, args.server_env)
+            targets = [f"http://127.0.0.1:{args.base_port + i}" for i in range(workers)]
+        else:
+            targets = args.target.split(",")
+        try:
+            for concurrency in levels:
+                rows = run_level(targets, concurrency, args.duration, args.socket_share, queries)
+                print_rows(workers, concurrency, rows)
+                report.append({"workers": workers, "concurrency": concurrency, "results": rows})
+        finally:
+            stop_servers(servers)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
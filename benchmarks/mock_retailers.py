@@ -0,0 +1,139 @@
+"""
+Local stand-in for AbeBooks, TextbookX, Macmillan, VitalSource and Google
+Books, serving the recorded pages in benchmarks/fixtures with configurable
+latency and error rates.
+
+Point the app at it with BOOKMARK_UPSTREAM_BASE=http://127.0.0.1:9100, which
+makes fetch_html request http://127.0.0.1:9100/<original host>/<path>.
+
+Usage:
+    python benchmarks/mock_retailers.py --port 9100 --latency 0.3 --jitter 0.2 --error-rate 0.02 \
+        --host-latency www.abebooks.com=1.5
+"""
+import argparse
+import json
+import os
+import random
+import time
+from typing import Dict, Optional
+
+from flask import Flask, Response, request
+
+FIXTURE_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "fixtures")
+
+# Which parser's fixtures each host serves, and the query parameter holding the ISBN
+HOSTS = {
+    "www.abebooks.com": ("abebook_parser", "kn"),
+    "www.textbookx.com": ("textbookx_parser", "s"),
+    "www.macmillanlearning.com": ("macmillan_parser", "text"),
+    "www.vitalsource.com": ("vitalsource_parser", "q"),
+}
+GOOGLE_HOST = "www.googleapis.com"
+
+
+class MockConfig:
+    """Latency and failure settings; mutable so a running server can be retuned by tests."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 host_latency: Optional[Dict[str, float]] = None, host_error_rate: Optional[Dict[str, float]] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.host_latency = host_latency or {}
+        self.host_error_rate = host_error_rate or {}
+
+    def delay_for(self, host: str) -> float:
+        return max(0.0, self.host_latency.get(host, self.latency) + random.uniform(-self.jitter, self.jitter))
+
+    def fails(self, host: str) -> bool:
+        return random.random() < self.host_error_rate.get(host, self.error_rate)
+
+
+def _load_pages() -> Dict[str, Dict[str, str]]:
+    """Parser name to {isbn: html}, with the first fixture for a parser also stored under "*"."""
+    with open(os.path.join(FIXTURE_DIR, "manifest.json")) as f:
+        manifest = json.load(f)["fixtures"]
+    pages: Dict[str, Dict[str, str]] = {}
+    for fixture in manifest:
+        with open(os.path.join(FIXTURE_DIR, fixture["file"]), encoding="utf-8") as f:
+            html = f.read()
+        by_isbn = pages.setdefault(fixture["parser"], {})
+        by_isbn.setdefault(str(fixture["isbn"]), html)
+        if fixture["expected"] is not None:
+            by_isbn.setdefault("*", html)
+    return pages
+
+
+def create_app(config: Optional[MockConfig] = None) -> Flask:
+    config = config or MockConfig()
+    pages = _load_pages()
+    with open(os.path.join(FIXTURE_DIR, "google_books_volumes.json")) as f:
+        volumes = json.load(f)
+
+    app = Flask(__name__)
+    app.config["MOCK"] = config
+    counts = app.config["REQUESTS"] = {}
+
+    @app.route("/<host>/", defaults={"path": ""})
+    @app.route("/<host>/<path:path>")
+    def serve(host, path):
+        counts[host] = counts.get(host, 0) + 1
+        time.sleep(config.delay_for(host))
+        if config.fails(host):
+            return Response("Service Unavailable", status=503)
+
+        if host == GOOGLE_HOST:
+            return Response(json.dumps(_google_answer(volumes, request.args.get("q", ""))), mimetype="application/json")
+        if host not in HOSTS:
+            return Response("Unknown host", status=404)
+
+        parser, param = HOSTS[host]
+        isbn = request.args.get(param, "").replace("-", "")
+        by_isbn = pages.get(parser, {})
+        html = by_isbn.get(isbn) or by_isbn.get("*")
+        if html is None:
+            return Response("Not Found", status=404)
+        return Response(html, mimetype="text/html")
+
+    @app.route("/_stats")
+    def stats():
+        return counts
+
+    return app
+
+
+def _google_answer(volumes: Dict, query: str) -> Dict:
+    """Volumes matching an isbn: query, or every recorded volume for a title search."""
+    if not query.startswith("isbn:"):
+        return volumes
+    isbn = query[len("isbn:"):]
+    items = [item for item in volumes["items"]
+             if any(i["identifier"] == isbn for i in item["volumeInfo"].get("industryIdentifiers", []))]
+    return {"kind": volumes["kind"], "totalItems": len(items), "items": items}
+
+
+def _per_host(values):
+    result = {}
+    for entry in values or []:
+        host, value = entry.split("=", 1)
+        result[host] = float(value)
+    return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Serve recorded retailer pages for load tests")
+    arg_parser.add_argument("--port", type=int, default=9100)
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    arg_parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    arg_parser.add_argument("--host-latency", action="append", help="host=seconds, repeatable")
+    arg_parser.add_argument("--host-error-rate", action="append", help="host=rate, repeatable")
+    args = arg_parser.parse_args()
+
+    config = MockConfig(args.latency, args.jitter, args.error_rate,
+                        _per_host(args.host_latency), _per_host(args.host_error_rate))
+    create_app(config).run(host="127.0.0.1", port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Times each retailer parser on a large synthetic results page, once with the
+old full html.parser tree and once with the shared parsing layer
+(html_parsing.make_soup: lxml when installed, plus scoped parsing).
+
+Usage: python benchmarks/parse_benchmark.py [--runs 20]
+"""
+import argparse
+import os
+import sys
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'parsers')))
+
+from bs4 import BeautifulSoup
+import html_parsing
+import abebook_parser
+import macmillan_parser
+import textbookx_parser
+import vitalsource_parser
+
+ISBN = 9780134685991
+
+
+def page(body: str, title: str = "Search results") -> str:
+    """Wraps the interesting markup in the kind of bulk a real retailer page carries."""
+    cards = [
+        f'<div class="promo-card" data-slot="{i}"><a href="/p/{i}"><img src="/i/{i}.jpg" alt="Promo {i}"></a>'
+        f'<span class="promo-title">Recommended title {i}</span><span class="promo-price">${i % 90 + 9}.99</span></div>'
+        for i in range(1500)
+    ]
+    script = "<script>window.__STATE__ = {" + ",".join(f'"k{i}": {i}' for i in range(3000)) + "};</script>"
+    return (
+        f'<html><head><title>{title}</title><link rel="canonical" href="https://example.com/book">{script}</head>'
+        f'<body><nav>{"".join(cards[:500])}</nav><main>{body}</main><footer>{"".join(cards[500:])}</footer></body></html>'
+    )
+
+
+def abebooks_page() -> str:
+    listings = "".join(
+        f'<li data-test-id="listing-item"><a data-test-id="listing-title-link" href="/servlet/BookDetailsPL?bi={i}">'
+        f'<span data-test-id="listing-title">Clean Code</span></a><p data-test-id="item-price">US$ {20 + i}.50</p>'
+        f'<span data-test-id="listing-book-condition">Used - Good</span>'
+        f'<span data-test-id="item-shipping-price">+ US$ 4.25 shipping</span></li>'
+        for i in range(30)
+    )
+    return page(f"<ul>{listings}</ul>")
+
+
+def macmillan_page() -> str:
+    return page(
+        '<a class="btn-search-icbutton searchTextHide" href="/p">Clean Code</a>'
+        '<div class="priceandvaluetag"><p class="text-right"><strong>$45.99</strong></p></div>'
+    )
+
+
+def textbookx_page() -> str:
+    return page(
+        f'<div class="product-item"><h2 class="product-title"><a href="/book/{ISBN}">Clean Code</a></h2>'
+        f'<span class="price">$39.95</span><span>ISBN {ISBN}</span></div>'
+    )
+
+
+def vitalsource_page() -> str:
+    return page('<span class="price">$29.99</span>', title="Clean Code | VitalSource")
+
+
+CASES = [
+    ("abebooks", abebook_parser, lambda html: abebook_parser.parse_abebooks_prices(html), abebooks_page),
+    ("macmillan", macmillan_parser, lambda html: macmillan_parser.parse_html(html, ISBN, "u"), macmillan_page),
+    ("textbookx", textbookx_parser, lambda html: textbookx_parser.parse_html(html, ISBN, "u"), textbookx_page),
+    ("vitalsource", vitalsource_parser, lambda html: vitalsource_parser.parse_html(html, ISBN, "u"), vitalsource_page),
+]
+
+
+def full_tree(html, only=None, backend=None):
+    """What every parser did before: the whole page through html.parser."""
+    return BeautifulSoup(html, "html.parser")
+
+
+def time_parse(parse, html, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        parse(html)
+        timings.append(time.perf_counter() - started)
+    return median(timings) * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--runs", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    print(f"backend: {html_parsing.HTML_BACKEND}, median of {args.runs} runs")
+    print(f"{'parser':<12} {'page KB':>8} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, module, parse, build in CASES:
+        html = build()
+        scoped = module.make_soup
+        module.make_soup = full_tree
+        try:
+            before = time_parse(parse, html, args.runs)
+        finally:
+            module.make_soup = scoped
+        after = time_parse(parse, html, args.runs)
+        print(f"{name:<12} {len(html) / 1024:>8.0f} {before:>10.1f} {after:>10.1f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Captures live retailer pages into the fixture corpus used by
+fixture_benchmark.py, and adds them to the manifest with whatever the
+parser currently extracts as the expected result. Check the expected
+values by hand before committing new fixtures.
+
+Usage: python benchmarks/record_fixtures.py 9780134685991 [more ISBNs] [--parsers abebook_parser,...]
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+
+from fixture_benchmark import FIXTURE_DIR, MANIFEST, extract
+
+from fetch_html import fetch_html
+
+# How each parser builds its search URL
+SEARCH_URLS = {
+    "abebook_parser": lambda parser, isbn: parser.search_url(isbn, "new"),
+    "macmillan_parser": lambda parser, isbn: parser.search_macmillan(isbn),
+    "textbookx_parser": lambda parser, isbn: parser.search_textbookx(isbn),
+    "vitalsource_parser": lambda parser, isbn: parser.search_vitalsource(isbn),
+}
+
+
+def record(parser_name: str, isbn: int) -> dict:
+    parser = importlib.import_module(parser_name)
+    url = SEARCH_URLS[parser_name](parser, isbn)
+    html = fetch_html(url)
+
+    file_name = f"{parser_name.replace('_parser', '')}_{isbn}.html"
+    with open(os.path.join(FIXTURE_DIR, file_name), "w", encoding="utf-8") as f:
+        f.write(html)
+
+    fixture = {"parser": parser_name, "file": file_name, "isbn": isbn, "url": url, "html": html}
+    result = extract(fixture)
+    del fixture["html"]
+    fixture["expected"] = {"title": result.title, "price": result.price} if result else None
+    return fixture
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Record retailer pages as benchmark fixtures")
+    arg_parser.add_argument("isbns", nargs="+", type=int)
+    arg_parser.add_argument("--parsers", default=",".join(SEARCH_URLS), help="comma-separated parser modules")
+    args = arg_parser.parse_args()
+
+    with open(MANIFEST) as f:
+        manifest = json.load(f)
+    recorded = {(f["parser"], f["file"]) for f in manifest["fixtures"]}
+
+    for isbn in args.isbns:
+        for parser_name in args.parsers.split(","):
+            try:
+                fixture = record(parser_name, isbn)
+            except Exception as e:
+                print(f"{parser_name} {isbn}: {e}", file=sys.stderr)
+                continue
+            print(f"{parser_name} {isbn}: {fixture['expected']}")
+            if (fixture["parser"], fixture["file"]) not in recorded:
+                manifest["fixtures"].append(fixture)
+
+    with open(MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
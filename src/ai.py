@@ -1,18 +1,63 @@
 from google import genai
 import os
+import time
+import threading
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 import json
+import metrics
+from cache import CacheState, TTLCache
+from cache_backend import get_backend
+from title_index import normalize_query
 
 load_dotenv()
 
+MODEL = "models/gemini-2.5-flash-lite"
+# Summary of the placeholder returned when there is nothing to recommend
+NO_RECOMMENDATIONS = "No AI recommendations available."
+
+# Seconds a set of recommendations is reused for the same book and recent searches
+AI_CACHE_TTL = float(os.getenv("BOOKMARK_AI_CACHE_TTL", str(6 * 60 * 60)))
+
+
+def _encode_json(value) -> bytes:
+    return json.dumps(value).encode("utf-8")
+
+
+def _decode_json(data: bytes):
+    return json.loads(data)
+
+
+# Keyed by the normalized current book plus the normalized set of the last 5 searches
+recommendation_cache = TTLCache(max_entries=int(os.getenv("BOOKMARK_AI_CACHE_ENTRIES", "1024")),
+                                default_ttl=AI_CACHE_TTL, backend=get_backend(), namespace="ai_recommendations",
+                                encode=_encode_json, decode=_decode_json)
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+
 def get_client():
+    """Returns one Gemini client per process, rebuilt only if GEMINI_API_KEY changes."""
+    global _client, _client_key
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         return None
-    return genai.Client(api_key=api_key)
+    with _client_lock:
+        if _client is None or _client_key != api_key:
+            _client = genai.Client(api_key=api_key)
+            _client_key = api_key
+        return _client
+
 
+def _prepare(previous_searches, current_book):
+    """
+    Flattens the request into the last 5 searches and the current book title.
 
-def get_recommendations(previous_searches, current_book, num_recs=5):
+    Returns:
+        Tuple[List[str], str]: Recent searches and the current book
+    """
     if not previous_searches:
         previous_searches = []
     elif isinstance(previous_searches, str):
@@ -33,51 +78,185 @@ def get_recommendations(previous_searches, current_book, num_recs=5):
     else:
         current_book = str(current_book)
 
-    recent_searches = previous_searches[-5:]
+    return previous_searches[-5:], current_book
+
+
+def cache_key(recent_searches, current_book, num_recs=5):
+    # Order and spelling of the history do not change the answer enough to ask again
+    history = sorted({normalize_query(s) for s in recent_searches} - {""})
+    return (normalize_query(current_book), str(num_recs)) + tuple(history)
+
+
+def _prompt(recent_searches, current_book, num_recs):
     books_list = recent_searches + [current_book]
-    prompt = (
+    return (
         f"Recommend {num_recs} books based on the following books: "
         f"{', '.join(books_list)}. "
         "Provide your recommendations in JSON format like this:\n"
         '[{"title": "Book Title 1", "summary": "Short summary"}, ...]'
     )
 
-    client = get_client()
-
-    if client is None:
-        return [{"title": current_book, "summary": "No AI recommendations available."}]
 
-    try:
-        response = client.models.generate_content(
-            model="models/gemini-2.5-flash-lite",
-            contents=prompt
-        )
+class JsonArrayParser:
+    """
+    Incremental parser for a JSON array of objects arriving in pieces, as a
+    streamed model response does. feed() returns each top-level object as
+    soon as its closing brace arrives. Anything before the opening bracket,
+    such as a Markdown code fence, is skipped.
+    """
 
-        text = response.text.strip()
+    def __init__(self):
+        self._buffer = []
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
 
-        if text.startswith("```") and text.endswith("```"):
-            text = "\n".join(text.split("\n")[1:-1])
+    def feed(self, text: str) -> List[Dict]:
+        items = []
+        for ch in text:
+            if not self._started:
+                self._started = ch == "["
+                continue
+            if self._depth > 0:
+                self._buffer.append(ch)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"' and self._depth > 0:
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._buffer = [ch]
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    item = self._decode("".join(self._buffer))
+                    if item is not None:
+                        items.append(item)
+        return items
 
+    @staticmethod
+    def _decode(text: str) -> Optional[Dict]:
         try:
-            recommendations = json.loads(text)
+            item = json.loads(text)
         except json.JSONDecodeError:
-            recommendations = []
-            for line in text.split("\n"):
-                if not line.strip():
-                    continue
-                parts = line.split("Summary:")
-                if len(parts) == 2:
-                    title = parts[0].split("Title:")[-1].strip()
-                    summary = parts[1].strip()
-                    recommendations.append({"title": title, "summary": summary})
+            return None
+        return item if isinstance(item, dict) else None
+
+
+def _parse_text(text):
+    """The whole response as a list, for replies that did not stream as a clean JSON array."""
+    text = text.strip()
+
+    if text.startswith("```") and text.endswith("```"):
+        text = "\n".join(text.split("\n")[1:-1])
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        recommendations = []
+        for line in text.split("\n"):
+            if not line.strip():
+                continue
+            parts = line.split("Summary:")
+            if len(parts) == 2:
+                title = parts[0].split("Title:")[-1].strip()
+                summary = parts[1].strip()
+                recommendations.append({"title": title, "summary": summary})
+        return recommendations
+
+
+def get_recommendations(previous_searches, current_book, num_recs=5, on_item=None):
+    """
+    Book recommendations from Gemini based on the current book and recent searches.
+
+    Args:
+        previous_searches: Recent searches, as a list (possibly nested) or a single string
+        current_book: Title of the book the user is looking at
+        num_recs (int): Number of recommendations to ask for
+        on_item: Optional callback(recommendation). When given, the response is
+            streamed and each recommendation is passed on as soon as it is complete
+
+    Returns:
+        List[Dict]: Recommendations with "title" and "summary", or a single
+        placeholder when none are available
+    """
+    with metrics.timed("ai", retailer="") as timer:
+        return _get_recommendations(previous_searches, current_book, num_recs, timer, on_item)
+
+
+def _get_recommendations(previous_searches, current_book, num_recs, timer, on_item=None):
+    recent_searches, current_book = _prepare(previous_searches, current_book)
+    key = cache_key(recent_searches, current_book, num_recs)
+    cached, state = recommendation_cache.get(key)
+    if state is not CacheState.MISS:
+        timer.outcome = "cache_hit"
+        recommendations = [dict(r) for r in cached]
+        if on_item is not None:
+            for recommendation in recommendations:
+                on_item(dict(recommendation))
+        return recommendations
+
+    prompt = _prompt(recent_searches, current_book, num_recs)
+
+    client = get_client()
+
+    if client is None:
+        timer.outcome = "disabled"
+        return [{"title": current_book, "summary": NO_RECOMMENDATIONS}]
+
+    try:
+        if on_item is not None:
+            recommendations = _stream(client, prompt, on_item)
+        else:
+            response = client.models.generate_content(
+                model=MODEL,
+                contents=prompt
+            )
+            recommendations = _parse_text(response.text)
 
         if not recommendations:
-            recommendations = [{"title": current_book, "summary": "No AI recommendations available."}]
+            timer.outcome = "empty"
+            recommendations = [{"title": current_book, "summary": NO_RECOMMENDATIONS}]
+        elif isinstance(recommendations, list) and all(isinstance(r, dict) for r in recommendations):
+            recommendation_cache.set(key, [dict(r) for r in recommendations])
 
     except Exception as e:
         print(f"AI recommendation error: {e}")
-        recommendations = [{"title": current_book, "summary": "No AI recommendations available."}]
+        timer.outcome = "error"
+        recommendations = [{"title": current_book, "summary": NO_RECOMMENDATIONS}]
+
+    return recommendations
+
+
+def _stream(client, prompt, on_item):
+    """Streams the response through JsonArrayParser, handing each recommendation to on_item."""
+    started = time.perf_counter()
+    parser = JsonArrayParser()
+    recommendations = []
+    chunks = []
+    for chunk in client.models.generate_content_stream(model=MODEL, contents=prompt):
+        text = chunk.text or ""
+        chunks.append(text)
+        for recommendation in parser.feed(text):
+            if not recommendations:
+                metrics.observe("ai_first_item", time.perf_counter() - started)
+            recommendations.append(recommendation)
+            on_item(dict(recommendation))
 
+    if not recommendations:
+        # Not a JSON array after all; parse the whole reply the old way
+        recommendations = _parse_text("".join(chunks))
+        if isinstance(recommendations, list):
+            for recommendation in recommendations:
+                if isinstance(recommendation, dict):
+                    on_item(dict(recommendation))
     return recommendations
 
 
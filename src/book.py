@@ -1,3 +1,5 @@
+import json
+import struct
 from enum import Enum
 from typing import *
 
@@ -12,8 +14,27 @@ class Medium(Enum):
     EBOOK = 2
     INTERACTIVE = 3
 
+# Binary record layout: version, flags, condition, medium, price, shipping,
+# then each string field as a uint32 length and its UTF-8 bytes
+_RECORD_VERSION = 1
+# First byte of a book list; never b"[", so lists cannot be mistaken for older JSON rows
+_LIST_VERSION = 1
+_HEADER = struct.Struct("<BBBBdd")
+_LENGTH = struct.Struct("<I")
+_ISBN_IS_INT = 1
+_NO_PRICE = 2
+_NO_SHIPPING = 4
+_STRING_FIELDS = ("link", "title", "isbn", "description", "image", "retailer", "search_id")
+
 class Book:
-    def __init__(self, link: str, title: str, isbn: int, price: float, condition: Condition, medium: Medium, description: str = "No description available.", image: str = ""):
+    """
+    One listing from one retailer. Offers are Books too, so thousands of them
+    sit in the price and offers caches; __slots__ keeps each one small.
+    """
+    __slots__ = ("link", "title", "isbn", "price", "condition", "medium", "description", "image",
+                 "shipping", "retailer", "search_id")
+
+    def __init__(self, link: str, title: str, isbn: int, price: float, condition: Condition, medium: Medium, description: str = "No description available.", image: str = "", shipping: float = 0.0, retailer: str = "", search_id: str = ""):
         self.link=link
         self.title=title
         self.isbn=isbn
@@ -22,7 +43,71 @@ class Book:
         self.medium=medium
         self.description=description
         self.image=image
-    
+        self.shipping=shipping
+        self.retailer=retailer
+        # Trace of the search that found this book, if any (see tracing.py)
+        self.search_id=search_id
+
+    @property
+    def total(self) -> Optional[float]:
+        """Price including shipping, or None when the shipping cost is unknown."""
+        if self.shipping is None:
+            return None
+        return self.price + self.shipping
+
+    def to_dict(self) -> Dict:
+        return {
+            "link": self.link,
+            "title": self.title,
+            "isbn": self.isbn,
+            "price": self.price,
+            "condition": self.condition.name,
+            "medium": self.medium.name,
+            "description": self.description,
+            "image": self.image,
+            "shipping": self.shipping,
+            "total": self.total,
+            "retailer": self.retailer,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Book":
+        return cls(
+            link=data["link"],
+            title=data["title"],
+            isbn=data["isbn"],
+            price=data["price"],
+            condition=Condition[data["condition"]],
+            medium=Medium[data["medium"]],
+            description=data.get("description", "No description available."),
+            image=data.get("image", ""),
+            shipping=data.get("shipping", 0.0),
+            retailer=data.get("retailer", ""),
+            search_id=data.get("search_id", ""),
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact binary form for cache storage; every field round-trips, including search_id.
+        """
+        flags = ((_ISBN_IS_INT if isinstance(self.isbn, int) else 0) | (_NO_PRICE if self.price is None else 0)
+                 | (_NO_SHIPPING if self.shipping is None else 0))
+        parts = [_HEADER.pack(_RECORD_VERSION, flags, self.condition.value, self.medium.value,
+                              self.price or 0.0, self.shipping or 0.0)]
+        for field in _STRING_FIELDS:
+            value = getattr(self, field)
+            encoded = ("" if value is None else str(value)).encode("utf-8")
+            parts.append(_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, offset: int = 0) -> "Book":
+        return _unpack(data, offset)[0]
+
     def __lt__(self,other):
         return self.price < other.price
 
@@ -33,3 +118,37 @@ class BookError(Exception):
     def __init__(self, message="Book ERROR!"):
         self.message = message
         super().__init__(self.message)
+
+
+def _unpack(data: bytes, offset: int = 0) -> Tuple[Book, int]:
+    version, flags, condition, medium, price, shipping = _HEADER.unpack_from(data, offset)
+    if version != _RECORD_VERSION:
+        raise ValueError(f"Unknown book record version {version}")
+    offset += _HEADER.size
+    strings = []
+    for _ in _STRING_FIELDS:
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        strings.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+    link, title, isbn, description, image, retailer, search_id = strings
+    book = Book(link, title, int(isbn) if flags & _ISBN_IS_INT else isbn,
+                None if flags & _NO_PRICE else price, Condition(condition), Medium(medium),
+                description, image, None if flags & _NO_SHIPPING else shipping, retailer, search_id)
+    return book, offset
+
+def encode_books(books: Iterable[Book]) -> bytes:
+    """A list of books as one binary blob: a version byte, a uint32 count, then each book's record."""
+    records = [b.to_bytes() for b in books]
+    return bytes([_LIST_VERSION]) + _LENGTH.pack(len(records)) + b"".join(records)
+
+def decode_books(data: bytes) -> List[Book]:
+    if data[:1] != bytes([_LIST_VERSION]):
+        raise ValueError(f"Unknown book list version {data[:1]!r}")
+    (count,) = _LENGTH.unpack_from(data, 1)
+    offset = 1 + _LENGTH.size
+    books = []
+    for _ in range(count):
+        book, offset = _unpack(data, offset)
+        books.append(book)
+    return books
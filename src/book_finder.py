@@ -1,48 +1,545 @@
-import sys
 import os
+import copy
+import json
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple
 
-# Get the directory where this file is located
-_current_dir = os.path.dirname(os.path.abspath(__file__))
-PARSER_PATH = os.path.join(_current_dir, "parsers")
-parser_modules = []
-sys.path.insert(0, PARSER_PATH)
-import importlib
+import httpx
+import requests
 
+from book import Book, decode_books, encode_books
+from cache import CacheState, TTLCache, approx_size
+from cache_backend import get_backend
+from parser_registry import registry
+from resilience import CircuitBreaker, Throttled
+from singleflight import SingleFlight
+import metrics
+import tracing
 
-def import_parsers():
-    filenames = os.listdir(PARSER_PATH)
-    for f in filenames:
-        if f.endswith(".py"):
-            name = f[:-3]
-            module = importlib.import_module(name)
-            parser_modules.append(module)
+# Upper bound on how long a single search waits for the retailers, in seconds.
+# Parsers that have not answered by then are reported as timed out and dropped.
+SEARCH_DEADLINE = float(os.getenv("BOOKMARK_SEARCH_DEADLINE", "15"))
+PARSER_WORKERS = int(os.getenv("BOOKMARK_PARSER_WORKERS", "32"))
+# ISBNs resolved at once across every batch request
+BATCH_CONCURRENCY = int(os.getenv("BOOKMARK_BATCH_CONCURRENCY", "6"))
 
-def _run_parser(parser_class,isbn, book_list, condition="", medium=""):
-    out = None
+# Shared across searches so a straggling parser never blocks the caller on shutdown
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PARSER_WORKERS, thread_name_prefix="parser")
+_batch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch")
+
+# Seconds a retailer's answer stays fresh, unless the parser sets CACHE_TTL
+PRICE_TTL = float(os.getenv("BOOKMARK_PRICE_TTL", "3600"))
+# Seconds a "not found on this retailer" answer is remembered
+NEGATIVE_TTL = float(os.getenv("BOOKMARK_NEGATIVE_TTL", "600"))
+# Extra seconds an expired answer is still served while it is refreshed in the background
+PRICE_STALE_TTL = float(os.getenv("BOOKMARK_PRICE_STALE_TTL", "86400"))
+
+
+def _encode_book(out) -> bytes:
+    return out.to_bytes() if out is not None else b""
+
+def _decode_book(data: bytes):
+    if not data:
+        return None
+    if data[:1] in (b"{", b"n"):
+        # Written as JSON by an older version into a shared cache file
+        record = json.loads(data)
+        return Book.from_dict(record) if record is not None else None
+    return Book.from_bytes(data)
+
+
+price_cache = TTLCache(
+    max_entries=int(os.getenv("BOOKMARK_PRICE_CACHE_ENTRIES", "20000")),
+    max_bytes=int(os.getenv("BOOKMARK_PRICE_CACHE_BYTES", str(32 * 1024 * 1024))),
+    stale_ttl=PRICE_STALE_TTL,
+    backend=get_backend(),
+    namespace="prices",
+    encode=_encode_book,
+    decode=_decode_book,
+)
+
+def _encode_offers(offers) -> bytes:
+    return encode_books(offers)
+
+def _decode_offers(data: bytes):
+    if data[:1] == b"[":
+        # Written as JSON by an older version into a shared cache file
+        return [Book.from_dict(o) for o in json.loads(data)]
+    return decode_books(data)
+
+# Every listing a retailer shows for an ISBN, unfiltered, so filtering never re-scrapes
+offers_cache = TTLCache(
+    max_entries=int(os.getenv("BOOKMARK_OFFERS_CACHE_ENTRIES", "5000")),
+    max_bytes=int(os.getenv("BOOKMARK_OFFERS_CACHE_BYTES", str(32 * 1024 * 1024))),
+    stale_ttl=PRICE_STALE_TTL,
+    sizeof=lambda offers: sum(approx_size(o) for o in offers),
+    backend=get_backend(),
+    namespace="offers",
+    encode=_encode_offers,
+    decode=_decode_offers,
+)
+
+# Per-retailer hit/stale/miss counts, for tuning each parser's TTL
+_retailer_stats: Dict[str, Counter] = defaultdict(Counter)
+_stats_lock = threading.Lock()
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+# Identical searches that overlap share one scrape, as do overlapping lookups on one retailer
+_inflight = SingleFlight()
+_inflight_scrapes = SingleFlight()
+
+# Searches running right now on any path: blocking, streaming, async and offers
+_active_searches = 0
+_active_lock = threading.Lock()
+
+# Circuit breaker settings: consecutive failures before a retailer is skipped,
+# seconds it stays skipped, and trial requests needed before it is trusted again
+BREAKER_FAILURES = int(os.getenv("BOOKMARK_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BOOKMARK_BREAKER_COOLDOWN", "60"))
+BREAKER_PROBES = int(os.getenv("BOOKMARK_BREAKER_PROBES", "3"))
+# A retailer call slower than this counts as a failure even if it succeeds
+SLOW_CALL_THRESHOLD = float(os.getenv("BOOKMARK_SLOW_CALL_THRESHOLD", str(SEARCH_DEADLINE)))
+
+breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+class RetailerUnavailable(Exception):
+    """Raised instead of calling a parser whose circuit breaker is open."""
+
+
+# Errors that mean the retailer could not be reached, as opposed to "book not found".
+# Throttled is ours, not the retailer's: not cached, but not held against its breaker either.
+TRANSIENT_ERRORS = (requests.RequestException, httpx.HTTPError, TimeoutError, ConnectionError, RetailerUnavailable,
+                    Throttled)
+
+
+class SearchOutcome(NamedTuple):
+    books: List
+    timed_out: List[str]
+
+
+class OffersOutcome(NamedTuple):
+    by_price: List
+    by_total: List
+    timed_out: List[str]
+
+
+def _accept(out, condition="", medium=""):
+    if out is None or out.price is None or out.price == 0:
+        return False
+
+    if condition and out.condition.name.upper() != condition.upper():
+        return False
+
+    if medium and out.medium.name.upper() != medium.upper():
+        return False
+    return True
+
+def normalize_isbn(isbn) -> str:
+    """
+    Normalize an ISBN for use as a cache key: strip separators and convert ISBN-10 to ISBN-13.
+    """
+    isbn_clean = str(isbn).replace('-', '').replace(' ', '').upper()
+    if len(isbn_clean) == 10 and isbn_clean[:9].isdigit():
+        core = "978" + isbn_clean[:9]
+        total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(core))
+        return core + str((10 - total % 10) % 10)
+    return isbn_clean
+
+def _cache_key(parser, isbn, condition="", medium=""):
+    return (parser.name, normalize_isbn(isbn), (condition or "").lower(), (medium or "").lower())
+
+def _caused_by(error, kinds):
+    while error is not None:
+        if isinstance(error, kinds):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+def _is_transient(error):
+    return _caused_by(error, TRANSIENT_ERRORS)
+
+def _record(parser, outcome):
+    with _stats_lock:
+        _retailer_stats[parser.name][outcome] += 1
+
+def breaker_for(parser) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = breakers.get(parser.name)
+        if breaker is None:
+            breaker = breakers[parser.name] = CircuitBreaker(
+                parser.name, BREAKER_FAILURES, BREAKER_COOLDOWN, BREAKER_PROBES
+            )
+        return breaker
+
+def breaker_states() -> Dict:
+    """Circuit breaker state for every retailer that has been called."""
+    with _breakers_lock:
+        current = dict(breakers)
+    return {name: breaker.to_dict() for name, breaker in current.items()}
+
+def _admit(parser) -> CircuitBreaker:
+    breaker = breaker_for(parser)
+    if not breaker.allow():
+        _record(parser, "skipped")
+        raise RetailerUnavailable(f"{parser.name} is cooling down after repeated failures")
+    return breaker
+
+def _settle(breaker, started, error=None):
+    """
+    Tell the breaker how a call went: outages and very slow answers are
+    failures. A call our own rate limit turned away never reached the
+    retailer, so it counts as neither.
+    """
+    if error is not None and _caused_by(error, Throttled):
+        breaker.release()
+    elif (error is not None and _is_transient(error)) or time.monotonic() - started > SLOW_CALL_THRESHOLD:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+def _guarded(parser, call, *args, **kwargs):
+    """Run a parser call through its circuit breaker."""
+    breaker = _admit(parser)
+    started = time.monotonic()
     try:
-        out = parser_class.parse(isbn, condition=condition, medium=medium)
+        result = call(*args, **kwargs)
+    except Exception as e:
+        _settle(breaker, started, e)
+        raise
+    _settle(breaker, started)
+    return result
 
-        if out.price is None or out.price == 0:
-            return
-        
-        if condition and out.condition.name.upper() != condition.upper():
-            return
-        
-        if medium and out.medium.name.upper() != medium.upper():
-            return
-    except:
-        return
+async def _aguarded(parser, call, *args, **kwargs):
+    breaker = _admit(parser)
+    started = time.monotonic()
+    try:
+        result = await call(*args, **kwargs)
+    except Exception as e:
+        _settle(breaker, started, e)
+        raise
+    _settle(breaker, started)
+    return result
+
+def _store(parser, key, out, error, condition="", medium=""):
+    """Cache a parser's answer and return the book to use, if any."""
+    if error is not None:
+        # Outages are not cached; the next search should try the retailer again
+        if not _is_transient(error):
+            price_cache.set(key, None, ttl=NEGATIVE_TTL)
+        return None
+    if not _accept(out, condition, medium):
+        price_cache.set(key, None, ttl=NEGATIVE_TTL)
+        return None
+    out.retailer = parser.site
+    price_cache.set(key, out, ttl=parser.cache_ttl or PRICE_TTL)
+    return copy.copy(out)
+
+def _fail(call, error):
+    """Label a retailer call that raised, for metrics and the search trace."""
+    call.error = f"{type(error).__name__}: {error}"
+    if isinstance(error, RetailerUnavailable):
+        call.outcome = "skipped"
+    elif _caused_by(error, Throttled):
+        call.outcome = "throttled"
     else:
-        book_list.append(out)
+        call.outcome = "unavailable" if _is_transient(error) else "not_found"
+
+def _scrape(parser, isbn, condition="", medium=""):
+    key = _cache_key(parser, isbn, condition, medium)
+    with metrics.retailer_call(parser.site) as call:
+        try:
+            out = _guarded(parser, parser.parse, isbn, condition=condition, medium=medium)
+        except Exception as e:
+            _fail(call, e)
+            return _store(parser, key, None, e)
+        call.outcome = "found"
+    return _store(parser, key, out, None, condition, medium)
+
+async def _ascrape(parser, isbn, condition="", medium=""):
+    key = _cache_key(parser, isbn, condition, medium)
+    with metrics.retailer_call(parser.site) as call:
+        try:
+            out = await _aguarded(parser, parser.aparse, isbn, condition=condition, medium=medium)
+        except Exception as e:
+            _fail(call, e)
+            return _store(parser, key, None, e)
+        call.outcome = "found"
+    return _store(parser, key, out, None, condition, medium)
+
+def _revalidate(key, scrape, *args):
+    """Refresh a stale entry in the background, once per key at a time."""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            scrape(*args)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _executor.submit(refresh)
+
+def _cached(parser, isbn, condition="", medium=""):
+    """
+    Look up a parser's cached answer.
+
+    Returns:
+        Tuple[bool, Optional[book.Book]]: Whether the cache answered, and the cached book (None if not found)
+    """
+    value, state = price_cache.get(_cache_key(parser, isbn, condition, medium))
+    _record(parser, state.name.lower())
+    if state is CacheState.MISS:
+        return False, None
+    if state is CacheState.STALE:
+        _revalidate(_cache_key(parser, isbn, condition, medium), _scrape, parser, isbn, condition, medium)
+    return True, copy.copy(value)
+
+def _run_parser(parser, isbn, condition="", medium=""):
+    hit, out = _cached(parser, isbn, condition, medium)
+    if hit:
+        tracing.event("retailer", retailer=parser.site, cache="hit", outcome="found" if out else "not_found")
+        return out
+    # Streaming searches bypass the search-level single flight, so coalesce per retailer too
+    key = _cache_key(parser, isbn, condition, medium)
+    return copy.copy(_inflight_scrapes.do(key, _scrape, parser, isbn, condition, medium))
+
+async def _arun_parser(parser, isbn, condition="", medium=""):
+    hit, out = _cached(parser, isbn, condition, medium)
+    if hit:
+        tracing.event("retailer", retailer=parser.site, cache="hit", outcome="found" if out else "not_found")
+        return out
+    return await _ascrape(parser, isbn, condition, medium)
+
+def _scrape_offers(parser, isbn):
+    key = _cache_key(parser, isbn)
+    with metrics.retailer_call(parser.site) as call:
+        try:
+            offers = _guarded(parser, parser.parse_offers, isbn)
+        except Exception as e:
+            _fail(call, e)
+            if not _is_transient(e):
+                offers_cache.set(key, [], ttl=NEGATIVE_TTL)
+            return []
+        call.outcome = "found" if offers else "not_found"
+    offers = [o for o in offers if _accept(o)]
+    for o in offers:
+        o.retailer = parser.site
+    offers_cache.set(key, offers, ttl=(parser.cache_ttl or PRICE_TTL) if offers else NEGATIVE_TTL)
+    return [copy.copy(o) for o in offers]
+
+def _run_offers(parser, isbn):
+    key = _cache_key(parser, isbn)
+    offers, state = offers_cache.get(key)
+    _record(parser, state.name.lower())
+    if state is CacheState.MISS:
+        offers = _inflight_scrapes.do(("offers",) + key, _scrape_offers, parser, isbn)
+    elif state is CacheState.STALE:
+        _revalidate(("offers",) + key, _scrape_offers, parser, isbn)
+    return [copy.copy(o) for o in offers]
+
+@contextmanager
+def _active_search():
+    global _active_searches
+    with _active_lock:
+        _active_searches += 1
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active_searches -= 1
+
+def active_searches() -> int:
+    """How many searches are scraping or waiting on retailers right now, whichever path started them."""
+    with _active_lock:
+        return _active_searches
+
+def rank_offers(offers):
+    """
+    Returns:
+        Tuple[List[book.Book], List[book.Book]]: The offers sorted by price, and by price plus
+        shipping with offers whose shipping is unknown last
+    """
+    by_total = sorted(offers, key=lambda o: (o.total is None, o.total or 0.0, o.price))
+    return sorted(offers, key=lambda o: o.price), by_total
+
+def find_offers(isbn, deadline=SEARCH_DEADLINE) -> OffersOutcome:
+    """
+    Every listing from every enabled retailer, in any condition or medium.
+
+    Clients filter the result themselves, so changing a filter never
+    triggers another scrape.
+
+    Args:
+        isbn: ISBN to look up on every retailer
+        deadline (float): Seconds to wait for the slowest parser
+
+    Returns:
+        OffersOutcome: The offers ranked by price and by price plus shipping,
+        and the names of parsers that timed out
+    """
+    with _active_search():
+        futures = {_executor.submit(tracing.propagate(_run_offers), p, isbn): p for p in registry.enabled()}
+        done, not_done = concurrent.futures.wait(futures, timeout=deadline)
+    for f in not_done:
+        f.cancel()
+
+    offers = [o for f in done for o in f.result()]
+    timed_out = [p.name for f, p in futures.items() if f in not_done]
+    with tracing.span("rank", offers=len(offers)):
+        by_price, by_total = rank_offers(offers)
+    return OffersOutcome(by_price, by_total, timed_out)
+
+def cache_stats() -> Dict:
+    """Price cache totals plus hit/stale/miss counts per retailer."""
+    with _stats_lock:
+        retailers = {name: dict(counts) for name, counts in _retailer_stats.items()}
+    return {
+        "price_cache": price_cache.stats(),
+        "offers_cache": offers_cache.stats(),
+        "retailers": retailers,
+        "searches_in_flight": _inflight.in_flight(),
+        "searches_active": active_searches(),
+        "coalesced_searches": _inflight.coalesced,
+        "coalesced_scrapes": _inflight_scrapes.coalesced,
+    }
 
-def find_cheapest_book(isbn, condition="", medium=""):
-    import_parsers()
-    book_objects = []
-    for p in parser_modules:
-        _run_parser(p,isbn,book_objects,condition,medium)
+def search(isbn, condition="", medium="", deadline=SEARCH_DEADLINE, on_result=None) -> SearchOutcome:
+    """
+    Run every parser concurrently and collect the books that arrive before the deadline.
+
+    Args:
+        isbn: ISBN to look up on every retailer
+        condition: Optional condition filter ("new", "used", ...)
+        medium: Optional medium filter ("physical", "ebook", ...)
+        deadline (float): Seconds to wait for the slowest parser
+        on_result: Optional callback(parser, book_or_none), called on the caller's
+            thread as soon as each parser answers
+
+    Returns:
+        SearchOutcome: Books that matched, and the names of parsers that timed out
+    """
+    with _active_search():
+        futures = {
+            _executor.submit(tracing.propagate(_run_parser), p, isbn, condition, medium): p
+            for p in registry.enabled()
+        }
+        book_objects = []
+        not_done = set(futures)
+        try:
+            for f in concurrent.futures.as_completed(futures, timeout=deadline):
+                not_done.discard(f)
+                out = f.result()
+                if out is not None:
+                    book_objects.append(out)
+                if on_result is not None:
+                    on_result(futures[f], out)
+        except concurrent.futures.TimeoutError:
+            pass
+
+    # Late results are dropped; cancel() only helps parsers still queued for a worker
+    for f in not_done:
+        f.cancel()
+
+    timed_out = [p.name for f, p in futures.items() if f in not_done]
+    if timed_out:
+        logging.warning(f"Parsers timed out after {deadline}s for ISBN {isbn}: {', '.join(timed_out)}")
+        trace = tracing.current_trace()
+        if trace is not None:
+            trace.root.tags["timed_out"] = timed_out
+
+    return SearchOutcome(book_objects, timed_out)
+
+async def asearch(isbn, condition="", medium="", deadline=SEARCH_DEADLINE) -> SearchOutcome:
+    """
+    Async version of search. Parsers with an aparse() run on the event loop;
+    blocking ones are adapted onto worker threads.
+    """
+    with _active_search():
+        tasks = {
+            asyncio.ensure_future(_arun_parser(p, isbn, condition, medium)): p
+            for p in registry.enabled()
+        }
+        if not tasks:
+            return SearchOutcome([], [])
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+    for t in pending:
+        t.cancel()
+
+    book_objects = [t.result() for t in done if t.result() is not None]
+    timed_out = [tasks[t].name for t in pending]
+    if timed_out:
+        logging.warning(f"Parsers timed out after {deadline}s for ISBN {isbn}: {', '.join(timed_out)}")
+
+    return SearchOutcome(book_objects, timed_out)
+
+def find_cheapest_book(isbn, condition="", medium="", deadline=SEARCH_DEADLINE):
+    """
+    Cheapest matching book across all enabled retailers, or None.
+
+    Concurrent calls for the same (ISBN, condition, medium) wait on a single
+    scrape and each receive their own copy of its result.
+    """
+    key = (normalize_isbn(isbn), (condition or "").lower(), (medium or "").lower())
+    with metrics.timed("search", retailer="") as timer:
+        found = copy.copy(_inflight.do(key, _find_cheapest_book, isbn, condition, medium, deadline))
+        timer.outcome = "found" if found is not None else "not_found"
+    return found
+
+def _find_cheapest_book(isbn, condition="", medium="", deadline=SEARCH_DEADLINE):
+    book_objects = search(isbn, condition, medium, deadline).books
     print(book_objects)
     if book_objects == []:
         return None
-    
+
+    with tracing.span("rank", offers=len(book_objects)):
+        return min(book_objects)
+
+def find_cheapest_books(isbns, condition="", medium="", deadline=SEARCH_DEADLINE):
+    """
+    Resolve many ISBNs, yielding each one as soon as it finishes.
+
+    At most BATCH_CONCURRENCY ISBNs are searched at once across all batches;
+    fetch_html separately caps requests per retailer host. Abandoning the
+    generator cancels ISBNs that have not started yet.
+
+    Yields:
+        Tuple[str, Optional[book.Book]]: The ISBN as given and its cheapest book, or None
+    """
+    futures = {
+        _batch_executor.submit(find_cheapest_book, isbn, condition, medium, deadline): isbn
+        for isbn in isbns
+    }
+    try:
+        for f in concurrent.futures.as_completed(futures):
+            try:
+                yield futures[f], f.result()
+            except Exception as e:
+                logging.error(f"Batch search failed for ISBN {futures[f]}: {str(e)}")
+                yield futures[f], None
+    finally:
+        for f in futures:
+            f.cancel()
+
+async def afind_cheapest_book(isbn, condition="", medium="", deadline=SEARCH_DEADLINE):
+    book_objects = (await asearch(isbn, condition, medium, deadline)).books
+    if book_objects == []:
+        return None
+
     return min(book_objects)
 
+
+# Parsers are imported and validated once per process, not once per search
+registry.discover()
@@ -0,0 +1,190 @@
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class CacheState(Enum):
+    MISS = 0
+    FRESH = 1
+    STALE = 2
+
+
+def approx_size(value: Any) -> int:
+    """
+    Rough, shallow estimate of how many bytes a cached value holds.
+
+    Counts the object itself plus its attributes or items one level down,
+    which is enough to keep a cache of small records under a memory cap.
+    """
+    size = sys.getsizeof(value)
+    if hasattr(value, "__dict__"):
+        children = vars(value).values()
+    elif hasattr(value, "__slots__"):
+        children = [getattr(value, s, None) for s in value.__slots__]
+    elif isinstance(value, dict):
+        children = list(value.keys()) + list(value.values())
+    elif isinstance(value, (list, tuple, set)):
+        children = value
+    else:
+        children = ()
+    return size + sum(sys.getsizeof(c) for c in children)
+
+
+def _backend_key(key: Hashable) -> str:
+    if isinstance(key, tuple):
+        return "|".join(str(part) for part in key)
+    return str(key)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a per-entry TTL.
+
+    An entry past its TTL but still inside the stale window is returned as
+    CacheState.STALE so callers can serve it while they refresh it in the
+    background. Entries are evicted least-recently-used first once either
+    max_entries or max_bytes is exceeded.
+
+    With a backend (see cache_backend.py), writes go through to shared
+    storage under the given namespace and local misses are filled from it.
+    encode/decode convert values to and from the bytes the backend stores.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None, default_ttl: float = 300,
+                 stale_ttl: float = 0, sizeof: Callable[[Any], int] = approx_size, backend=None,
+                 namespace: str = "", encode: Optional[Callable[[Any], bytes]] = None,
+                 decode: Optional[Callable[[bytes], Any]] = None):
+        self.backend = backend
+        self.namespace = namespace
+        self._encode = encode
+        self._decode = decode
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self._sizeof = sizeof
+        # Key to (value, fresh until, stale until, size); times are time.monotonic()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.backend_hits = 0
+
+    def get(self, key: Hashable) -> Tuple[Any, CacheState]:
+        """
+        Look up a key.
+
+        Returns:
+            Tuple[Any, CacheState]: The cached value (None on a miss) and whether it was fresh, stale or missing
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fresh_until, stale_until, _ = entry
+                if now < stale_until:
+                    self._entries.move_to_end(key)
+                    if now < fresh_until:
+                        self.hits += 1
+                        return value, CacheState.FRESH
+                    self.stale_hits += 1
+                    return value, CacheState.STALE
+                self._remove(key)
+
+        value, state = self._get_from_backend(key)
+        with self._lock:
+            if state is CacheState.MISS:
+                self.misses += 1
+            elif state is CacheState.FRESH:
+                self.hits += 1
+                self.backend_hits += 1
+            else:
+                self.stale_hits += 1
+                self.backend_hits += 1
+        return value, state
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.monotonic()
+        self._set_local(key, value, now + ttl, now + ttl + self.stale_ttl)
+        if self.backend is not None:
+            try:
+                self.backend.set(self.namespace, _backend_key(key), self._encode(value), ttl, self.stale_ttl)
+            except Exception as e:
+                logging.error(f"Cache backend write failed for {self.namespace}: {str(e)}")
+
+    def _set_local(self, key: Hashable, value: Any, fresh_until: float, stale_until: float):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, fresh_until, stale_until, size)
+            self._bytes += size
+            self._evict()
+
+    def _get_from_backend(self, key: Hashable) -> Tuple[Any, CacheState]:
+        if self.backend is None:
+            return None, CacheState.MISS
+        try:
+            record = self.backend.get(self.namespace, _backend_key(key))
+            if record is None:
+                return None, CacheState.MISS
+            value = self._decode(record.value)
+        except Exception as e:
+            logging.error(f"Cache backend read failed for {self.namespace}: {str(e)}")
+            return None, CacheState.MISS
+
+        # Keep the record's own deadlines, so a stale copy is not given a fresh stale window
+        offset = time.monotonic() - time.time()
+        self._set_local(key, value, record.fresh_until + offset, record.expires_at + offset)
+        return value, CacheState.FRESH if record.fresh_until > time.time() else CacheState.STALE
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+        if self.backend is not None:
+            try:
+                self.backend.delete(self.namespace, _backend_key(key))
+            except Exception as e:
+                logging.error(f"Cache backend delete failed for {self.namespace}: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "backend_hits": self.backend_hits,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key: Hashable):
+        _, _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, _, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
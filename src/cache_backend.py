@@ -0,0 +1,142 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, NamedTuple, Optional
+
+# Path of the shared SQLite cache. Unset keeps every cache in process memory only.
+CACHE_DB_ENV = "BOOKMARK_CACHE_DB"
+# Seconds between automatic sweeps of expired rows
+SWEEP_INTERVAL = float(os.getenv("BOOKMARK_CACHE_SWEEP_INTERVAL", "600"))
+
+
+class CacheRecord(NamedTuple):
+    value: bytes
+    fresh_until: float
+    # When the record stops being served at all, stale window included
+    expires_at: float
+
+
+class CacheBackend:
+    """
+    Shared storage behind the in-memory caches, so warm entries outlive the
+    process and are visible to every worker.
+
+    Keys live in a namespace (e.g. "prices", "google_search"). Values are
+    opaque bytes; callers own the encoding. Times are wall-clock seconds.
+    """
+
+    def get(self, namespace: str, key: str) -> Optional[CacheRecord]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float, stale_ttl: float = 0):
+        self.set_many(namespace, {key: value}, ttl, stale_ttl)
+
+    def set_many(self, namespace: str, items: Dict[str, bytes], ttl: float, stale_ttl: float = 0):
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """Delete every expired entry and return how many were removed."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    CacheBackend stored in a SQLite file in WAL mode, so several workers on
+    one host can read while another writes.
+    """
+
+    def __init__(self, path: str, sweep_interval: float = SWEEP_INTERVAL):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._last_sweep = time.time()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value BLOB,"
+            " fresh_until REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must stay on the thread that opened them
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[CacheRecord]:
+        row = self._connection().execute(
+            "SELECT value, fresh_until, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return CacheRecord(*row) if row else None
+
+    def set_many(self, namespace: str, items: Dict[str, bytes], ttl: float, stale_ttl: float = 0):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, fresh_until, expires_at) VALUES (?, ?, ?, ?, ?)",
+                [(namespace, key, value, now + ttl, now + ttl + stale_ttl) for key, value in items.items()],
+            )
+        if now - self._last_sweep > self.sweep_interval:
+            self.sweep()
+
+    def delete(self, namespace: str, key: str):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def sweep(self) -> int:
+        self._last_sweep = time.time()
+        conn = self._connection()
+        with conn:
+            removed = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (self._last_sweep,)).rowcount
+        if removed:
+            logging.info(f"Swept {removed} expired cache entries")
+        return removed
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> Optional[CacheBackend]:
+    """
+    Returns the process-wide backend configured by BOOKMARK_CACHE_DB, or None.
+    """
+    global _backend
+    path = os.getenv(CACHE_DB_ENV)
+    if not path:
+        return None
+    with _backend_lock:
+        if _backend is None:
+            try:
+                _backend = SQLiteBackend(path)
+            except sqlite3.Error as e:
+                logging.error(f"Could not open cache database {path}: {str(e)}")
+                return None
+    return _backend
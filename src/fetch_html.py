@@ -1,17 +1,227 @@
+import os
+import asyncio
+import threading
+import weakref
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
 from UserAgentFaker import GetFakeUserAgent
+from resilience import Throttled, TokenBucket
+import metrics
 
-def fetch_html(url: str) -> str:
-    """Fetches the given URL and returns the HTML content as a string."""
-    headers = {
-        "User-Agent": GetFakeUserAgent(),
+# (connect, read) timeout in seconds for hosts without their own entry
+DEFAULT_TIMEOUT = (5.0, 15.0)
+
+# Per-host overrides. Extend at runtime with
+# BOOKMARK_HOST_TIMEOUTS="www.textbookx.com=8,www.abebooks.com=5:12"
+HOST_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "www.abebooks.com": (5.0, 12.0),
+    "www.textbookx.com": (5.0, 10.0),
+    "www.macmillanlearning.com": (5.0, 10.0),
+    "www.vitalsource.com": (5.0, 10.0),
+}
+
+# Connections kept alive per host, and how many hosts keep a pool
+POOL_MAXSIZE = int(os.getenv("BOOKMARK_POOL_MAXSIZE", "20"))
+POOL_CONNECTIONS = 10
+
+# Lists gzip/deflate, plus br/zstd when urllib3 can decode them
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+# Most simultaneous requests sent to any one host: across all blocking searches,
+# and separately within each event loop for async ones
+HOST_CONCURRENCY = int(os.getenv("BOOKMARK_HOST_CONCURRENCY", "8"))
+
+# Requests per second allowed to each host, with bursts of up to HOST_BURST.
+# Override per host with BOOKMARK_HOST_RATES="www.abebooks.com=2,www.textbookx.com=1"
+HOST_RATE = float(os.getenv("BOOKMARK_HOST_RATE", "5"))
+HOST_BURST = float(os.getenv("BOOKMARK_HOST_BURST", "10"))
+HOST_RATES: Dict[str, float] = {}
+
+# Send every request to this server instead, as {base}/{original host}{path}.
+# Used by the load-test kit to point the app at local retailer stand-ins.
+UPSTREAM_BASE = os.getenv("BOOKMARK_UPSTREAM_BASE", "")
+
+# Upper bound on simultaneous connections held by each event loop's async client
+ASYNC_MAX_CONNECTIONS = int(os.getenv("BOOKMARK_ASYNC_MAX_CONNECTIONS", "200"))
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+_host_buckets: Dict[str, TokenBucket] = {}
+
+# httpx clients are bound to the loop they were first used on, so keep one per loop
+_async_clients = weakref.WeakKeyDictionary()
+# asyncio semaphores are too, so each loop gets its own per-host slots
+_async_slots = weakref.WeakKeyDictionary()
+
+
+def _parse_timeout(value: str) -> Tuple[float, float]:
+    if ":" in value:
+        connect, read = value.split(":", 1)
+        return (float(connect), float(read))
+    return (DEFAULT_TIMEOUT[0], float(value))
+
+
+def _load_host_overrides():
+    for entry in os.getenv("BOOKMARK_HOST_TIMEOUTS", "").split(","):
+        if "=" not in entry:
+            continue
+        host, value = entry.split("=", 1)
+        HOST_TIMEOUTS[host.strip()] = _parse_timeout(value.strip())
+    for entry in os.getenv("BOOKMARK_HOST_RATES", "").split(","):
+        if "=" not in entry:
+            continue
+        host, value = entry.split("=", 1)
+        HOST_RATES[host.strip()] = float(value.strip())
+
+
+_load_host_overrides()
+
+
+def _as_pair(timeout: Union[float, Tuple[float, float]]) -> Tuple[float, float]:
+    if isinstance(timeout, tuple):
+        return timeout
+    return (timeout, timeout)
+
+
+def timeout_for(url: str) -> Tuple[float, float]:
+    """Returns the (connect, read) timeout configured for the URL's host."""
+    return HOST_TIMEOUTS.get(urlsplit(url).hostname or "", DEFAULT_TIMEOUT)
+
+
+def upstream_url(url: str) -> str:
+    """Returns the URL to actually request, honoring BOOKMARK_UPSTREAM_BASE."""
+    if not UPSTREAM_BASE:
+        return url
+    parts = urlsplit(url)
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{UPSTREAM_BASE.rstrip('/')}/{parts.hostname}{parts.path}{query}"
+
+
+def _build_session() -> requests.Session:
+    retries = Retry(
+        total=2,
+        connect=2,
+        read=1,
+        status=2,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retries)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
         "Accept-Language": "en-US,en;q=0.9",
-    }
-    
-    resp = requests.get(url, headers=headers, allow_redirects=True, timeout=30)
-    resp.raise_for_status() 
-    return resp.text  
+        "Accept-Encoding": ACCEPT_ENCODING,
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """Returns the process-wide session that pools keep-alive connections per host."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _slots_for(host: str) -> threading.BoundedSemaphore:
+    with _host_slots_lock:
+        slots = _host_slots.get(host)
+        if slots is None:
+            slots = _host_slots[host] = threading.BoundedSemaphore(HOST_CONCURRENCY)
+        return slots
+
+
+def _aslots_for(host: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    slots = _async_slots.setdefault(loop, {})
+    if host not in slots:
+        slots[host] = asyncio.Semaphore(HOST_CONCURRENCY)
+    return slots[host]
+
+
+def _bucket_for(host: str) -> TokenBucket:
+    with _host_slots_lock:
+        bucket = _host_buckets.get(host)
+        if bucket is None:
+            bucket = _host_buckets[host] = TokenBucket(HOST_RATES.get(host, HOST_RATE), HOST_BURST)
+        return bucket
+
+
+def fetch_html(url: str, timeout: Optional[Union[float, Tuple[float, float]]] = None) -> str:
+    """Fetches the given URL and returns the HTML content as a string."""
+    headers = {"User-Agent": GetFakeUserAgent()}
+    timeout = timeout or timeout_for(url)
+    host = urlsplit(url).hostname or ""
+
+    with metrics.timed("fetch") as timer:
+        # Wait at most one connect timeout each for this host's rate limit and a free slot
+        if not _bucket_for(host).acquire(timeout=_as_pair(timeout)[0]):
+            timer.outcome = "throttled"
+            raise Throttled(f"Rate limit reached for {host}")
+        slots = _slots_for(host)
+        if not slots.acquire(timeout=_as_pair(timeout)[0]):
+            timer.outcome = "throttled"
+            raise Throttled(f"Too many concurrent requests to {host}")
+        try:
+            resp = get_session().get(upstream_url(url), headers=headers, allow_redirects=True, timeout=timeout)
+        finally:
+            slots.release()
+        resp.raise_for_status()
+        return resp.text
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the pooled async client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            headers={
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.9",
+            },
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS, max_keepalive_connections=POOL_MAXSIZE),
+            transport=httpx.AsyncHTTPTransport(retries=2),
+        )
+        _async_clients[loop] = client
+    return client
+
 
+async def afetch_html(url: str, timeout: Optional[Union[float, Tuple[float, float]]] = None) -> str:
+    """Async version of fetch_html; awaits the response without holding a thread."""
+    connect, read = _as_pair(timeout) if timeout else timeout_for(url)
+    headers = {"User-Agent": GetFakeUserAgent()}
+    host = urlsplit(url).hostname or ""
 
-    
+    with metrics.timed("fetch") as timer:
+        if not await _bucket_for(host).aacquire(timeout=connect):
+            timer.outcome = "throttled"
+            raise Throttled(f"Rate limit reached for {host}")
+        slots = _aslots_for(host)
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=connect)
+        except asyncio.TimeoutError:
+            timer.outcome = "throttled"
+            raise Throttled(f"Too many concurrent requests to {host}")
+        try:
+            resp = await get_async_client().get(upstream_url(url), headers=headers, timeout=httpx.Timeout(read, connect=connect))
+        finally:
+            slots.release()
+        resp.raise_for_status()
+        return resp.text
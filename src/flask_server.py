@@ -5,15 +5,24 @@ import os
 sys.path.append(os.path.dirname(__file__))
 sys.path.append(os.path.join(os.path.dirname(__file__), "parsers"))
 
-from flask import Flask, render_template, send_from_directory, request, make_response, jsonify, redirect, url_for
+from flask import Flask, render_template, send_from_directory, request, make_response, jsonify, redirect, url_for, Response, stream_with_context
 from flask_socketio import SocketIO, emit
 import pickle
 import os
+import json
 import uuid
 import logging
 #imports for book search service removed
 import book_finder
+from parser_registry import registry
 import google_books_api
+import structured_data
+import metrics
+import tracing
+import session_store
+import title_index
+import prefetch
+import ai
 import book
 from ai import get_recommendations
 import base64
@@ -38,14 +47,14 @@ socketio = SocketIO(app)
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-# Session-based storage for best_book
-session_books = {}  # key: session_id, value: Book object
+# Latest best_book per session cookie, expiring with the cookie and shared between workers via BOOKMARK_CACHE_DB
+session_books = session_store.create_store()
 
 @app.route("/")
 def home(): 
     session_id = request.cookies.get("session_id") or str(uuid.uuid4())
     resp = make_response(render_template("index.html"))
-    resp.set_cookie("session_id", session_id, max_age=60*60*24) # When cookie expires
+    resp.set_cookie("session_id", session_id, max_age=session_store.SESSION_TTL) # When cookie expires
 
     return resp
 
@@ -71,10 +80,10 @@ def results_page():
         title=best_book.title,
         price=best_book.price,
         isbn=best_book.isbn,
-        description=getattr(best_book, 'description', 'No description available.'),
-        image=getattr(best_book, 'image', ''),
-        condition=getattr(best_book, 'condition', 'unknown'),
-        medium=getattr(best_book, 'medium', '')
+        description=best_book.description,
+        image=best_book.image,
+        condition=best_book.condition,
+        medium=best_book.medium
     )
 
 @app.route("/api/search/book", methods=["POST"])
@@ -90,27 +99,21 @@ def search_book_api():
         logging.info(f"API search request for book: {book_name}")
 
         # Use Google Books API to get ISBN, then find cheapest book via book_finder
-        googleBooksAPIObject = google_books_api.GoogleBooksAPI()
-        book_results = googleBooksAPIObject.search_book_by_name(book_name)
-        if not book_results or len(book_results) == 0:
-            return jsonify({"error": "No book found"}), 404
+        with tracing.start_trace("search", query=book_name, channel="rest") as trace:
+            googleBooksAPIObject = google_books_api.get_client()
+            book_results = googleBooksAPIObject.search_book_by_name(book_name)
+            if not book_results or len(book_results) == 0:
+                return jsonify({"error": "No book found"}), 404
         
-        isbn = book_results[0]['isbn']
-        found_book = book_finder.find_cheapest_book(isbn)
-        if not found_book:
-            return jsonify({"error": "No book found"}), 404
+            isbn = book_results[0]['isbn']
+            found_book = book_finder.find_cheapest_book(isbn)
+            if not found_book:
+                return jsonify({"error": "No book found"}), 404
 
-        found_book.description = book_results[0].get('description', 'No description available.')
-        found_book.image = book_results[0].get('thumbnail', '')
+            found_book.description = book_results[0].get('description', 'No description available.')
+            found_book.image = book_results[0].get('thumbnail', '')
 
-        return jsonify({
-            "title": found_book.title,
-            "isbn": found_book.isbn,
-            "price": found_book.price,
-            "link": found_book.link,
-            "description": found_book.description,
-            "image": found_book.image
-        })
+            return jsonify(dict(found_book.to_dict(), search_id=trace.trace_id))
         
     except Exception as e:
         logging.error(f"API search error: {str(e)}")
@@ -133,42 +136,195 @@ def search_isbn_api():
         
         logging.info(f"API search request for ISBN: {isbn}")
 
-        found_book = book_finder.find_cheapest_book(isbn_clean)
-        if not found_book:
-            return jsonify({"error": "No book found"}), 404
+        with tracing.start_trace("search", query=isbn_clean, channel="rest") as trace:
+            found_book = book_finder.find_cheapest_book(isbn_clean)
+            if not found_book:
+                return jsonify({"error": "No book found"}), 404
         
-        return jsonify({
-            "title": found_book.title,
-            "isbn": found_book.isbn,
-            "price": found_book.price,
-            "link": found_book.link
-        })
+            return jsonify(dict(found_book.to_dict(), search_id=trace.trace_id))
         
     except Exception as e:
         logging.error(f"API ISBN search error: {str(e)}")
         return jsonify({"error": "ISBN search failed", "details": str(e)}), 500
 
+# Most suggestions one /api/suggest call returns
+MAX_SUGGESTIONS = 20
+
+@app.route("/api/suggest")
+def suggest_api():
+    """Typeahead over every book this worker has resolved through Google Books"""
+    query = request.args.get("q", "").strip()
+    try:
+        limit = min(max(int(request.args.get("limit", 8)), 1), MAX_SUGGESTIONS)
+    except ValueError:
+        return jsonify({"error": "'limit' must be a number"}), 400
+    return jsonify({"query": query, "suggestions": title_index.index.suggest(query, limit) if query else []})
+
+# Largest reading list accepted by /api/search/batch
+MAX_BATCH_ISBNS = 200
+
+@app.route("/api/search/batch", methods=["POST"])
+def search_batch_api():
+    """API endpoint to search many ISBNs at once, streaming one NDJSON line per ISBN as it resolves"""
+    data = request.get_json(silent=True) or {}
+    isbns = data.get("isbns")
+    condition_filter = data.get("condition", "")
+    medium_filter = data.get("medium", "")
+
+    if not isinstance(isbns, list) or not isbns:
+        return jsonify({"error": "'isbns' must be a non-empty list"}), 400
+    if len(isbns) > MAX_BATCH_ISBNS:
+        return jsonify({"error": f"At most {MAX_BATCH_ISBNS} ISBNs per batch"}), 400
+
+    valid = []
+    invalid = []
+    for isbn in isbns:
+        isbn_clean = str(isbn).replace('-', '').replace(' ', '')
+        if isbn_clean.isdigit() and len(isbn_clean) in [10, 13]:
+            valid.append(isbn_clean)
+        else:
+            invalid.append(str(isbn))
+
+    logging.info(f"API batch request for {len(valid)} ISBNs ({len(invalid)} invalid)")
+
+    def generate():
+        for isbn in invalid:
+            yield json.dumps({"isbn": isbn, "error": "Invalid ISBN format"}) + "\n"
+        for isbn, found_book in book_finder.find_cheapest_books(valid, condition_filter, medium_filter):
+            if found_book:
+                yield json.dumps({"isbn": isbn, "found": True, "book": found_book.to_dict()}) + "\n"
+            else:
+                yield json.dumps({"isbn": isbn, "found": False}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@app.route("/api/search/offers", methods=["POST"])
+def search_offers_api():
+    """API endpoint returning every listing for an ISBN, ranked by price and by price plus shipping"""
+    try:
+        data = request.get_json()
+        isbn = data.get("isbn", "").strip()
+
+        if not isbn:
+            return jsonify({"error": "ISBN is required"}), 400
+
+        isbn_clean = isbn.replace('-', '').replace(' ', '')
+        if not isbn_clean.isdigit() or len(isbn_clean) not in [10, 13]:
+            return jsonify({"error": "Invalid ISBN format"}), 400
+
+        logging.info(f"API offers request for ISBN: {isbn}")
+
+        outcome = book_finder.find_offers(isbn_clean)
+        if not outcome.by_price:
+            return jsonify({"error": "No book found"}), 404
+
+        return jsonify({
+            "isbn": isbn_clean,
+            "offers_by_price": [o.to_dict() for o in outcome.by_price],
+            "offers_by_total": [o.to_dict() for o in outcome.by_total],
+            "timed_out": outcome.timed_out
+        })
+
+    except Exception as e:
+        logging.error(f"API offers search error: {str(e)}")
+        return jsonify({"error": "Offers search failed", "details": str(e)}), 500
+
 @app.route("/api/health")
 def health_check():
     """Health check endpoint"""
+    breakers = book_finder.breaker_states()
     return jsonify({
         "status": "healthy",
         "service": "Bookmark! Book Search API",
-        "features": ["Google Books", "Chegg", "AbeBooks"]
+        "features": ["Google Books"] + [p.site for p in registry.enabled()],
+        # Retailers whose circuit breaker is open are skipped until they pass a few probe requests
+        "retailers": breakers,
+        "excluded_retailers": [name for name, b in breakers.items() if b["state"] != "closed"]
     })
 
+@app.route("/metrics")
+def prometheus_metrics():
+    """Per-stage timings and call counts in Prometheus text format"""
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/trace/<search_id>")
+def search_trace(search_id):
+    """Span tree of one recent search on this worker: each stage's start, end, tags and error"""
+    trace = tracing.get_trace(search_id)
+    if trace is None:
+        return jsonify({"error": "Unknown or expired search ID"}), 404
+    return jsonify(trace.to_dict())
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    """Price cache hit/miss counters, overall and per retailer"""
+    return jsonify(dict(book_finder.cache_stats(), sessions=session_books.stats(), prefetch=prefetch.stats()))
+
+def _is_admin():
+    # Parser toggles stay locked unless an admin token is configured
+    admin_token = os.getenv("BOOKMARK_ADMIN_TOKEN")
+    return bool(admin_token) and request.headers.get("X-Admin-Token") == admin_token
+
+@app.route("/api/parsers")
+def list_parsers():
+    """List every registered parser with its capabilities and enabled state"""
+    paths = structured_data.path_stats()
+    return jsonify({"parsers": [dict(p.to_dict(), parse_paths=paths.get(p.name, {})) for p in registry.parsers()]})
+
+@app.route("/api/parsers/<name>", methods=["POST"])
+def toggle_parser(name):
+    """Enable or disable a parser without restarting the server"""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get("enabled"), bool):
+        return jsonify({"error": "'enabled' must be true or false"}), 400
+
+    try:
+        info = registry.set_enabled(name, data["enabled"])
+    except KeyError:
+        return jsonify({"error": f"Unknown parser: {name}"}), 404
+    return jsonify(info.to_dict())
+
 @app.route("/load")
 def load_screen():
     return render_template("load.html")
 
 
+def _stream_search(isbn, condition, medium):
+    """Search every retailer, emitting each answer and the running best price as they arrive"""
+    best = []
+
+    def on_result(parser, found):
+        emit("partial_result", {
+            "retailer": parser.site,
+            "found": found is not None,
+            "book": found.to_dict() if found else None
+        })
+        if found is not None and (not best or found < best[0]):
+            best[:] = [found]
+            emit("best_so_far", {"retailer": parser.site, "book": found.to_dict()})
+
+    outcome = book_finder.search(isbn, condition=condition, medium=medium, on_result=on_result)
+    with tracing.span("rank", offers=len(outcome.books)):
+        found_book = min(outcome.books) if outcome.books else None
+    emit("search_complete", {
+        "found": found_book is not None,
+        "book": found_book.to_dict() if found_book else None,
+        "timed_out": [registry.get(name).site for name in outcome.timed_out if registry.get(name)]
+    })
+    return found_book
+
 @socketio.on("Go_button_pushed")
 def go(data):
     """Handle real-time search requests via SocketIO"""
     session_id = request.cookies.get("session_id") or str(uuid.uuid4())
     user_search = data.get("search", "").strip()
     condition_filter = data.get("condition", "")
-    medium_filter = data.get("medium", "")    
+    medium_filter = data.get("medium", "")
+    # Streaming clients get partial_result / best_so_far / search_complete before search_results
+    stream = bool(data.get("stream"))
 
     if not user_search:
         emit("search_error", {"error": "Please enter a book name or ISBN"})
@@ -178,44 +334,48 @@ def go(data):
     emit("search_started", {"search_term": user_search})
 
     try:
-        # Determine if it's an ISBN or book name
-        isbn_clean = user_search.replace('-', '').replace(' ', '')
-
-        if isbn_clean.isdigit() and len(isbn_clean) in [10, 13]:
-            # Use book_finder instead of search_book_by_isbn
-            found_book = book_finder.find_cheapest_book(isbn_clean, condition=condition_filter, medium=medium_filter)
-        else:
-            # Use Google Books API + book_finder instead of search_book_by_name
-            googleBooksAPIObject = google_books_api.GoogleBooksAPI()
-            book_results = googleBooksAPIObject.search_book_by_name(user_search)
-            if not book_results or len(book_results) == 0:
+        with tracing.start_trace("search", query=user_search, channel="socket") as trace:
+            # Determine if it's an ISBN or book name
+            isbn_clean = user_search.replace('-', '').replace(' ', '')
+            book_info = None
+
+            if isbn_clean.isdigit() and len(isbn_clean) in [10, 13]:
+                isbn = isbn_clean
+            else:
+                # Use Google Books API to turn the title into an ISBN
+                googleBooksAPIObject = google_books_api.get_client()
+                book_results = googleBooksAPIObject.search_book_by_name(user_search)
+                if not book_results or len(book_results) == 0:
+                    emit("search_error", {"error": "No book found"})
+                    return
+                book_info = book_results[0]
+                isbn = book_info['isbn']
+
+            if stream:
+                found_book = _stream_search(isbn, condition_filter, medium_filter)
+            else:
+                found_book = book_finder.find_cheapest_book(isbn, condition=condition_filter, medium=medium_filter)
+
+            if found_book and book_info:
+                found_book.description = book_info.get('description', 'No description available.')
+                found_book.image = book_info.get('thumbnail', '')
+
+            if not found_book:
                 emit("search_error", {"error": "No book found"})
                 return
-            isbn = book_results[0]['isbn']
-            found_book = book_finder.find_cheapest_book(isbn, condition=condition_filter, medium=medium_filter)
-            if found_book:
-                found_book.description = book_results[0].get('description', 'No description available.')
-                found_book.image = book_results[0].get('thumbnail', '')
-
-        if not found_book:
-            emit("search_error", {"error": "No book found"})
-            return
-
-        # Store session-specific best_book
-        session_books[session_id] = found_book
-
-        # Emit results
-        emit("search_results", {
-            "title": found_book.title,
-            "isbn": found_book.isbn,
-            "price": found_book.price,
-            "link": found_book.link,
-            "description": getattr(found_book, 'description', 'No description available.'),
-            "image": getattr(found_book, 'image', '')
-        })
 
-        # Redirect to results page
-        emit('redirect', url_for('results_page'))
+            # Store session-specific best_book, and its search so the AI call joins the same trace
+            found_book.search_id = trace.trace_id
+            session_books.set(session_id, found_book)
+
+            # Emit results
+            results = dict(found_book.to_dict(), search_id=trace.trace_id)
+            if app.debug:
+                results["trace"] = trace.to_dict()
+            emit("search_results", results)
+
+            # Redirect to results page
+            emit('redirect', url_for('results_page'))
 
     except Exception as e:
         logging.error(f"SocketIO search error: {str(e)}")
@@ -227,15 +387,39 @@ def handle_ai_recommendations(data):
     current_book = data['currentBook']
     history = data['history'] 
 
+    best_book = session_books.get(request.cookies.get("session_id"))
+    search_id = data.get('searchId') or (best_book.search_id if best_book else None)
+
+    # Streaming clients get one ai_recommendation per item before the full ai_recommendations list
+    stream = bool(data.get('stream'))
+
+    # The Gemini round trip takes seconds; run it off the event handler so this worker keeps serving
+    socketio.start_background_task(_send_recommendations, request.sid, search_id, history, current_book, stream)
+
+def _send_recommendations(sid, search_id, history, current_book, stream=False):
+    sent = []
+
+    def on_item(recommendation):
+        socketio.emit('ai_recommendation', {"index": len(sent), "recommendation": recommendation}, to=sid)
+        sent.append(recommendation)
+        # Start pricing it while the rest of the reply streams in
+        prefetch.prefetch_titles([recommendation.get("title")])
+
     try:
-        recommendations = get_recommendations(history, current_book)
+        with tracing.resume(search_id, "recommendations"):
+            recommendations = get_recommendations(history, current_book, on_item=on_item if stream else None)
         logging.info(f"Recommendations: {recommendations}")
-        emit('ai_recommendations', recommendations)
+        socketio.emit('ai_recommendations', recommendations, to=sid)
+        prefetch.prefetch_titles(r.get("title") for r in recommendations
+                                 if isinstance(r, dict) and r.get("summary") != ai.NO_RECOMMENDATIONS)
     except Exception as e:
         logging.error(f"AI error: {str(e)}")
-        emit('ai_error', str(e))
+        socketio.emit('ai_error', str(e), to=sid)
 
 
 # Prevents the server from starting during tests or imports
 if __name__ == "__main__":
-    socketio.run(app, debug=True, host="0.0.0.0", port=3000, allow_unsafe_werkzeug=True)
+    # The load-test kit starts several servers with BOOKMARK_PORT set and BOOKMARK_DEBUG=0
+    port = int(os.getenv("BOOKMARK_PORT", "3000"))
+    debug = os.getenv("BOOKMARK_DEBUG", "1") == "1"
+    socketio.run(app, debug=debug, host="0.0.0.0", port=port, allow_unsafe_werkzeug=True)
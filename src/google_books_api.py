@@ -1,20 +1,60 @@
 import requests
 import json
+import os
+import threading
 from typing import Dict, List, Optional, Union
 import logging
 
+from cache import CacheState, TTLCache
+from cache_backend import get_backend
+from fetch_html import get_session, upstream_url
+from singleflight import SingleFlight
+from title_index import index as title_index, normalize_query
+import metrics
+
+# Seconds a Google Books answer is reused before asking Google again
+GOOGLE_BOOKS_TTL = float(os.getenv("BOOKMARK_GOOGLE_BOOKS_TTL", str(24 * 60 * 60)))
+
+
+def _encode_json(value) -> bytes:
+    return json.dumps(value).encode("utf-8")
+
+
+def _decode_json(data: bytes):
+    return json.loads(data)
+
+
+# Google Books lookups, shared with other workers when BOOKMARK_CACHE_DB is set.
+# Title searches are keyed by normalize_query(), ISBN lookups by the bare ISBN.
+search_cache = TTLCache(max_entries=int(os.getenv("BOOKMARK_GOOGLE_SEARCH_CACHE_ENTRIES", "2048")),
+                        default_ttl=GOOGLE_BOOKS_TTL, backend=get_backend(),
+                        namespace="google_search", encode=_encode_json, decode=_decode_json)
+isbn_cache = TTLCache(max_entries=int(os.getenv("BOOKMARK_GOOGLE_ISBN_CACHE_ENTRIES", "4096")),
+                      default_ttl=GOOGLE_BOOKS_TTL, backend=get_backend(),
+                      namespace="google_isbn", encode=_encode_json, decode=_decode_json)
+
+# Overlapping lookups for the same query share one request to Google
+_inflight = SingleFlight()
+
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'application/json',
+}
+
+
+def _clean_isbn(isbn) -> str:
+    return str(isbn).replace('-', '').replace(' ', '').upper()
+
 class GoogleBooksAPI:
     """
     Google Books API integration for searching books by name and extracting ISBN information.
     """
     
-    def __init__(self):
-        self.base_url = "https://www.googleapis.com/books/v1/volumes"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-        
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.base_url = upstream_url("https://www.googleapis.com/books/v1/volumes")
+        # Defaults to fetch_html's pooled keep-alive session
+        self.session = session or get_session()
+
     def search_book_by_name(self, book_name: str, max_results: int = 5) -> List[Dict]:
         """
         Search for books by name using Google Books API.
@@ -26,6 +66,33 @@ class GoogleBooksAPI:
         Returns:
             List[Dict]: List of book information dictionaries
         """
+        with metrics.timed("google_books", retailer="") as timer:
+            return self._search_book_by_name(book_name, max_results, timer)
+
+    def _search_book_by_name(self, book_name: str, max_results: int, timer) -> List[Dict]:
+        key = (normalize_query(book_name), max_results)
+        cached, state = search_cache.get(key)
+        if state is not CacheState.MISS:
+            timer.outcome = "cache_hit"
+            # The answer may have come from another worker's cache
+            title_index.add_many(cached, query=book_name)
+            return [dict(b) for b in cached]
+
+        # A query naming a book this process already knows needs no round trip
+        known = title_index.lookup(book_name)
+        if known is not None:
+            timer.outcome = "index_hit"
+            return [known]
+
+        books = _inflight.do(("search",) + key, self._fetch_search, book_name, max_results)
+        if books is None:
+            timer.outcome = "error"
+            return []
+        timer.outcome = "ok" if books else "empty"
+        return [dict(b) for b in books]
+
+    def _fetch_search(self, book_name: str, max_results: int) -> Optional[List[Dict]]:
+        """Ask Google and cache the answer; None when the request failed, so nothing is cached."""
         try:
             params = {
                 'q': book_name,
@@ -34,7 +101,7 @@ class GoogleBooksAPI:
             }
             
             logging.info(f"Searching Google Books for: {book_name}")
-            response = self.session.get(self.base_url, params=params, timeout=10)
+            response = self.session.get(self.base_url, params=params, headers=_HEADERS, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -47,14 +114,20 @@ class GoogleBooksAPI:
                         books.append(book_info)
             
             logging.info(f"Found {len(books)} books from Google Books")
+            search_cache.set((normalize_query(book_name), max_results), books)
+            title_index.add_many(books, query=book_name)
+            # A later lookup of any of these ISBNs can skip Google too
+            for book_info in books:
+                for isbn in {book_info['isbn_10'], book_info['isbn_13']} - {None}:
+                    isbn_cache.set(_clean_isbn(isbn), book_info)
             return books
             
         except requests.RequestException as e:
             logging.error(f"Google Books API request failed: {str(e)}")
-            return []
+            return None
         except Exception as e:
             logging.error(f"Error searching Google Books: {str(e)}")
-            return []
+            return None
     
     def _extract_book_info(self, item: Dict) -> Optional[Dict]:
         """
@@ -138,31 +211,57 @@ class GoogleBooksAPI:
         Returns:
             Optional[Dict]: Book information or None if not found
         """
+        with metrics.timed("google_books_isbn", retailer="") as timer:
+            isbn_clean = _clean_isbn(isbn)
+            cached, state = isbn_cache.get(isbn_clean)
+            if state is not CacheState.MISS:
+                timer.outcome = "cache_hit"
+                return dict(cached) if cached else None
+
+            book_info = _inflight.do(("isbn", isbn_clean), self._fetch_isbn, isbn_clean)
+            timer.outcome = "ok" if book_info else "empty"
+            return dict(book_info) if book_info else None
+
+    def _fetch_isbn(self, isbn_clean: str) -> Optional[Dict]:
         try:
-            # Clean ISBN
-            isbn_clean = isbn.replace('-', '').replace(' ', '')
-            
             params = {
                 'q': f'isbn:{isbn_clean}',
                 'maxResults': 1
             }
             
             logging.info(f"Searching Google Books by ISBN: {isbn_clean}")
-            response = self.session.get(self.base_url, params=params, timeout=10)
+            response = self.session.get(self.base_url, params=params, headers=_HEADERS, timeout=10)
             response.raise_for_status()
             
             data = response.json()
             
-            if 'items' and len(data['items']) > 0:
+            book_info = None
+            if data.get('items'):
                 book_info = self._extract_book_info(data['items'][0])
-                return book_info
-            
-            return None
+
+            isbn_cache.set(isbn_clean, book_info)
+            if book_info:
+                title_index.add(book_info)
+            return book_info
             
         except Exception as e:
-            logging.error(f"Error searching by ISBN {isbn}: {str(e)}")
+            logging.error(f"Error searching by ISBN {isbn_clean}: {str(e)}")
             return None
 
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GoogleBooksAPI:
+    """Returns the process-wide client, so every request shares its connection pool and caches."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GoogleBooksAPI()
+    return _client
+
 def search_books_by_name(book_name: str) -> List[Dict]:
     """
     Convenience function to search books by name.
@@ -173,8 +272,7 @@ def search_books_by_name(book_name: str) -> List[Dict]:
     Returns:
         List[Dict]: List of book information dictionaries
     """
-    api = GoogleBooksAPI()
-    return api.search_book_by_name(book_name)
+    return get_client().search_book_by_name(book_name)
 
 def get_book_by_isbn(isbn: str) -> Optional[Dict]:
     """
@@ -186,8 +284,7 @@ def get_book_by_isbn(isbn: str) -> Optional[Dict]:
     Returns:
         Optional[Dict]: Book information or None
     """
-    api = GoogleBooksAPI()
-    return api.get_book_by_isbn(isbn)
+    return get_client().get_book_by_isbn(isbn)
 
 if __name__ == "__main__":
     # Test the Google Books integration
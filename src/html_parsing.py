@@ -0,0 +1,226 @@
+import os
+import re
+import time
+import logging
+from typing import Callable, Dict, Optional, Pattern, Tuple, Union
+
+from bs4 import BeautifulSoup, FeatureNotFound, NavigableString, PageElement, SoupStrainer, Tag
+
+# lxml builds trees several times faster than the pure-Python html.parser,
+# but it is an optional dependency. BOOKMARK_HTML_PARSER forces a backend.
+try:
+    import lxml  # noqa: F401
+    _DEFAULT_BACKEND = "lxml"
+except ImportError:
+    _DEFAULT_BACKEND = "html.parser"
+
+HTML_BACKEND = os.getenv("BOOKMARK_HTML_PARSER", _DEFAULT_BACKEND)
+
+# Nodes visited between deadline checks while extracting
+_BUDGET_CHECK_EVERY = 256
+
+
+def make_soup(html: str, only: Optional[SoupStrainer] = None, backend: Optional[str] = None) -> BeautifulSoup:
+    """
+    Parses a retailer page with the fastest available backend.
+
+    Args:
+        html: HTML content as a string
+        only: When given, only the elements it matches (and their children) are
+            kept, which skips building the rest of the page's tree
+        backend: BeautifulSoup tree builder to use instead of HTML_BACKEND
+
+    Returns:
+        BeautifulSoup: The parsed document, or just the matched elements
+    """
+    backend = backend or HTML_BACKEND
+    try:
+        return BeautifulSoup(html, backend, parse_only=only)
+    except FeatureNotFound as e:
+        logging.error(f"HTML backend {backend} failed, falling back to html.parser: {str(e)}")
+        return BeautifulSoup(html, "html.parser", parse_only=only)
+
+
+class ParseBudgetExceeded(Exception):
+    """Raised when extracting from a page runs past its time budget."""
+
+
+class Selector:
+    """
+    One extraction strategy, compiled once.
+
+    Matches a tag by name, class regex and required attribute, or a text node
+    containing `text` (a substring or compiled regex). `within` requires an
+    ancestor matching another Selector, `climb_to` returns the nearest
+    ancestor with one of those names instead of the node itself, and
+    `accept` can reject a match so later nodes are tried.
+    """
+
+    def __init__(self, names: str = "", class_pattern: Optional[str] = None, has_attr: str = "",
+                 text: Union[str, Pattern, None] = None, within: Optional["Selector"] = None,
+                 climb_to: str = "", accept: Optional[Callable[[PageElement], bool]] = None):
+        self.names = frozenset(names.split())
+        self.class_re = re.compile(class_pattern, re.I) if class_pattern else None
+        self.has_attr = has_attr
+        self.text = text
+        self.within = within
+        self.climb_to = climb_to.split()
+        self.accept = accept
+
+    def match(self, node: PageElement) -> Optional[PageElement]:
+        """Returns what this strategy extracts from the node, or None."""
+        if self.text is not None:
+            if not isinstance(node, NavigableString) or not self._text_matches(node):
+                return None
+        elif not isinstance(node, Tag) or not self._tag_matches(node):
+            return None
+        if self.within is not None and not any(
+                self.within._tag_matches(parent) for parent in node.parents if parent.name):
+            return None
+        if self.climb_to:
+            node = node.find_parent(self.climb_to)
+            if node is None:
+                return None
+        if self.accept is not None and not self.accept(node):
+            return None
+        return node
+
+    def _tag_matches(self, tag: Tag) -> bool:
+        if self.names and tag.name not in self.names:
+            return False
+        if self.has_attr and not tag.get(self.has_attr):
+            return False
+        if self.class_re is not None:
+            classes = tag.get("class")
+            if not classes:
+                return False
+            if not self.class_re.search(" ".join(classes) if isinstance(classes, list) else classes):
+                return False
+        return True
+
+    def _text_matches(self, node: NavigableString) -> bool:
+        if isinstance(self.text, str):
+            return self.text in node
+        return self.text.search(node) is not None
+
+
+class SelectorSpec:
+    """
+    Ordered strategies for one field: the earliest strategy that matches
+    anything wins, and within it the first match in document order.
+    """
+
+    def __init__(self, *strategies: Selector):
+        self.strategies = strategies
+
+    def extend(self, *strategies: Selector) -> "SelectorSpec":
+        """A copy with extra, lower-priority strategies (e.g. ones that depend on the ISBN)."""
+        return SelectorSpec(*self.strategies, *strategies)
+
+
+def extract(root: PageElement, specs: Dict[str, SelectorSpec], deadline: float) -> Dict[str, Optional[PageElement]]:
+    """
+    Resolves every field's spec in a single walk over root's descendants.
+
+    The walk stops early once every field is matched by its first strategy.
+
+    Args:
+        root: Tree (or subtree) to search
+        specs: Field name to the strategies that find it
+        deadline: time.monotonic() value after which the walk gives up
+
+    Returns:
+        Dict[str, Optional[PageElement]]: Field name to the best match, or None
+
+    Raises:
+        ParseBudgetExceeded: If the walk passes the deadline
+    """
+    best: Dict[str, Tuple[int, Optional[PageElement]]] = {field: (len(spec.strategies), None) for field, spec in specs.items()}
+    for count, node in enumerate(root.descendants):
+        if count % _BUDGET_CHECK_EVERY == 0 and time.monotonic() > deadline:
+            raise ParseBudgetExceeded(f"Gave up after {count} nodes")
+        done = True
+        for field, spec in specs.items():
+            rank, _ = best[field]
+            # Only strategies that beat the current best are worth checking
+            for i in range(rank):
+                found = spec.strategies[i].match(node)
+                if found is not None:
+                    best[field] = (i, found)
+                    rank = i
+                    break
+            done = done and rank == 0
+        if done:
+            break
+    return {field: found for field, (_, found) in best.items()}
+
+
+def _first_after(tag: PageElement) -> Optional[PageElement]:
+    """The first node after tag's subtree in document order, or None at the end of the tree."""
+    while tag is not None and tag.next_sibling is None:
+        tag = tag.parent
+    return tag.next_sibling if tag is not None else None
+
+
+def extract_within(root: PageElement, container: SelectorSpec, specs: Dict[str, SelectorSpec],
+                   deadline: float) -> Tuple[Optional[PageElement], Dict[str, Optional[PageElement]]]:
+    """
+    Finds the best container and resolves every field inside it in the same walk.
+
+    Gives the same answer as extract() for the container followed by
+    extract() over it, without visiting the container's subtree twice. The
+    walk stops once it leaves a container matched by its first strategy.
+
+    Args:
+        root: Tree (or subtree) to search
+        container: Strategies that find the container, e.g. a product card
+        specs: Field name to the strategies that find it within the container
+        deadline: time.monotonic() value after which the walk gives up
+
+    Returns:
+        Tuple[Optional[PageElement], Dict[str, Optional[PageElement]]]: The
+        container (None if nothing matched) and field name to the best match in it
+
+    Raises:
+        ParseBudgetExceeded: If the walk passes the deadline
+    """
+    rank, chosen, end = len(container.strategies), None, None
+    inside = False
+    best: Dict[str, Tuple[int, Optional[PageElement]]] = {}
+    for count, node in enumerate(root.descendants):
+        if count % _BUDGET_CHECK_EVERY == 0 and time.monotonic() > deadline:
+            raise ParseBudgetExceeded(f"Gave up after {count} nodes")
+        if inside and node is end:
+            inside = False
+            if rank == 0:
+                break
+        for i in range(rank):
+            found = container.strategies[i].match(node)
+            if found is not None:
+                rank, chosen = i, found
+                if found is node:
+                    best = {field: (len(spec.strategies), None) for field, spec in specs.items()}
+                    inside, end = True, _first_after(node)
+                else:
+                    # Climbed to an ancestor whose start was already walked past
+                    inside = False
+                    best = {field: (0, match) for field, match in extract(found, specs, deadline).items()}
+                break
+        else:
+            if not inside:
+                continue
+            for field, spec in specs.items():
+                field_rank, _ = best[field]
+                for i in range(field_rank):
+                    match = spec.strategies[i].match(node)
+                    if match is not None:
+                        best[field] = (i, match)
+                        break
+            if rank == 0 and all(field_rank == 0 for field_rank, _ in best.values()):
+                break
+            continue
+        if rank == 0 and not inside:
+            break
+    if chosen is None:
+        return None, {field: None for field in specs}
+    return chosen, {field: found for field, (_, found) in best.items()}
@@ -0,0 +1,233 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import tracing
+
+# Seconds; spans a cache hit through a retailer close to the search deadline
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Counter:
+    """Monotonic count per label combination, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(tuple(str(labels.get(n, "")) for n in self.labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: [count per bucket (+Inf last)], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(tuple(str(labels.get(n, "")) for n in self.labels))
+            return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total[0]!r}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """The whole registry in Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "bookmark_stage_duration_seconds",
+    "Time spent in each stage of a search",
+    ("stage", "retailer", "outcome"),
+))
+STAGE_TOTAL = registry.register(Counter(
+    "bookmark_stage_total",
+    "Calls to each stage of a search",
+    ("stage", "retailer", "outcome"),
+))
+
+
+class RetailerCall:
+    """
+    Per-call scratchpad for one retailer's parser. Fetches made while it is
+    current add their time here, so the rest of the call can be attributed
+    to parsing.
+    """
+
+    def __init__(self, retailer: str):
+        self.retailer = retailer
+        self.outcome = "ok"
+        self.fetch_seconds = 0.0
+        self.fetched = False
+        # Wall-clock end of the latest fetch, where the trace's parse span starts
+        self.fetch_ended: Optional[float] = None
+        # Set when the parser failed but the caller handled it, so the trace still shows why
+        self.error: Optional[str] = None
+
+
+_current_call: contextvars.ContextVar[Optional[RetailerCall]] = contextvars.ContextVar("bookmark_retailer_call", default=None)
+
+
+def current_retailer() -> str:
+    call = _current_call.get()
+    return call.retailer if call is not None else ""
+
+
+def observe(stage: str, seconds: float, outcome: str = "ok", retailer: str = ""):
+    STAGE_SECONDS.observe(seconds, stage=stage, retailer=retailer, outcome=outcome)
+    STAGE_TOTAL.inc(stage=stage, retailer=retailer, outcome=outcome)
+
+
+class Timer:
+    """Handle yielded by timed(); set .outcome before the block ends to label the sample."""
+
+    def __init__(self, stage: str, retailer: str):
+        self.stage = stage
+        self.retailer = retailer
+        self.outcome = "ok"
+
+
+@contextmanager
+def timed(stage: str, retailer: Optional[str] = None) -> Iterator[Timer]:
+    """
+    Times a block as one sample of `stage`, and as a span of the current
+    search's trace if there is one. An exception marks it "error" unless the
+    block already set another outcome.
+
+    Args:
+        stage: e.g. "google_books", "fetch", "search", "ai"
+        retailer: Label value; defaults to the retailer whose parser is running
+    """
+    timer = Timer(stage, current_retailer() if retailer is None else retailer)
+    with tracing.span(stage, **_span_tags(timer.retailer)) as span:
+        started = time.perf_counter()
+        try:
+            yield timer
+        except BaseException:
+            if timer.outcome == "ok":
+                timer.outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            observe(timer.stage, elapsed, timer.outcome, timer.retailer)
+            if span is not None:
+                span.tags["outcome"] = timer.outcome
+            call = _current_call.get()
+            if stage == "fetch" and call is not None:
+                call.fetch_seconds += elapsed
+                call.fetched = call.fetched or timer.outcome == "ok"
+                call.fetch_ended = time.time()
+
+
+@contextmanager
+def retailer_call(retailer: str) -> Iterator[RetailerCall]:
+    """
+    Times one parser call as the "retailer" stage, and the part of it not
+    spent fetching as the "parse" stage. Set .outcome to label both.
+    """
+    call = RetailerCall(retailer)
+    with tracing.span("retailer", **_span_tags(retailer)) as span:
+        token = _current_call.set(call)
+        started = time.perf_counter()
+        try:
+            yield call
+        except BaseException:
+            call.outcome = "error"
+            raise
+        finally:
+            _current_call.reset(token)
+            elapsed = time.perf_counter() - started
+            observe("retailer", elapsed, call.outcome, retailer)
+            # Parsing only happened if a page actually arrived
+            if call.fetched:
+                observe("parse", max(0.0, elapsed - call.fetch_seconds), call.outcome, retailer)
+            if span is not None:
+                span.tags["outcome"] = call.outcome
+                span.error = span.error or call.error
+                if call.fetched:
+                    _parse_span(span, call)
+
+
+def _span_tags(retailer: str) -> Dict[str, str]:
+    return {"retailer": retailer} if retailer else {}
+
+
+def _parse_span(span: "tracing.Span", call: RetailerCall):
+    """The parser does not mark where parsing starts, so the trace shows it as the time after the last fetch."""
+    parse = span.child("parse", **_span_tags(call.retailer), outcome=call.outcome)
+    parse.start = call.fetch_ended
+    parse.finish()
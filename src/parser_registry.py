@@ -0,0 +1,163 @@
+import os
+import sys
+import asyncio
+import inspect
+import importlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+PARSER_PATH = os.path.join(_current_dir, "parsers")
+if PARSER_PATH not in sys.path:
+    sys.path.insert(0, PARSER_PATH)
+
+# Comma separated module names (e.g. "textbookx_parser") to start disabled
+DISABLED_PARSERS_ENV = "BOOKMARK_DISABLED_PARSERS"
+
+REQUIRED_FUNCTIONS = ("parse", "get_test_isbn")
+
+
+class ParserInfo:
+    """
+    A validated parser module plus what the registry knows about it.
+    """
+
+    def __init__(self, module, enabled: bool = True):
+        self.module = module
+        self.name = module.__name__
+        self.site = getattr(module, "SITE_NAME", None) or _site_from_name(self.name)
+        parameters = inspect.signature(module.parse).parameters
+        self.supports_condition = "condition" in parameters
+        self.supports_medium = "medium" in parameters
+        self.supports_async = inspect.iscoroutinefunction(getattr(module, "aparse", None))
+        self.supports_offers = callable(getattr(module, "parse_offers", None))
+        self.cache_ttl = getattr(module, "CACHE_TTL", None)
+        self.enabled = enabled
+
+    def parse(self, isbn, condition="", medium=""):
+        """Call the parser, only passing the filters it understands."""
+        kwargs = {}
+        if self.supports_condition:
+            kwargs["condition"] = condition
+        if self.supports_medium:
+            kwargs["medium"] = medium
+        return self.module.parse(isbn, **kwargs)
+
+    def parse_offers(self, isbn):
+        """Every listing the parser can see, or its single best match if it only has parse()."""
+        if self.supports_offers:
+            return self.module.parse_offers(isbn)
+        return [self.parse(isbn)]
+
+    async def aparse(self, isbn, condition="", medium=""):
+        """Await the parser's aparse(), or run a blocking parse() in a worker thread."""
+        if not self.supports_async:
+            return await asyncio.to_thread(self.parse, isbn, condition, medium)
+        kwargs = {}
+        if self.supports_condition:
+            kwargs["condition"] = condition
+        if self.supports_medium:
+            kwargs["medium"] = medium
+        return await self.module.aparse(isbn, **kwargs)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "site": self.site,
+            "enabled": self.enabled,
+            "supports_condition": self.supports_condition,
+            "supports_medium": self.supports_medium,
+            "supports_async": self.supports_async,
+            "supports_offers": self.supports_offers,
+            "cache_ttl": self.cache_ttl,
+        }
+
+
+def _site_from_name(name: str) -> str:
+    return name[:-len("_parser")] if name.endswith("_parser") else name
+
+
+class ParserRegistry:
+    """
+    Discovers the parsers in src/parsers once and tracks which ones are enabled.
+    """
+
+    def __init__(self, path: str = PARSER_PATH):
+        self.path = path
+        self._parsers: Dict[str, ParserInfo] = {}
+        self._discovered = False
+        self._lock = threading.Lock()
+        disabled = os.getenv(DISABLED_PARSERS_ENV, "")
+        self._disabled_at_start = {n.strip() for n in disabled.split(",") if n.strip()}
+
+    def discover(self) -> List[ParserInfo]:
+        """
+        Import and validate every parser module. Later calls are no-ops.
+
+        Returns:
+            List[ParserInfo]: Every registered parser, enabled or not
+        """
+        with self._lock:
+            if not self._discovered:
+                for filename in sorted(os.listdir(self.path)):
+                    if not filename.endswith(".py") or filename.startswith("_"):
+                        continue
+                    name = filename[:-3]
+                    try:
+                        module = importlib.import_module(name)
+                    except Exception as e:
+                        logging.error(f"Could not import parser {name}: {str(e)}")
+                        continue
+                    self._register(module)
+                self._discovered = True
+                logging.info(f"Registered parsers: {', '.join(self._parsers) or 'none'}")
+        return self.parsers()
+
+    def register(self, module) -> Optional[ParserInfo]:
+        """
+        Add a single parser module. Modules that break the parser standard are rejected.
+
+        Args:
+            module: Module exposing parse() and get_test_isbn()
+
+        Returns:
+            Optional[ParserInfo]: The registered parser, or None if it was rejected
+        """
+        with self._lock:
+            return self._register(module)
+
+    def _register(self, module) -> Optional[ParserInfo]:
+        missing = [f for f in REQUIRED_FUNCTIONS if not callable(getattr(module, f, None))]
+        if missing:
+            logging.error(f"Parser {module.__name__} is missing {', '.join(missing)}; skipping")
+            return None
+        if module.__name__ in self._parsers:
+            return self._parsers[module.__name__]
+        info = ParserInfo(module, enabled=module.__name__ not in self._disabled_at_start)
+        self._parsers[info.name] = info
+        return info
+
+    def parsers(self) -> List[ParserInfo]:
+        return list(self._parsers.values())
+
+    def enabled(self) -> List[ParserInfo]:
+        return [p for p in self._parsers.values() if p.enabled]
+
+    def get(self, name: str) -> Optional[ParserInfo]:
+        return self._parsers.get(name)
+
+    def set_enabled(self, name: str, enabled: bool) -> ParserInfo:
+        """
+        Turn a parser on or off for every search that starts afterwards.
+
+        Raises:
+            KeyError: If no parser with that name is registered
+        """
+        info = self._parsers[name]
+        info.enabled = bool(enabled)
+        logging.info(f"Parser {name} {'enabled' if info.enabled else 'disabled'}")
+        return info
+
+
+registry = ParserRegistry()
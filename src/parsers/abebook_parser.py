@@ -1,10 +1,19 @@
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from typing import List, Dict, Union
 import re
-from fetch_html import fetch_html 
+from fetch_html import fetch_html, afetch_html
+from html_parsing import make_soup
 import book
 from book import Condition, Medium
 
+SITE_NAME = "AbeBooks"
+# Marketplace listings sell out quickly
+CACHE_TTL = 30 * 60
+
+# Only the result listings are needed, so skip building the rest of the page
+LISTINGS = SoupStrainer('li', {'data-test-id': 'listing-item'})
+SHIPPING_AMOUNT = re.compile(r'\d+(?:\.\d+)?')
+
 def parse_abebooks_prices(html: str) -> List[Dict[str, Union[str, float]]]:
     """
     Parses AbeBooks HTML and extracts book information.
@@ -13,10 +22,11 @@ def parse_abebooks_prices(html: str) -> List[Dict[str, Union[str, float]]]:
         html: HTML content as a string
         
     Returns:
-        List of dictionaries containing book data (title, price, condition)
-        where price is a float if parsable, otherwise None.
+        List of dictionaries containing book data (title, price, condition,
+        shipping, link) where price and shipping are floats if parsable,
+        otherwise None. Shipping is also None when the listing does not show it.
     """
-    soup = BeautifulSoup(html, 'html.parser')
+    soup = make_soup(html, only=LISTINGS)
     books = []
 
     listings = soup.find_all('li', {'data-test-id': 'listing-item'})
@@ -40,51 +50,107 @@ def parse_abebooks_prices(html: str) -> List[Dict[str, Union[str, float]]]:
         condition_tag = listing.find('span', {'data-test-id': 'listing-book-condition'})
         if condition_tag:
             book_data['condition'] = condition_tag.get_text(strip=True)
+
+        shipping_tag = listing.find(attrs={'data-test-id': re.compile(r'shipping', re.I)})
+        book_data['shipping'] = shipping_cost(shipping_tag.get_text(strip=True)) if shipping_tag else None
+
+        link_tag = listing.find('a', {'data-test-id': 'listing-title-link'}) or listing.find('a', href=True)
+        if link_tag and link_tag.get('href'):
+            href = link_tag['href']
+            book_data['link'] = href if href.startswith('http') else f"https://www.abebooks.com{href}"
         
         books.append(book_data)
     
     return books
 
+def shipping_cost(text):
+    """
+    The amount in a shipping label such as "+ US$ 4.00 to U.S.A.", 0.0 for
+    free shipping, or None when no amount can be read.
+    """
+    if 'free' in text.lower():
+        return 0.0
+    match = SHIPPING_AMOUNT.search(text.replace(',', ''))
+    return float(match.group()) if match else None
+
+def search_url(isbn_param, condition_param):
+    return f"https://www.abebooks.com/servlet/SearchResults?cond={condition_param}&kn={isbn_param}"
+
+def top_result(html_content, url):
+    """
+    Picks the first listing out of an AbeBooks search page.
+
+    Args:
+        html_content: HTML content as a string
+        url: URL the page was fetched from
+
+    Returns:
+        The first listing's data with its 'url' set, or None when the page has no listings.
+    """
+    print("🔍 Parsing book data...")
+    books = parse_abebooks_prices(html_content)
+
+    if not books:
+        print("No books found.")
+        return None
+
+    abeTopResult = books[0]
+    abeTopResult['url'] = url
+
+    print(f"\n{'='*60}")
+    print("📖 First Book Found")
+    print(f"{'='*60}")
+    print(f"Title:     {abeTopResult.get('title', 'N/A')}")
+    print(f"Price:     {abeTopResult.get('price', 'N/A')}")
+    print(f"Condition: {abeTopResult.get('condition', 'N/A')}")
+    print()
+
+    return abeTopResult
+
 def search_abebooks(isbn_param, condition_param):
     isbn = str(isbn_param)
     condition = str(condition_param)
 
-    url = f"https://www.abebooks.com/servlet/SearchResults?cond={condition}&kn={isbn}"
+    url = search_url(isbn, condition)
 
     print(f"\nFetching HTML from: {url}")
     try:
         html_content = fetch_html(url)
         print(f"Successfully fetched {len(html_content)} characters of HTML\n")
-        
-        print("🔍 Parsing book data...")
-        books = parse_abebooks_prices(html_content)
-        
-        if not books:
-            print("No books found.")
-            return None
-        
-        abeTopResult = books[0]
-        abeTopResult['url'] = url
-        
-        print(f"\n{'='*60}")
-        print("📖 First Book Found")
-        print(f"{'='*60}")
-        print(f"Title:     {abeTopResult.get('title', 'N/A')}")
-        print(f"Price:     {abeTopResult.get('price', 'N/A')}")
-        print(f"Condition: {abeTopResult.get('condition', 'N/A')}")
-        print()
-        
-        return abeTopResult  
-    
+        return top_result(html_content, url)
+
     except Exception as e:
         print(f"Error occurred: {e}")
-        return None
+        # Keep the original error attached so callers can tell an outage from "not found"
+        raise book.BookError(f"Could not access AbeBooks: {str(e)}")
+
+async def asearch_abebooks(isbn_param, condition_param):
+    url = search_url(str(isbn_param), str(condition_param))
+    try:
+        html_content = await afetch_html(url)
+        return top_result(html_content, url)
+    except Exception as e:
+        print(f"Error occurred: {e}")
+        raise book.BookError(f"Could not access AbeBooks: {str(e)}")
 
 if __name__ == "__main__":
     search_abebooks()
 
 def parse(isbn, condition="new", medium="physical"):
     result = search_abebooks(isbn, condition)
+    return book_from_result(result, isbn, condition, medium)
+
+async def aparse(isbn, condition="new", medium="physical"):
+    result = await asearch_abebooks(isbn, condition)
+    return book_from_result(result, isbn, condition, medium)
+
+def parse_html(html_string, isbn, url, condition="new", medium="physical"):
+    """
+    Build a Book from an already fetched AbeBooks search page.
+    """
+    return book_from_result(top_result(html_string, url), isbn, condition, medium)
+
+def book_from_result(result, isbn, condition, medium):
     if result == None:
         raise book.BookError()
     condition_enum = Condition[condition.upper()] if condition else Condition.NEW
@@ -92,5 +158,41 @@ def parse(isbn, condition="new", medium="physical"):
     book_result = book.Book(result['url'],result['title'],isbn,float(result['price']),condition_enum, medium_enum)
     return book_result
 
+def parse_offers(isbn):
+    """
+    Every listing on the AbeBooks results page, in any condition.
+
+    Returns:
+        List[book.Book]: One Book per priced listing, with shipping where AbeBooks shows it
+    """
+    url = search_url(isbn, "")
+    return offers_from_listings(parse_abebooks_prices(fetch_html(url)), isbn, url)
+
+def offers_from_listings(listings, isbn, url):
+    offers = []
+    for listing in listings:
+        if not listing.get('price'):
+            continue
+        offers.append(book.Book(
+            link=listing.get('link') or url,
+            title=listing.get('title', ''),
+            isbn=isbn,
+            price=listing['price'],
+            condition=condition_from_text(listing.get('condition', '')),
+            medium=Medium.PHYSICAL,
+            # None when AbeBooks does not say; ranked after offers with a known total
+            shipping=listing.get('shipping')
+        ))
+    return offers
+
+def condition_from_text(text):
+    # "Used - Like New" is still used, so check for used first
+    text = text.lower()
+    if 'used' in text:
+        return Condition.USED
+    if 'new' in text:
+        return Condition.NEW
+    return Condition.UNKNOWN
+
 def get_test_isbn():
     return 9798991511100 # Quantum Physics for Beginners
\ No newline at end of file
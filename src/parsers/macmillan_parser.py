@@ -1,6 +1,16 @@
-from fetch_html import fetch_html
-from bs4 import BeautifulSoup
+from fetch_html import fetch_html, afetch_html
+from bs4 import SoupStrainer
+from html_parsing import make_soup
+import re
 import book
+
+SITE_NAME = "Macmillan Learning"
+# Publisher list prices rarely change
+CACHE_TTL = 24 * 60 * 60
+
+# The price block and the title link are all parse_html reads
+PRICE_AND_TITLE = SoupStrainer(["div", "a"], class_=re.compile(r"\b(priceandvaluetag|btn-search-icbutton)\b"))
+
 def search_macmillan(isbn):
     return f"https://www.macmillanlearning.com/college/us/search/?text={isbn}"
     
@@ -8,7 +18,15 @@ def parse(isbn):
     search_string = search_macmillan(isbn)
     html_string = fetch_html(url=search_string)
     print(search_string)
-    soup = BeautifulSoup(html_string, 'html.parser')
+    return parse_html(html_string, isbn, search_string)
+
+async def aparse(isbn, condition="", medium=""):
+    search_string = search_macmillan(isbn)
+    html_string = await afetch_html(url=search_string)
+    return parse_html(html_string, isbn, search_string)
+
+def parse_html(html_string, isbn, search_string):
+    soup = make_soup(html_string, only=PRICE_AND_TITLE)
     # CHECK IF THERE IS NOT A PRICE AND VALUE TAG
     if not soup.find("div",{"class" : "priceandvaluetag"}):
         raise book.BookError("Book not found on site!")
@@ -1,7 +1,28 @@
-from fetch_html import fetch_html
-from bs4 import BeautifulSoup
+from fetch_html import fetch_html, afetch_html
+from bs4 import SoupStrainer
+from html_parsing import make_soup, extract_within, ParseBudgetExceeded, Selector, SelectorSpec
+import os
 import re
+import time
 import book
+import structured_data
+
+SITE_NAME = "TextbookX"
+CACHE_TTL = 60 * 60
+
+# Seconds parse_html may spend on one page before giving up on it
+PARSE_BUDGET = float(os.getenv("BOOKMARK_TEXTBOOKX_PARSE_BUDGET", "1.0"))
+# Most characters of a page parse_html reads; anything after them is ignored,
+# so a huge page cannot run the structured-data scan or tree build past PARSE_BUDGET
+MAX_SCAN_CHARS = 200_000
+
+PRICE_TEXT = re.compile(r'\$\s*[\d,]+\.?\d*')
+PRICE_PATTERNS = [
+    re.compile(r'\$\s*([\d,]+\.?\d*)'),
+    re.compile(r'price[:\s]*\$?\s*([\d,]+\.?\d*)', re.I),
+    re.compile(r'([\d,]+\.?\d{2})\s*USD', re.I),
+]
+PAGE_PRICE = re.compile(r'\$\s*([\d,]+\.?\d{2})')
 
 def search_textbookx(isbn):
     """
@@ -18,6 +39,25 @@ def search_textbookx(isbn):
     # This is the actual search form action found on their homepage
     return f"https://www.textbookx.com/fastsearch2.php?s={isbn_str}"
 
+def _validate_isbn(isbn):
+    """
+    Validate ISBN format early to avoid unnecessary network requests.
+    
+    Returns:
+        int: The ISBN as an integer
+        
+    Raises:
+        book.BookError: If the ISBN is not 10 or 13 positive digits
+    """
+    isbn_str = str(isbn).replace('-', '').replace(' ', '')
+    try:
+        isbn_int = int(isbn_str)
+    except (ValueError, TypeError):
+        raise book.BookError(f"Invalid ISBN format: {isbn}")
+    if isbn_int <= 0 or len(isbn_str) not in [10, 13]:
+        raise book.BookError(f"Invalid ISBN format: {isbn}")
+    return isbn_int
+
 def parse(isbn):
     """
     Parse TextbookX to find book information by ISBN.
@@ -31,191 +71,176 @@ def parse(isbn):
     Raises:
         book.BookError: If book is not found or parsing fails
     """
+    _validate_isbn(isbn)
+    search_url = search_textbookx(isbn)
     try:
-        # Validate ISBN format early to avoid unnecessary network requests
-        isbn_str = str(isbn).replace('-', '').replace(' ', '')
-        try:
-            isbn_int = int(isbn_str)
-            if isbn_int <= 0 or len(isbn_str) not in [10, 13]:
-                raise book.BookError(f"Invalid ISBN format: {isbn}")
-        except (ValueError, TypeError):
-            raise book.BookError(f"Invalid ISBN format: {isbn}")
-        
-        search_url = search_textbookx(isbn)
-        
-        # Use the correct TextbookX search URL
-        try:
-            html_string = fetch_html(url=search_url)
-            # Check if we got a valid HTML response (not 404 or error page)
-            if not html_string or len(html_string) < 1000:
-                raise book.BookError("Received empty or invalid response from TextbookX")
-            if "404" in html_string[:1000].lower() or "not found" in html_string[:1000].lower():
-                raise book.BookError("Book not found on TextbookX")
-        except book.BookError:
-            raise
-        except Exception as e:
-            raise book.BookError(f"Could not access TextbookX search page: {str(e)}")
+        html_string = fetch_html(url=search_url)
+    except Exception as e:
+        raise book.BookError(f"Could not access TextbookX search page: {str(e)}")
+    return parse_html(html_string, isbn, search_url)
+
+async def aparse(isbn, condition="", medium=""):
+    """
+    Async version of parse; fetches without blocking the event loop.
+    """
+    _validate_isbn(isbn)
+    search_url = search_textbookx(isbn)
+    try:
+        html_string = await afetch_html(url=search_url)
+    except Exception as e:
+        raise book.BookError(f"Could not access TextbookX search page: {str(e)}")
+    return parse_html(html_string, isbn, search_url)
+
+def _price_from_text(text):
+    """Returns the first number in text if it is a plausible price, otherwise None."""
+    match = re.search(r'[\d,]+\.?\d*', text.replace('$', '').replace(',', ''))
+    if not match:
+        return None
+    try:
+        price = float(match.group())
+    except ValueError:
+        return None
+    return price if 1.0 <= price <= 10000.0 else None
+
+def _text_of(element):
+    # Tags have get_text; text nodes are already strings
+    return element.get_text(strip=True) if hasattr(element, 'get_text') else element.strip()
+
+def _has_price(element):
+    return _price_from_text(_text_of(element)) is not None
+
+def _has_title(element):
+    return len(element.get_text(strip=True)) > 3
+
+# Strategies in priority order, compiled once. Each field is resolved in a single
+# walk over the page (or the product), see html_parsing.extract.
+PRODUCT = SelectorSpec(
+    Selector('div', r'product|item|listing'),
+    Selector('div', r'book-card|book-item'),
+    Selector('li', r'product|item'),
+    Selector('article', r'product|book'),
+    Selector('div', r'product|item|book', within=Selector('div', r'results|search-results|products')),
+)
+TITLE = SelectorSpec(
+    Selector('h2', accept=_has_title),
+    Selector('h3', accept=_has_title),
+    Selector('h1', accept=_has_title),
+    Selector('a', r'title|name|book-title', accept=_has_title),
+    Selector('span', r'title|name', accept=_has_title),
+    Selector('div', r'title|name|book-title', accept=_has_title),
+    Selector('a', has_attr='href', accept=_has_title),
+)
+PRICE = SelectorSpec(
+    Selector('span', r'price|cost|amount', accept=_has_price),
+    Selector('div', r'price|cost|amount', accept=_has_price),
+    Selector('p', r'price|cost|amount', accept=_has_price),
+    Selector('strong', r'price', accept=_has_price),
+    Selector(text=PRICE_TEXT, accept=_has_price),
+)
+LINK = SelectorSpec(Selector('a', has_attr='href'))
+FIELDS = {'title': TITLE, 'price': PRICE, 'link': LINK}
+
+# Only the containers PRODUCT can match are built into a tree; class is still the raw string while parsing
+PRODUCT_TAGS = SoupStrainer(['div', 'li', 'article'],
+                            class_=re.compile(r'product|item|listing|book|results', re.I))
+
+def _absolute(href):
+    if href.startswith('http'):
+        return href
+    if href.startswith('/'):
+        return f"https://www.textbookx.com{href}"
+    return f"https://www.textbookx.com/{href}"
+
+def _scan_for_price(patterns, text):
+    """Tries each pattern over (the start of) text and returns the first plausible price."""
+    for pattern in patterns:
+        for match in pattern.findall(text[:MAX_SCAN_CHARS]):
+            price = _price_from_text(match)
+            if price is not None:
+                return price
+    return None
+
+def _check_budget(deadline):
+    if time.monotonic() > deadline:
+        raise ParseBudgetExceeded("Out of time")
+
+def parse_html(html_string, isbn, search_url):
+    """
+    Build a Book from an already fetched TextbookX search page.
+    
+    Args:
+        html_string (str): HTML of the search page
+        isbn: ISBN number (int or str)
+        search_url (str): URL the page was fetched from
         
-        soup = BeautifulSoup(html_string, 'html.parser')
+    Returns:
+        book.Book: Book object with information from TextbookX
         
-        # Strategy 1: Look for product cards or listings
-        # TextbookX typically uses product cards or listing items
-        product_result = None
+    Raises:
+        book.BookError: If book is not found, parsing fails or takes longer than PARSE_BUDGET
+    """
+    deadline = time.monotonic() + PARSE_BUDGET
+    try:
+        isbn_int = _validate_isbn(isbn)
         
-        # Try multiple selectors for product containers
-        product_selectors = [
-            ('div', {'class': re.compile(r'product|item|listing', re.I)}),
-            ('div', {'class': re.compile(r'book-card|book-item', re.I)}),
-            ('li', {'class': re.compile(r'product|item', re.I)}),
-            ('article', {'class': re.compile(r'product|book', re.I)}),
-        ]
+        # Check if we got a valid HTML response (not 404 or error page)
+        if not html_string or len(html_string) < 1000:
+            raise book.BookError("Received empty or invalid response from TextbookX")
+        if "404" in html_string[:1000].lower() or "not found" in html_string[:1000].lower():
+            raise book.BookError("Book not found on TextbookX")
         
-        for tag, attrs in product_selectors:
-            product_result = soup.find(tag, attrs)
-            if product_result:
-                break
+        page = html_string[:MAX_SCAN_CHARS]
         
-        # Strategy 2: Look for search results container
-        if not product_result:
-            results_container = soup.find('div', class_=re.compile(r'results|search-results|products', re.I))
-            if results_container:
-                product_result = results_container.find('div', class_=re.compile(r'product|item|book', re.I))
+        # Product JSON-LD / meta tags are exact and need no DOM
+        data = structured_data.extract_product(page)
+        if data is not None and 1.0 <= data.price <= 10000.0 and structured_data.describes_isbn(data, isbn):
+            structured_data.record_path(__name__, data.source)
+            return book.Book(
+                link=_absolute(data.link) if data.link else search_url,
+                title=data.title or "Book (TextbookX)",
+                isbn=isbn_int,
+                price=data.price,
+                condition=book.Condition.UNKNOWN,
+                medium=book.Medium.PHYSICAL,
+                image=data.image or ""
+            )
+        structured_data.record_path(__name__, "dom")
         
-        # Strategy 3: Look for any element with ISBN or book data
+        # Product card first, then any container around the ISBN's last 10 digits
+        isbn_str = str(isbn).replace('-', '').replace(' ', '')
+        product_spec = PRODUCT.extend(Selector(text=isbn_str[-10:], climb_to='div li article'))
+        _check_budget(deadline)
+        soup = make_soup(page, only=PRODUCT_TAGS)
+        product_result, found = extract_within(soup, product_spec, FIELDS, deadline)
         if not product_result:
-            # Try to find elements containing the ISBN
-            isbn_str = str(isbn).replace('-', '').replace(' ', '')
-            elements_with_isbn = soup.find_all(string=re.compile(isbn_str[-10:]))  # Last 10 digits
-            if elements_with_isbn:
-                # Find parent container
-                for elem in elements_with_isbn[:3]:  # Check first few matches
-                    parent = elem.find_parent(['div', 'li', 'article'])
-                    if parent:
-                        product_result = parent
-                        break
-        
+            # The ISBN may sit in an unlabelled container; look at the whole page
+            _check_budget(deadline)
+            soup = make_soup(page)
+            product_result, found = extract_within(soup, product_spec, FIELDS, deadline)
         if not product_result:
             raise book.BookError("No product results found on TextbookX")
         
-        # Extract title - try multiple strategies
-        title = None
-        
-        # Strategy 1: Look for title in common locations
-        title_selectors = [
-            ('h2', {}),
-            ('h3', {}),
-            ('h1', {}),
-            ('a', {'class': re.compile(r'title|name|book-title', re.I)}),
-            ('span', {'class': re.compile(r'title|name', re.I)}),
-            ('div', {'class': re.compile(r'title|name|book-title', re.I)}),
-        ]
-        
-        for tag, attrs in title_selectors:
-            title_elem = product_result.find(tag, attrs) if attrs else product_result.find(tag)
-            if title_elem:
-                title = title_elem.get_text(strip=True)
-                if title and len(title) > 3:
-                    break
-        
-        # Strategy 2: Look for title in link text
-        if not title or len(title) < 3:
-            title_link = product_result.find('a', href=True)
-            if title_link:
-                title = title_link.get_text(strip=True)
-                if title and len(title) > 3:
-                    pass  # Use this title
-        
-        # Strategy 3: Look for data attributes
-        if not title or len(title) < 3:
+        title = found['title'].get_text(strip=True) if found['title'] else None
+        if not title:
             title_attr = product_result.get('data-title') or product_result.get('data-name')
             if title_attr:
                 title = title_attr.strip()
         
-        # Extract price - try multiple strategies
-        price = None
-        
-        # Strategy 1: Look for price in common price classes
-        price_selectors = [
-            ('span', {'class': re.compile(r'price|cost|amount', re.I)}),
-            ('div', {'class': re.compile(r'price|cost|amount', re.I)}),
-            ('p', {'class': re.compile(r'price|cost|amount', re.I)}),
-            ('strong', {'class': re.compile(r'price', re.I)}),
-        ]
-        
-        for tag, attrs in price_selectors:
-            price_elem = product_result.find(tag, attrs)
-            if price_elem:
-                price_text = price_elem.get_text(strip=True)
-                # Extract numeric price
-                price_match = re.search(r'[\d,]+\.?\d*', price_text.replace('$', '').replace(',', ''))
-                if price_match:
-                    try:
-                        price = float(price_match.group())
-                        if 1.0 <= price <= 10000.0:  # Reasonable price range
-                            break
-                    except ValueError:
-                        continue
+        price = _price_from_text(_text_of(found['price'])) if found['price'] else None
         
-        # Strategy 2: Look for any text containing "$" and numbers
+        # Last resorts: regexes over the product's markup, then the page text
         if price is None:
-            price_elements = product_result.find_all(string=re.compile(r'\$\s*[\d,]+\.?\d*'))
-            for price_elem in price_elements:
-                price_text = price_elem.strip() if isinstance(price_elem, str) else price_elem.get_text(strip=True)
-                price_match = re.search(r'[\d,]+\.?\d*', price_text.replace('$', '').replace(',', ''))
-                if price_match:
-                    try:
-                        price = float(price_match.group())
-                        if 1.0 <= price <= 10000.0:
-                            break
-                    except (ValueError, AttributeError):
-                        continue
-        
-        # Strategy 3: Search entire product HTML for price patterns
-        if price is None:
-            product_html = str(product_result)
-            price_patterns = [
-                r'\$\s*([\d,]+\.?\d*)',
-                r'price[:\s]*\$?\s*([\d,]+\.?\d*)',
-                r'([\d,]+\.?\d{2})\s*USD',
-            ]
-            for pattern in price_patterns:
-                matches = re.findall(pattern, product_html, re.IGNORECASE)
-                for match in matches:
-                    try:
-                        price_val = float(match.replace(',', ''))
-                        if 1.0 <= price_val <= 10000.0:
-                            price = price_val
-                            break
-                    except ValueError:
-                        continue
-                if price:
-                    break
-        
-        # Strategy 4: Document-wide search as last resort
+            _check_budget(deadline)
+            price = _scan_for_price(PRICE_PATTERNS, str(product_result))
         if price is None:
-            all_text = soup.get_text()
-            dollar_matches = re.findall(r'\$\s*([\d,]+\.?\d{2})', all_text)
-            for match in dollar_matches[:5]:  # Check first 5 matches
-                try:
-                    price_val = float(match.replace(',', ''))
-                    if 1.0 <= price_val <= 10000.0:
-                        price = price_val
-                        break
-                except ValueError:
-                    continue
+            _check_budget(deadline)
+            matches = PAGE_PRICE.findall(page)[:5]
+            price = next((p for p in map(_price_from_text, matches) if p is not None), None)
         
         # Extract product link
         link = search_url  # Default to search URL
-        product_link = product_result.find('a', href=True)
-        if product_link:
-            href = product_link.get('href', '')
-            if href:
-                if href.startswith('http'):
-                    link = href
-                elif href.startswith('/'):
-                    link = f"https://www.textbookx.com{href}"
-                else:
-                    link = f"https://www.textbookx.com/{href}"
+        if found['link']:
+            link = _absolute(found['link'].get('href', ''))
         
         # Validate that we found essential information
         if price is None:
@@ -224,12 +249,10 @@ def parse(isbn):
         # Validate that we have a meaningful title (not just a fallback)
         if not title or len(title) < 3 or title == "Book (TextbookX)":
             # If we only have a fallback title and no real book data, it's likely not a valid result
-            # Check if we have other indicators of a real book
-            if price is None or link == search_url:
+            if link == search_url:
                 raise book.BookError("No valid book found on TextbookX")
             title = "Book (TextbookX)"  # Use fallback only if we have price/link
         
-        # Create and return Book object
         # TextbookX typically sells physical books, but could be either
         output = book.Book(
             link=link,
@@ -244,6 +267,8 @@ def parse(isbn):
         
     except book.BookError:
         raise
+    except ParseBudgetExceeded:
+        raise book.BookError(f"TextbookX page took longer than {PARSE_BUDGET}s to parse")
     except Exception as e:
         raise book.BookError(f"Error parsing TextbookX: {str(e)}")
 
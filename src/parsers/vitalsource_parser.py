@@ -1,7 +1,15 @@
-from fetch_html import fetch_html
-from bs4 import BeautifulSoup
+from fetch_html import fetch_html, afetch_html
+from bs4 import SoupStrainer
+from html_parsing import make_soup
 import re
 import book
+import structured_data
+
+SITE_NAME = "VitalSource"
+CACHE_TTL = 12 * 60 * 60
+
+# Title, og:title and the canonical link; the price comes from a regex over the raw page
+HEAD_TAGS = SoupStrainer(["title", "meta", "link"])
 
 def search_vitalsource(isbn):
     """
@@ -17,10 +25,45 @@ def parse(isbn):
     try:
         search_url = search_vitalsource(isbn)
         html_string = fetch_html(url=search_url)
+    except Exception as e:
+        raise book.BookError(f"Error parsing Vitalsource: {str(e)}")
+    return parse_html(html_string, isbn, search_url)
+
+async def aparse(isbn, condition="", medium=""):
+    """
+    Async version of parse; fetches without blocking the event loop.
+    """
+    try:
+        search_url = search_vitalsource(isbn)
+        html_string = await afetch_html(url=search_url)
+    except Exception as e:
+        raise book.BookError(f"Error parsing Vitalsource: {str(e)}")
+    return parse_html(html_string, isbn, search_url)
+
+def parse_html(html_string, isbn, search_url):
+    """
+    Build a Book from an already fetched Vitalsource search page.
+    """
+    try:
         if not html_string or len(html_string) < 500:
             raise book.BookError("Empty or invalid response from Vitalsource")
         
-        soup = BeautifulSoup(html_string, 'html.parser')
+        # Product JSON-LD / meta tags are exact and need no DOM
+        data = structured_data.extract_product(html_string)
+        if data is not None and 1.0 <= data.price <= 10000.0 and structured_data.describes_isbn(data, isbn):
+            structured_data.record_path(__name__, data.source)
+            return book.Book(
+                link=data.link or search_url,
+                title=(data.title or "Book (Vitalsource)").split('|')[0].strip(),
+                isbn=int(str(isbn).replace('-', '').replace(' ', '')),
+                price=data.price,
+                condition=book.Condition.UNKNOWN,
+                medium=book.Medium.EBOOK,
+                image=data.image or ""
+            )
+        structured_data.record_path(__name__, "dom")
+        
+        soup = make_soup(html_string, only=HEAD_TAGS)
         
         # Extract title from <title> or og:title
         title = None
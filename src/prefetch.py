@@ -0,0 +1,111 @@
+import os
+import time
+import logging
+import threading
+import concurrent.futures
+from collections import Counter
+from typing import Dict, Iterable
+
+import book_finder
+import google_books_api
+import metrics
+from cache import CacheState, TTLCache
+from title_index import normalize_query
+
+# Warm the Google Books and price caches for AI-recommended titles before anyone clicks them
+PREFETCH_ENABLED = os.getenv("BOOKMARK_PREFETCH", "1") == "1"
+# Titles resolved at once; kept small so prefetching never crowds out real searches
+PREFETCH_CONCURRENCY = int(os.getenv("BOOKMARK_PREFETCH_CONCURRENCY", "2"))
+# Titles waiting or running before new ones are dropped
+PREFETCH_QUEUE = int(os.getenv("BOOKMARK_PREFETCH_QUEUE", "50"))
+# Seconds before the same title is prefetched again; the caches keep the answers themselves
+PREFETCH_TTL = float(os.getenv("BOOKMARK_PREFETCH_TTL", "600"))
+# Longest a prefetch waits for user searches to finish before going ahead anyway
+PREFETCH_MAX_DEFER = float(os.getenv("BOOKMARK_PREFETCH_MAX_DEFER", "5"))
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PREFETCH_CONCURRENCY, thread_name_prefix="prefetch")
+_recent = TTLCache(max_entries=4096, default_ttl=PREFETCH_TTL)
+_stats: Counter = Counter()
+_lock = threading.Lock()
+_pending = 0
+_running = 0
+
+
+def prefetch_titles(titles: Iterable[str]) -> int:
+    """
+    Queue titles to be resolved to an ISBN and priced in the background.
+
+    Titles prefetched within PREFETCH_TTL are skipped, and titles beyond
+    PREFETCH_QUEUE waiting jobs are dropped rather than queued.
+
+    Returns:
+        int: How many titles were queued
+    """
+    global _pending
+    if not PREFETCH_ENABLED:
+        return 0
+    queued = 0
+    for title in titles:
+        key = normalize_query(title or "")
+        if not key:
+            continue
+        with _lock:
+            _, state = _recent.get(key)
+            if state is not CacheState.MISS:
+                _stats["duplicate"] += 1
+                continue
+            if _pending >= PREFETCH_QUEUE:
+                _stats["dropped"] += 1
+                continue
+            _recent.set(key, True)
+            _pending += 1
+            _stats["queued"] += 1
+        _executor.submit(_prefetch, title)
+        queued += 1
+    return queued
+
+
+def _user_searches_running() -> bool:
+    # Prefetches are searches too; anything beyond our own running ones came from a user
+    with _lock:
+        own = _running
+    return book_finder.active_searches() > own
+
+
+def _wait_for_idle():
+    """Lets user searches go first, for at most PREFETCH_MAX_DEFER seconds."""
+    deadline = time.monotonic() + PREFETCH_MAX_DEFER
+    while _user_searches_running() and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+
+def _prefetch(title: str):
+    global _pending, _running
+    outcome = "failed"
+    try:
+        _wait_for_idle()
+        with _lock:
+            _running += 1
+        try:
+            with metrics.timed("prefetch", retailer="") as timer:
+                # Same call and arguments as the Go_button_pushed handler, so it hits these cache entries
+                results = google_books_api.get_client().search_book_by_name(title)
+                if not results:
+                    timer.outcome = outcome = "not_found"
+                    return
+                found = book_finder.find_cheapest_book(results[0]['isbn'])
+                timer.outcome = outcome = "found" if found else "not_found"
+        finally:
+            with _lock:
+                _running -= 1
+    except Exception as e:
+        logging.error(f"Prefetch failed for {title}: {str(e)}")
+    finally:
+        with _lock:
+            _pending -= 1
+            _stats[outcome] += 1
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats, pending=_pending)
@@ -0,0 +1,152 @@
+import time
+import asyncio
+import threading
+from enum import Enum
+from typing import Dict
+
+
+class Throttled(Exception):
+    """
+    Raised when our own rate limit or per-host cap turns a request away
+    before it is sent. Says nothing about the remote host's health.
+    """
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take_or_wait(self) -> float:
+        """Take a token and return 0, or return how long until one is available."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for a token.
+
+        Returns:
+            bool: True if a token was taken, False if the wait timed out
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take_or_wait()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def aacquire(self, timeout: float) -> bool:
+        """Async version of acquire; sleeps on the event loop instead of the thread."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take_or_wait()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class BreakerState(Enum):
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency after repeated failures.
+
+    CLOSED: every call is allowed; `failure_threshold` consecutive failures open the breaker.
+    OPEN: calls are refused for `reset_timeout` seconds.
+    HALF_OPEN: up to `probes` trial calls are let through. That many successes
+    close the breaker again; any failure reopens it for another cool-down.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60, probes: int = 3):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.state = BreakerState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go ahead now. Every allowed call must be followed by
+        a record_* call, or release() if it never reached the dependency.
+        """
+        with self._lock:
+            if self.state is BreakerState.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = BreakerState.HALF_OPEN
+                self._probes_started = 0
+                self._probe_successes = 0
+            if self.state is BreakerState.HALF_OPEN:
+                if self._probes_started >= self.probes:
+                    return False
+                self._probes_started += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state is BreakerState.HALF_OPEN:
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self.state = BreakerState.CLOSED
+                    self._failures = 0
+            else:
+                self._failures = 0
+
+    def release(self):
+        """An allowed call was never made; a half-open breaker may let another probe through."""
+        with self._lock:
+            if self.state is BreakerState.HALF_OPEN and self._probes_started > 0:
+                self._probes_started -= 1
+
+    def record_failure(self):
+        with self._lock:
+            if self.state is BreakerState.HALF_OPEN:
+                self._open()
+                return
+            self._failures += 1
+            if self.state is BreakerState.CLOSED and self._failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = BreakerState.OPEN
+        self._opened_at = time.monotonic()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state is BreakerState.OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return {
+                "state": self.state.name.lower(),
+                "consecutive_failures": self._failures,
+                "retry_in": round(retry_in, 1),
+            }
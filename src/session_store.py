@@ -0,0 +1,73 @@
+import os
+import time
+import logging
+from typing import Dict, Optional
+
+from book import Book
+from cache import TTLCache
+from cache_backend import CacheBackend, get_backend
+
+# Seconds a session's result is kept; also the session cookie's max_age
+SESSION_TTL = int(os.getenv("BOOKMARK_SESSION_TTL", str(60 * 60 * 24)))
+# Sessions kept in process memory before the least recently used is dropped
+SESSION_MAX_ENTRIES = int(os.getenv("BOOKMARK_SESSION_MAX_ENTRIES", "10000"))
+
+
+class SessionStore:
+    """
+    The latest search result for each session cookie, for the /results page
+    and the AI recommendations that follow a search.
+
+    Entries expire after `ttl` seconds and at most `max_entries` are kept in
+    memory, least recently used dropped first. With a backend (see
+    cache_backend.py) every worker reads and writes the same records, so
+    /results works whichever worker served the search; the backend is read
+    first because another worker may have replaced the session's result.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES,
+                 backend: Optional[CacheBackend] = None, namespace: str = "sessions"):
+        self.ttl = ttl
+        self.backend = backend
+        self.namespace = namespace
+        self._local = TTLCache(max_entries=max_entries, default_ttl=ttl)
+
+    def get(self, session_id: Optional[str]) -> Optional[Book]:
+        if not session_id:
+            return None
+        if self.backend is not None:
+            try:
+                record = self.backend.get(self.namespace, session_id)
+                if record is not None and record.fresh_until > time.time():
+                    return Book.from_bytes(record.value)
+            except Exception as e:
+                logging.error(f"Session backend read failed: {str(e)}")
+        book, _ = self._local.get(session_id)
+        return book
+
+    def set(self, session_id: str, book: Book):
+        self._local.set(session_id, book, ttl=self.ttl)
+        if self.backend is not None:
+            try:
+                self.backend.set(self.namespace, session_id, book.to_bytes(), self.ttl)
+            except Exception as e:
+                logging.error(f"Session backend write failed: {str(e)}")
+
+    def delete(self, session_id: str):
+        self._local.delete(session_id)
+        if self.backend is not None:
+            try:
+                self.backend.delete(self.namespace, session_id)
+            except Exception as e:
+                logging.error(f"Session backend delete failed: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return self._local.stats()
+
+    def __len__(self):
+        return len(self._local)
+
+
+def create_store() -> SessionStore:
+    """A store sharing the BOOKMARK_CACHE_DB backend when one is configured."""
+    return SessionStore(backend=get_backend())
@@ -0,0 +1,294 @@
+import re
+import json
+import html
+import threading
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+JSON_LD = re.compile(r'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.I | re.S)
+META_TAG = re.compile(r'<meta\s[^>]*>', re.I)
+TAG = re.compile(r'<(/?)([a-zA-Z][\w:-]*)([^>]*)>')
+ITEMSCOPE = re.compile(r'\sitemscope\b', re.I)
+ATTRIBUTE = re.compile(r'([\w:-]+)\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)')
+TITLE_TAG = re.compile(r'<title[^>]*>(.*?)</title>', re.I | re.S)
+
+PRODUCT_TYPES = {"Product", "Book", "IndividualProduct", "ProductModel"}
+# Elements that never have a closing tag, so never contain itemprops
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Elements whose content is not markup
+RAW_TEXT_TAGS = {"script", "style"}
+
+# Which extraction path served each parse, per parser
+_path_counts: Dict[str, Dict[str, int]] = {}
+_path_lock = threading.Lock()
+
+
+class ProductData(NamedTuple):
+    title: Optional[str]
+    price: float
+    currency: Optional[str]
+    link: Optional[str]
+    image: Optional[str]
+    isbn: Optional[str]
+    source: str  # "json-ld", "opengraph" or "microdata"
+
+
+def _price(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        digits = re.sub(r"[^\d.]", "", value.replace(",", ""))
+        try:
+            return float(digits)
+        except ValueError:
+            return None
+    return None
+
+
+def _first(value: Any) -> Any:
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _text(value: Any) -> Optional[str]:
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get("url") or value.get("name")
+    return html.unescape(value).strip() if isinstance(value, str) and value.strip() else None
+
+
+def _types(node: Dict) -> set:
+    kind = node.get("@type", [])
+    return set(kind) if isinstance(kind, list) else {kind}
+
+
+def _walk(node: Any) -> Iterator[Dict]:
+    """Yields every JSON object in a JSON-LD document, including @graph members."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk(item)
+    elif isinstance(node, dict):
+        yield node
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                yield from _walk(value)
+
+
+def _offer_price(offers: Any) -> Tuple[Optional[float], Optional[str]]:
+    """Lowest price among Offer / AggregateOffer entries, with its currency."""
+    best, currency = None, None
+    for offer in offers if isinstance(offers, list) else [offers]:
+        if not isinstance(offer, dict):
+            continue
+        spec = offer.get("priceSpecification")
+        price = _price(offer.get("lowPrice", offer.get("price")))
+        if price is None and isinstance(spec, dict):
+            price = _price(spec.get("price"))
+        if price is not None and (best is None or price < best):
+            best, currency = price, offer.get("priceCurrency")
+    return best, currency
+
+
+def from_json_ld(page: str) -> Optional[ProductData]:
+    for block in JSON_LD.findall(page):
+        try:
+            document = json.loads(block.strip())
+        except ValueError:
+            continue
+        for node in _walk(document):
+            kinds = _types(node)
+            if kinds & PRODUCT_TYPES:
+                product, offers = node, node.get("offers")
+            elif "Offer" in kinds and isinstance(node.get("itemOffered"), dict):
+                product, offers = node["itemOffered"], node
+            else:
+                continue
+            price, currency = _offer_price(offers)
+            if price is None:
+                continue
+            return ProductData(
+                title=_text(product.get("name")),
+                price=price,
+                currency=currency,
+                link=_text(product.get("url")) or _text((offers if isinstance(offers, dict) else {}).get("url")),
+                image=_text(product.get("image")),
+                isbn=_text(product.get("isbn") or product.get("gtin13") or product.get("gtin") or product.get("sku")),
+                source="json-ld",
+            )
+    return None
+
+
+def _attributes(tag: str) -> Dict[str, str]:
+    return {name.lower(): html.unescape(value.strip("\"'")) for name, value in ATTRIBUTE.findall(tag)}
+
+
+def from_opengraph(page: str) -> Optional[ProductData]:
+    meta = {}
+    for tag in META_TAG.findall(page):
+        attrs = _attributes(tag)
+        key = (attrs.get("property") or attrs.get("name") or "").lower()
+        if key and "content" in attrs:
+            meta.setdefault(key, attrs["content"])
+    price = _price(meta.get("product:price:amount") or meta.get("og:price:amount"))
+    if price is None:
+        return None
+    return ProductData(
+        title=meta.get("og:title"),
+        price=price,
+        currency=meta.get("product:price:currency") or meta.get("og:price:currency"),
+        link=meta.get("og:url"),
+        image=meta.get("og:image"),
+        isbn=meta.get("books:isbn") or meta.get("book:isbn"),
+        source="opengraph",
+    )
+
+
+class _Scope:
+    """One itemscope: its schema.org types, its own itemprops, and the itemprop it fills in its parent."""
+
+    def __init__(self, types: set, parent: Optional["_Scope"], prop: str):
+        self.types = types
+        self.parent = parent
+        self.prop = prop
+        self.props: Dict[str, str] = {}
+
+
+def _microdata_scopes(page: str) -> List[_Scope]:
+    """
+    Every itemscope on the page, in document order, with each itemprop
+    assigned to the scope that directly contains it. A regex tag scan
+    that tracks open elements; no DOM is built.
+    """
+    scopes: List[_Scope] = []
+    # Open elements as (tag name, the scope it opened or None)
+    stack: List[Tuple[str, Optional[_Scope]]] = []
+    pos = 0
+    while True:
+        match = TAG.search(page, pos)
+        if match is None:
+            return scopes
+        pos = match.end()
+        closing, name, attributes = match.group(1), match.group(2).lower(), match.group(3)
+        if closing:
+            if any(open_name == name for open_name, _ in stack):
+                while stack.pop()[0] != name:
+                    pass
+            continue
+        if name in RAW_TEXT_TAGS:
+            end = page.lower().find(f"</{name}", pos)
+            pos = len(page) if end < 0 else end
+            continue
+        if "item" not in attributes:
+            if name not in VOID_TAGS and not attributes.rstrip().endswith("/"):
+                stack.append((name, None))
+            continue
+
+        attrs = _attributes(attributes)
+        owner = next((scope for _, scope in reversed(stack) if scope is not None), None)
+        props = attrs.get("itemprop", "").lower().split()
+        scope = None
+        if ITEMSCOPE.search(attributes):
+            types = {t.rstrip("/").rsplit("/", 1)[-1] for t in attrs.get("itemtype", "").split()}
+            scope = _Scope(types, owner, props[0] if props else "")
+            scopes.append(scope)
+        elif props and owner is not None:
+            end = page.find("<", pos)
+            inner = page[pos:end if end >= 0 else len(page)]
+            value = attrs.get("content") or attrs.get("href") or attrs.get("src") or html.unescape(inner).strip()
+            if value:
+                for prop in props:
+                    owner.props.setdefault(prop, value)
+        if name not in VOID_TAGS and not attributes.rstrip().endswith("/"):
+            stack.append((name, scope))
+
+
+def from_microdata(page: str) -> Optional[ProductData]:
+    """
+    Reads the first Product/Book itemscope with a price, from its own
+    itemprops and those of its offers. On a page listing several products,
+    one that does not state its ISBN is not trusted, since it may be any of them.
+    """
+    if "itemscope" not in page:
+        return None
+    scopes = _microdata_scopes(page)
+    products = [scope for scope in scopes if scope.types & PRODUCT_TYPES]
+    for product in products:
+        props = product.props
+        offers = [s.props for s in scopes if s.parent is product and s.prop == "offers"]
+        priced = []
+        for source in [props] + offers:
+            price = _price(source.get("price"))
+            if price is not None:
+                priced.append((price, source.get("pricecurrency")))
+        if not priced:
+            continue
+        price, currency = min(priced, key=lambda pc: pc[0])
+        isbn = props.get("isbn") or props.get("gtin13")
+        if not isbn and len(products) > 1:
+            return None
+        return ProductData(
+            title=props.get("name"),
+            price=price,
+            currency=currency or props.get("pricecurrency"),
+            link=props.get("url"),
+            image=props.get("image"),
+            isbn=isbn,
+            source="microdata",
+        )
+    return None
+
+
+def extract_product(page: str, currency: str = "USD") -> Optional[ProductData]:
+    """
+    Reads product data from a page's structured markup without building a DOM.
+
+    Tries schema.org JSON-LD, then OpenGraph product meta tags, then
+    itemprop microdata.
+
+    Args:
+        page: HTML content as a string
+        currency: Prices marked with any other currency are ignored
+
+    Returns:
+        Optional[ProductData]: The first product with a usable price, or None
+    """
+    for reader in (from_json_ld, from_opengraph, from_microdata):
+        data = reader(page)
+        if data is not None and (not data.currency or data.currency.upper() == currency):
+            if data.title is None:
+                match = TITLE_TAG.search(page)
+                title = html.unescape(match.group(1)).strip() if match else ""
+                data = data._replace(title=title or None)
+            return data
+    return None
+
+
+def record_path(parser: str, path: str):
+    """Counts which extraction path ("json-ld", "opengraph", "microdata" or "dom") a parser used."""
+    with _path_lock:
+        counts = _path_counts.setdefault(parser, {})
+        counts[path] = counts.get(path, 0) + 1
+
+
+def path_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-parser path counts and the share of parses served from structured data."""
+    with _path_lock:
+        stats = {}
+        for parser, counts in _path_counts.items():
+            total = sum(counts.values())
+            structured = total - counts.get("dom", 0)
+            stats[parser] = dict(counts, structured_hit_rate=round(structured / total, 3) if total else 0.0)
+        return stats
+
+
+def _isbn_core(value: str) -> str:
+    # ISBN-10 and its 978 ISBN-13 share nine digits; only the prefix and check digit differ
+    digits = re.sub(r"[^\dXx]", "", str(value))
+    if len(digits) == 13 and digits.startswith("978"):
+        return digits[3:12]
+    if len(digits) == 10:
+        return digits[:9]
+    return digits
+
+
+def describes_isbn(data: ProductData, isbn) -> bool:
+    """False only when the structured data names a different ISBN than the one searched for."""
+    return not data.isbn or _isbn_core(data.isbn) == _isbn_core(isbn)
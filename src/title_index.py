@@ -0,0 +1,313 @@
+import os
+import re
+import heapq
+import difflib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Books remembered per process; the one seen least recently is forgotten first
+INDEX_MAX_ENTRIES = int(os.getenv("BOOKMARK_TITLE_INDEX_ENTRIES", "50000"))
+# Entry ids kept on each trie node, best ranked first; bounds how many suggestions one prefix can give
+TOP_K = 16
+# Share of query words an entry must contain to be suggested
+MIN_COVERAGE = 0.5
+# Most recently seen entries considered per query word, so common words like "edition" stay cheap
+CANDIDATES_PER_WORD = 200
+# How close a misspelled word must be to a known one (difflib ratio) to count as a match
+FUZZY_CUTOFF = 0.8
+# Known words sharing the most letter pairs with a misspelled word that difflib compares it with
+FUZZY_CANDIDATES = 100
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+# Fields from GoogleBooksAPI._extract_book_info returned by suggest()
+SUGGEST_FIELDS = ("title", "author", "isbn", "isbn_10", "isbn_13", "thumbnail")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Folds case, punctuation and runs of whitespace, so "Clean Code:  A Handbook"
+    and "clean code a handbook" match. Also the Google Books search cache key.
+    """
+    folded = _PUNCTUATION.sub(" ", text.casefold())
+    return _WHITESPACE.sub(" ", folded).strip()
+
+
+def _pairs(word: str) -> Set[str]:
+    return {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+def _close_words(word: str, known: List[str]) -> List[str]:
+    """The known words difflib rates closest to word, checking only those sharing the most letter pairs."""
+    pairs = _pairs(word)
+    if len(known) > FUZZY_CANDIDATES:
+        known = heapq.nlargest(FUZZY_CANDIDATES, known, key=lambda w: len(pairs & _pairs(w)))
+    return difflib.get_close_matches(word, known, n=3, cutoff=FUZZY_CUTOFF)
+
+
+class _Node:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.ids: List[int] = []
+
+
+class PrefixTrie:
+    """
+    Character trie whose nodes each keep the TOP_K best-ranked ids stored
+    under them, so a prefix lookup is one walk down the key with no subtree
+    scan. `ranks` maps an id to its rank, higher first; inserting an id
+    again after raising its rank moves it up, and evicts the lowest-ranked
+    id from nodes that are full.
+    """
+
+    def __init__(self, ranks: Dict[int, int]):
+        self.root = _Node()
+        self.ranks = ranks
+
+    def insert(self, key: str, entry_id: int):
+        node = self.root
+        self._keep(node, entry_id)
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _Node()
+            node = child
+            self._keep(node, entry_id)
+
+    def remove(self, key: str, entry_id: int):
+        node = self.root
+        path = [node]
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                break
+            path.append(node)
+        for node in path:
+            if entry_id in node.ids:
+                node.ids.remove(entry_id)
+
+    def prefix(self, key: str) -> List[int]:
+        node = self.root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return list(node.ids)
+
+    def _keep(self, node: _Node, entry_id: int):
+        ids, ranks = node.ids, self.ranks
+        rank = ranks[entry_id]
+        if entry_id in ids:
+            ids.remove(entry_id)
+        elif len(ids) >= TOP_K and rank <= ranks[ids[-1]]:
+            return
+        # Usually the newest entry, so this stops at the front
+        i = 0
+        while i < len(ids) and ranks[ids[i]] > rank:
+            i += 1
+        ids.insert(i, entry_id)
+        if len(ids) > TOP_K:
+            ids.pop()
+
+
+class TitleIndex:
+    """
+    Every book Google Books has resolved for this process, searchable by
+    title prefix, by words anywhere in the title or author, and by ISBN.
+
+    Entries are ranked by when they were last seen, so books people search
+    for now outrank ones from weeks ago. A title search's results rank in
+    Google's order, so among editions sharing a title the one Google ranked
+    first wins.
+
+    lookup() only answers a title that an earlier title search for exactly
+    that text returned; other entries may be side results of unrelated searches.
+    """
+
+    def __init__(self, max_entries: int = INDEX_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._by_isbn: Dict[str, int] = {}
+        # Normalized query to the result it returned whose title is that same text
+        self._answers: Dict[str, int] = {}
+        self._tokens: Dict[str, Set[int]] = {}
+        # Known words by first letter and length, the candidates for correcting a misspelled word
+        self._vocabulary: Dict[Tuple[str, int], Set[str]] = {}
+        # Entry id to when it was last seen, on the _clock scale
+        self._ranks: Dict[int, int] = {}
+        self._clock = 0
+        self._titles = PrefixTrie(self._ranks)
+        self._token_prefixes = PrefixTrie(self._ranks)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def add(self, book_info: Dict):
+        """Index one GoogleBooksAPI._extract_book_info record; ISBNs already indexed are ignored."""
+        with self._lock:
+            self._add(book_info)
+
+    def add_many(self, book_infos: Iterable[Dict], query: Optional[str] = None):
+        """
+        Index several records, e.g. one title search's results in Google's order.
+
+        Args:
+            book_infos: GoogleBooksAPI._extract_book_info records, best first
+            query: The title search that returned them; its first result titled
+                exactly like the query then answers lookup() for that title
+        """
+        norm = normalize_query(query) if query else ""
+        with self._lock:
+            # Last added ranks highest, so add the best result last
+            for book_info in reversed(list(book_infos)):
+                entry_id = self._add(book_info)
+                if (norm and entry_id is not None
+                        and normalize_query(book_info.get("title") or "") == norm):
+                    self._answers[norm] = entry_id
+
+    def _add(self, book_info: Dict) -> Optional[int]:
+        """
+        Adds the record, or marks it seen again if one of its ISBNs is known.
+        Returns its entry id, or None if it cannot be indexed.
+        """
+        isbns = [i for i in (book_info.get("isbn_13"), book_info.get("isbn_10"), book_info.get("isbn")) if i]
+        title = normalize_query(book_info.get("title") or "")
+        if not isbns or not title:
+            return None
+        known = next((self._by_isbn[i] for i in isbns if i in self._by_isbn), None)
+        if known is not None:
+            self._touch(known)
+            return known
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = dict(book_info)
+        self._clock += 1
+        self._ranks[entry_id] = self._clock
+        for isbn in isbns:
+            self._by_isbn[isbn] = entry_id
+        self._titles.insert(title, entry_id)
+        for token in self._entry_tokens(book_info):
+            self._tokens.setdefault(token, set()).add(entry_id)
+            self._vocabulary.setdefault((token[0], len(token)), set()).add(token)
+            self._token_prefixes.insert(token, entry_id)
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+        return entry_id if entry_id in self._entries else None
+
+    def lookup(self, query: str) -> Optional[Dict]:
+        """
+        The entry a title search can use without asking Google, or None.
+
+        That is the entry with that ISBN, or the first result titled exactly
+        like the query that an earlier search for the same normalized text
+        returned. A title only seen as a side result of another search
+        ("Biology" from "campbell biology") still goes to Google.
+        """
+        norm = normalize_query(query)
+        with self._lock:
+            entry_id = self._answers.get(norm)
+            if entry_id is None:
+                entry_id = self._by_isbn.get(norm.replace(" ", "").upper())
+            if entry_id is None:
+                return None
+            self._touch(entry_id)
+            return dict(self._entries[entry_id])
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict]:
+        """
+        Typeahead matches, best first: titles starting with the query, then
+        titles and authors containing most of its words. The last word may be
+        partial, and misspelled words match their closest known word.
+        """
+        norm = normalize_query(query)
+        if not norm:
+            return []
+        words = norm.split(" ")
+        with self._lock:
+            title_ids = self._titles.prefix(norm)
+            word_ids = []
+            unknown: Dict[int, List[str]] = {}
+            for i, word in enumerate(words):
+                ids = self._tokens.get(word, set())
+                if i == len(words) - 1:
+                    ids = ids.union(self._token_prefixes.prefix(word))
+                if not ids:
+                    unknown[i] = self._similar_length(word)
+                word_ids.append(ids)
+
+        # Typo correction is the slow part, so it runs without holding up add()
+        corrections = {i: _close_words(words[i], known) for i, known in unknown.items()}
+
+        with self._lock:
+            for i, close_words in corrections.items():
+                word_ids[i] = set().union(*(self._tokens.get(w, ()) for w in close_words))
+            scores: Dict[int, float] = {e: 2.0 for e in title_ids if e in self._ranks}
+
+            candidates = set()
+            for ids in word_ids:
+                candidates.update(ids if len(ids) <= CANDIDATES_PER_WORD
+                                  else heapq.nlargest(CANDIDATES_PER_WORD, ids, key=self._ranks.__getitem__))
+            for entry_id in candidates:
+                if entry_id not in self._ranks:
+                    continue
+                coverage = sum(1 for ids in word_ids if entry_id in ids) / len(words)
+                if coverage >= MIN_COVERAGE:
+                    scores[entry_id] = max(scores.get(entry_id, 0.0), coverage)
+
+            ranked = sorted(scores, key=lambda e: (-scores[e], -self._ranks[e]))[:limit]
+            return [{f: self._entries[e].get(f) for f in SUGGEST_FIELDS} for e in ranked]
+
+    def _similar_length(self, word: str) -> List[str]:
+        """
+        Known words with the same first letter whose length allows a difflib
+        ratio of FUZZY_CUTOFF, i.e. the shorter is at least that share of the
+        pair's average length.
+        """
+        low = int(len(word) * FUZZY_CUTOFF / (2 - FUZZY_CUTOFF))
+        high = int(len(word) * (2 - FUZZY_CUTOFF) / FUZZY_CUTOFF)
+        return [w for n in range(max(low, 1), high + 1) for w in self._vocabulary.get((word[0], n), ())]
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry_tokens(book_info: Dict) -> Set[str]:
+        text = f"{book_info.get('title') or ''} {book_info.get('author') or ''}"
+        tokens = set(normalize_query(text).split())
+        tokens.update(i for i in (book_info.get("isbn_13"), book_info.get("isbn_10")) if i)
+        return tokens
+
+    def _touch(self, entry_id: int):
+        """Marks an entry as just seen: it ranks first and is forgotten last."""
+        self._clock += 1
+        self._ranks[entry_id] = self._clock
+        self._entries.move_to_end(entry_id)
+        book_info = self._entries[entry_id]
+        self._titles.insert(normalize_query(book_info.get("title") or ""), entry_id)
+        for token in self._entry_tokens(book_info):
+            self._token_prefixes.insert(token, entry_id)
+
+    def _forget(self, entry_id: int):
+        book_info = self._entries.pop(entry_id)
+        for isbn in (book_info.get("isbn_13"), book_info.get("isbn_10"), book_info.get("isbn")):
+            if isbn and self._by_isbn.get(isbn) == entry_id:
+                del self._by_isbn[isbn]
+        title = normalize_query(book_info.get("title") or "")
+        if self._answers.get(title) == entry_id:
+            del self._answers[title]
+        self._titles.remove(title, entry_id)
+        for token in self._entry_tokens(book_info):
+            ids = self._tokens.get(token)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._tokens[token]
+                    self._vocabulary[(token[0], len(token))].discard(token)
+            self._token_prefixes.remove(token, entry_id)
+        del self._ranks[entry_id]
+
+
+index = TitleIndex()
@@ -0,0 +1,155 @@
+import os
+import time
+import uuid
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Finished and in-progress traces kept per process, oldest dropped first
+TRACE_LIMIT = int(os.getenv("BOOKMARK_TRACE_LIMIT", "500"))
+
+
+class Span:
+    """One timed stage of a search. Children are stages that ran inside it."""
+
+    def __init__(self, name: str, trace: "Trace", tags: Optional[Dict] = None):
+        self.name = name
+        self.trace = trace
+        self.tags = dict(tags or {})
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.error: Optional[str] = None
+        self.children: List["Span"] = []
+
+    def child(self, name: str, **tags) -> "Span":
+        span = Span(name, self.trace, tags)
+        with self.trace.lock:
+            self.children.append(span)
+        return span
+
+    def finish(self, error: Optional[BaseException] = None):
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.end = time.time()
+
+    def to_dict(self, origin: float) -> Dict:
+        return {
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((self.end - self.start) * 1000, 3) if self.end is not None else None,
+            "tags": dict(self.tags),
+            "error": self.error,
+            "children": [c.to_dict(origin) for c in sorted(list(self.children), key=lambda c: c.start)],
+        }
+
+
+class Trace:
+    """The span tree for one search, looked up by its search ID."""
+
+    def __init__(self, name: str, tags: Optional[Dict] = None):
+        self.trace_id = uuid.uuid4().hex
+        self.lock = threading.Lock()
+        self.root = Span(name, self, tags)
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            root = self.root.to_dict(self.root.start)
+        return {"search_id": self.trace_id, "complete": self.root.end is not None, "root": root}
+
+
+_traces: "OrderedDict[str, Trace]" = OrderedDict()
+_traces_lock = threading.Lock()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("bookmark_span", default=None)
+
+
+def _remember(trace: Trace):
+    with _traces_lock:
+        _traces[trace.trace_id] = trace
+        while len(_traces) > TRACE_LIMIT:
+            _traces.popitem(last=False)
+
+
+def get_trace(trace_id: str) -> Optional[Trace]:
+    with _traces_lock:
+        return _traces.get(trace_id)
+
+
+def current_trace() -> Optional[Trace]:
+    span = _current_span.get()
+    return span.trace if span is not None else None
+
+
+@contextmanager
+def _activate(span: Span) -> Iterator[Span]:
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.finish(e)
+        raise
+    else:
+        span.finish()
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **tags) -> Iterator[Trace]:
+    """
+    Starts a new trace whose root span covers the block. Spans opened in the
+    block, including on threads started through propagate(), become its children.
+    """
+    trace = Trace(name, tags)
+    _remember(trace)
+    with _activate(trace.root):
+        yield trace
+
+
+@contextmanager
+def resume(trace_id: Optional[str], name: str, **tags) -> Iterator[Optional[Span]]:
+    """
+    Adds a span under the root of an earlier trace, for work that belongs to
+    a search but arrives as a separate request (e.g. the AI recommendations).
+    Does nothing if the trace has been forgotten.
+    """
+    trace = get_trace(trace_id) if trace_id else None
+    if trace is None:
+        yield None
+        return
+    with _activate(trace.root.child(name, **tags)) as span:
+        yield span
+
+
+@contextmanager
+def span(name: str, **tags) -> Iterator[Optional[Span]]:
+    """
+    Times a block as a child of the current span. Outside a trace this is a
+    no-op and yields None, so callers can use it unconditionally.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    with _activate(parent.child(name, **tags)) as child:
+        yield child
+
+
+def event(name: str, **tags):
+    """Records a zero-length span, e.g. for a stage answered from cache."""
+    parent = _current_span.get()
+    if parent is not None:
+        parent.child(name, **tags).finish()
+
+
+def propagate(fn):
+    """Wraps fn to run in a copy of the caller's context, for submitting to another thread."""
+    # A Context can only be entered by one thread at a time, so copy once per submit
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return run
@@ -6,6 +6,9 @@ const aiResults = aiContainer.querySelector("#aiResults");
 
 const currentBook = aiContainer.dataset.title;
 
+// Recommendations already drawn from ai_recommendation events
+let streamed = [];
+
 aiButton.addEventListener("click", () => {
     aiResults.innerHTML = "<p>Loading recommendations...</p>";
     aiButton.style.display = "none"; 
@@ -13,47 +16,65 @@ aiButton.addEventListener("click", () => {
     let history = JSON.parse(localStorage.getItem("searches") || "[]");
     history = history.slice(-5);
 
+    streamed = [];
     socket.emit("get_ai_recommendations", {
         currentBook,
-        history
+        history,
+        stream: true
     });
 });
 
+socket.on("ai_recommendation", (data) => {
+    if (streamed.length === 0) {
+        aiResults.innerHTML = "";
+    }
+    renderRecommendation(data.recommendation, data.index);
+    streamed.push(data.recommendation);
+});
+
 socket.on("ai_recommendations", (books) => {
+    // The full list usually repeats what was streamed; redraw only if it differs,
+    // e.g. the stream broke off and the server sent its placeholder instead
+    const same = streamed.length === books.length && books.every((book, i) =>
+        book.title === streamed[i].title && book.summary === streamed[i].summary);
+    if (streamed.length > 0 && same) {
+        return;
+    }
     aiResults.innerHTML = "";
+    books.forEach((book, index) => renderRecommendation(book, index));
+});
 
-    books.forEach((book, index) => {
-        const container = document.createElement("div");
-        container.style.display = "flex";
-        container.style.justifyContent = "space-between";
-        container.style.alignItems = "center";
-        container.style.marginBottom = "10px";
-        container.style.padding = "10px";
-        container.style.borderBottom = "1px solid #ccc";
-        container.style.flexWrap = "wrap";
-
-        const p = document.createElement("p");
-        p.style.margin = "0 10px 0 0";
-        p.style.flex = "1 1 auto";
-        p.innerHTML = `${index + 1}. <strong>${book.title}</strong>: ${book.summary}`;
+function renderRecommendation(book, index) {
+    const container = document.createElement("div");
+    container.style.display = "flex";
+    container.style.justifyContent = "space-between";
+    container.style.alignItems = "center";
+    container.style.marginBottom = "10px";
+    container.style.padding = "10px";
+    container.style.borderBottom = "1px solid #ccc";
+    container.style.flexWrap = "wrap";
 
-        const btn = document.createElement("button");
-        btn.textContent = "Check Optimal Price";
-        btn.className = "goToSiteButton";
-        btn.style.height = "30px";
-        btn.style.fontSize = "13px";
-        btn.style.flex = "0 0 auto";
-        btn.style.padding = "5px 10px";
+    const p = document.createElement("p");
+    p.style.margin = "0 10px 0 0";
+    p.style.flex = "1 1 auto";
+    p.innerHTML = `${index + 1}. <strong>${book.title}</strong>: ${book.summary}`;
 
-        btn.addEventListener("click", () => {
-            socket.emit("Go_button_pushed", { search: book.title });
-        });
+    const btn = document.createElement("button");
+    btn.textContent = "Check Optimal Price";
+    btn.className = "goToSiteButton";
+    btn.style.height = "30px";
+    btn.style.fontSize = "13px";
+    btn.style.flex = "0 0 auto";
+    btn.style.padding = "5px 10px";
 
-        container.appendChild(p);
-        container.appendChild(btn);
-        aiResults.appendChild(container);
+    btn.addEventListener("click", () => {
+        socket.emit("Go_button_pushed", { search: book.title });
     });
-});
+
+    container.appendChild(p);
+    container.appendChild(btn);
+    aiResults.appendChild(container);
+}
 
 // Listen for server redirect
 socket.on("redirect", (url) => {
@@ -26,10 +26,11 @@ document.getElementById('go_button').addEventListener("click", () => {
     updateHistoryDisplay();
 
     // Show loading screen
+    resetPartialResults();
     document.getElementById("loading-screen-overlay").style.display = "flex";
 
     try {
-        socket.emit("Go_button_pushed", { search: query, condition: conditionFilter, medium: mediumFilter });
+        socket.emit("Go_button_pushed", { search: query, condition: conditionFilter, medium: mediumFilter, stream: true });
     } catch (err) {
         console.warn("Socket error: ", err);
         document.getElementById("loading-screen-overlay").style.display = "none";
@@ -43,6 +44,36 @@ socket.on('redirect', (url) => {
     window.location.href = url;
 });
 
+function resetPartialResults() {
+    document.getElementById("best-so-far").textContent = "";
+    document.getElementById("retailer-results").innerHTML = "";
+}
+
+function formatPrice(price) {
+    return "$" + Number(price).toFixed(2);
+}
+
+// Each retailer's answer arrives as soon as that retailer responds
+socket.on('partial_result', (data) => {
+    const item = document.createElement("li");
+    item.textContent = data.found
+        ? `${data.retailer}: ${formatPrice(data.book.price)}`
+        : `${data.retailer}: not available`;
+    document.getElementById("retailer-results").appendChild(item);
+});
+
+socket.on('best_so_far', (data) => {
+    document.getElementById("best-so-far").textContent =
+        `Best so far: ${formatPrice(data.book.price)} at ${data.retailer}`;
+});
+
+socket.on('search_complete', (data) => {
+    if (data.found) {
+        document.getElementById("best-so-far").textContent =
+            `Best price: ${formatPrice(data.book.price)}`;
+    }
+});
+
 // Optional: handle search errors
 socket.on('search_error', (data) => {
     alert(data.error || "Search failed");
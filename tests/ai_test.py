@@ -2,7 +2,9 @@ import unittest
 from unittest.mock import patch, MagicMock
 import os
 import sys
+import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+import ai
 from ai import get_recommendations   
 
 class TestRecommendations(unittest.TestCase):
@@ -38,5 +40,149 @@ class TestRecommendations(unittest.TestCase):
         recs = get_recommendations("Harry Potter", "The Hobbit")
         self.assertTrue(isinstance(recs, list))
 
+class TestClientAndCache(unittest.TestCase):
+
+    def setUp(self):
+        ai._client = None
+        ai.recommendation_cache.clear()
+
+    def tearDown(self):
+        # Don't hand this test's mock client or answers to other tests
+        self.setUp()
+
+    def mock_client(self, mock_client_class):
+        mock_client = MagicMock()
+        mock_client.models.generate_content.return_value.text = '[{"title": "Book A", "summary": "Summary A"}]'
+        mock_client_class.return_value = mock_client
+        return mock_client
+
+    @patch("ai.genai.Client")
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake"})
+    def test_client_is_reused(self, mock_client_class):
+        self.mock_client(mock_client_class)
+        self.assertIs(ai.get_client(), ai.get_client())
+        self.assertEqual(mock_client_class.call_count, 1)
+
+    @patch("ai.genai.Client")
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake"})
+    def test_repeat_request_is_cached(self, mock_client_class):
+        mock_client = self.mock_client(mock_client_class)
+        first = get_recommendations(["1984", "Brave New World"], "Dune")
+        first[0]["title"] = "changed"
+        second = get_recommendations(["brave new world!", "1984"], "  DUNE ")
+
+        self.assertEqual(second[0]["title"], "Book A")
+        self.assertEqual(mock_client.models.generate_content.call_count, 1)
+
+    @patch("ai.genai.Client")
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake"})
+    def test_failures_are_not_cached(self, mock_client_class):
+        mock_client = self.mock_client(mock_client_class)
+        mock_client.models.generate_content.side_effect = RuntimeError("quota")
+        self.assertIn("No AI recommendations", get_recommendations([], "Dune")[0]["summary"])
+        mock_client.models.generate_content.side_effect = None
+        self.assertEqual(get_recommendations([], "Dune")[0]["title"], "Book A")
+
+
+class TestJsonArrayParser(unittest.TestCase):
+
+    def test_objects_arrive_as_they_close(self):
+        parser = ai.JsonArrayParser()
+        self.assertEqual(parser.feed('```json\n[{"title": "A", "sum'), [])
+        self.assertEqual(parser.feed('mary": "has } and \\" in it"}, {"ti'), [{"title": "A", "summary": 'has } and " in it'}])
+        self.assertEqual(parser.feed('tle": "B", "summary": {"nested": 1}}]\n```'), [{"title": "B", "summary": {"nested": 1}}])
+
+    def test_one_character_at_a_time(self):
+        parser = ai.JsonArrayParser()
+        text = '[{"title": "A", "summary": "x"}, {"title": "B", "summary": "y"}]'
+        items = [item for ch in text for item in parser.feed(ch)]
+        self.assertEqual([i["title"] for i in items], ["A", "B"])
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        ai._client = None
+        ai.recommendation_cache.clear()
+
+    def tearDown(self):
+        self.setUp()
+
+    def stream_client(self, mock_client_class, pieces):
+        mock_client = MagicMock()
+        mock_client.models.generate_content_stream.return_value = [MagicMock(text=p) for p in pieces]
+        mock_client_class.return_value = mock_client
+        return mock_client
+
+    @patch("ai.genai.Client")
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake"})
+    def test_items_are_passed_on_while_streaming(self, mock_client_class):
+        pieces = ['[{"title": "Book A", "summary": "A"},', ' {"title": "Book B", ', '"summary": "B"}]']
+        mock_client = self.stream_client(mock_client_class, pieces)
+        seen = []
+        recs = get_recommendations(["1984"], "Dune", on_item=seen.append)
+
+        self.assertEqual([r["title"] for r in seen], ["Book A", "Book B"])
+        self.assertEqual(recs, seen)
+        mock_client.models.generate_content.assert_not_called()
+
+        # A repeat is answered from the cache, still one item at a time
+        again = []
+        get_recommendations(["1984"], "Dune", on_item=again.append)
+        self.assertEqual(again, seen)
+        self.assertEqual(mock_client.models.generate_content_stream.call_count, 1)
+
+    @patch("ai.genai.Client")
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake"})
+    def test_non_json_reply_falls_back(self, mock_client_class):
+        self.stream_client(mock_client_class, ["Title: Book A Summary: ", "About A\n"])
+        seen = []
+        recs = get_recommendations([], "Dune", on_item=seen.append)
+        self.assertEqual(recs, [{"title": "Book A", "summary": "About A"}])
+        self.assertEqual(seen, recs)
+
+
+class TestSocketHandler(unittest.TestCase):
+
+    def test_recommendations_arrive_from_background_task(self):
+        from flask_server import app, socketio
+        client = socketio.test_client(app)
+        recs = [{"title": "Book A", "summary": "Summary A"}]
+        with patch("flask_server.get_recommendations", return_value=recs), patch("prefetch.prefetch_titles"):
+            client.emit("get_ai_recommendations", {"currentBook": "Dune", "history": []})
+            received = []
+            for _ in range(50):
+                received = [e for e in client.get_received() if e["name"] == "ai_recommendations"]
+                if received:
+                    break
+                time.sleep(0.02)
+        client.disconnect()
+        self.assertEqual(received[0]["args"][0], recs)
+
+    def test_streaming_emits_each_item_first(self):
+        from flask_server import app, socketio
+        recs = [{"title": "Book A", "summary": "A"}, {"title": "Book B", "summary": "B"}]
+
+        def fake(history, current_book, on_item=None):
+            for rec in recs:
+                on_item(rec)
+            return recs
+
+        client = socketio.test_client(app)
+        with patch("flask_server.get_recommendations", side_effect=fake), patch("prefetch.prefetch_titles") as queued:
+            client.emit("get_ai_recommendations", {"currentBook": "Dune", "history": [], "stream": True})
+            events = []
+            for _ in range(50):
+                events += client.get_received()
+                if any(e["name"] == "ai_recommendations" for e in events):
+                    break
+                time.sleep(0.02)
+        client.disconnect()
+        names = [e["name"] for e in events]
+        self.assertEqual(names, ["ai_recommendation", "ai_recommendation", "ai_recommendations"])
+        self.assertEqual(events[1]["args"][0], {"index": 1, "recommendation": recs[1]})
+        queued.assert_any_call(["Book A"])
+
+
 if __name__ == "__main__":
     unittest.main()
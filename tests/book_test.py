@@ -0,0 +1,81 @@
+import unittest
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from book import Book, Condition, Medium, decode_books, encode_books
+import book_finder
+
+
+def make_book(**overrides):
+    fields = dict(link="https://example.com/b", title="Clean Code — 2nd ed.", isbn="9780134685991", price=12.99,
+                  condition=Condition.USED, medium=Medium.EBOOK, description="A handbook", image="cover.jpg",
+                  shipping=3.5, retailer="example.com", search_id="abc123")
+    fields.update(overrides)
+    return Book(**fields)
+
+
+class BookRecordTest(unittest.TestCase):
+
+    def testSlotted(self):
+        book = make_book()
+        self.assertFalse(hasattr(book, "__dict__"))
+        with self.assertRaises(AttributeError):
+            book.colour = "red"
+
+    def testBinaryRoundTrip(self):
+        original = make_book()
+        copy = Book.from_bytes(original.to_bytes())
+        for field in Book.__slots__:
+            self.assertEqual(getattr(copy, field), getattr(original, field), field)
+
+    def testBinaryKeepsIsbnTypeAndMissingPrice(self):
+        copy = Book.from_bytes(make_book(isbn=9780134685991, price=None).to_bytes())
+        self.assertEqual(copy.isbn, 9780134685991)
+        self.assertIsNone(Book.from_bytes(make_book(shipping=None).to_bytes()).shipping)
+        self.assertEqual(Book.from_bytes(make_book(shipping=0.0).to_bytes()).shipping, 0.0)
+        self.assertIsNone(copy.price)
+
+    def testBinaryIsSmallerThanJson(self):
+        book = make_book()
+        self.assertLess(len(book.to_bytes()), len(book.to_json().encode("utf-8")))
+
+    def testBookList(self):
+        books = [make_book(price=p) for p in (5.0, 7.5, 9.25)]
+        self.assertEqual([b.price for b in decode_books(encode_books(books))], [5.0, 7.5, 9.25])
+        self.assertEqual(decode_books(encode_books([])), [])
+
+    def testBookListNeverLooksLikeJson(self):
+        # 91 is 0x5B, the same byte as "[" in the count's low byte
+        offers = [make_book(price=float(p)) for p in range(91)]
+        data = book_finder._encode_offers(offers)
+        self.assertNotEqual(data[:1], b"[")
+        self.assertEqual([o.price for o in book_finder._decode_offers(data)], [float(p) for p in range(91)])
+
+    def testJsonMatchesDict(self):
+        book = make_book()
+        self.assertEqual(json.loads(book.to_json()), book.to_dict())
+        self.assertAlmostEqual(book.to_dict()["total"], 16.49)
+
+
+class CacheEncodingTest(unittest.TestCase):
+
+    def testCachedBooksUseBinaryRecords(self):
+        book = make_book()
+        data = book_finder._encode_book(book)
+        self.assertEqual(book_finder._decode_book(data).title, book.title)
+        self.assertIsNone(book_finder._decode_book(book_finder._encode_book(None)))
+
+    def testJsonRowsFromOlderVersionsStillDecode(self):
+        book = make_book()
+        legacy = json.dumps(book.to_dict()).encode("utf-8")
+        self.assertEqual(book_finder._decode_book(legacy).price, 12.99)
+        self.assertIsNone(book_finder._decode_book(b"null"))
+        offers = json.dumps([book.to_dict()]).encode("utf-8")
+        self.assertEqual(book_finder._decode_offers(offers)[0].retailer, "example.com")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,54 @@
 import unittest
 import sys
 import os
+import time
+import types
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
-from book import Book, Condition, Medium
+from book import Book, Condition, Medium, BookError
+import requests
+import book_finder
+from parser_registry import ParserRegistry
+
+
+def make_parser(name, price=None, delay=0.0):
+    """Build a stand-in parser module that sleeps and then returns or raises."""
+    module = types.ModuleType(name)
+
+    def parse(isbn, condition="", medium=""):
+        time.sleep(delay)
+        if price is None:
+            raise BookError("Book not found on site!")
+        return Book(f"{name}.com", name, isbn, price, Condition.NEW, Medium.PHYSICAL)
+
+    module.parse = parse
+    module.get_test_isbn = lambda: 9780134685991
+    return module
+
+
+def make_async_parser(name, price=None, delay=0.0):
+    """Build a stand-in parser module that also implements the async contract."""
+    module = make_parser(name, price, delay)
+
+    async def aparse(isbn, condition="", medium=""):
+        await asyncio.sleep(delay)
+        if price is None:
+            raise BookError("Book not found on site!")
+        return Book(f"{name}.com", name, isbn, price, Condition.NEW, Medium.PHYSICAL)
+
+    module.aparse = aparse
+    return module
+
+
+def make_registry(*modules):
+    registry = ParserRegistry()
+    for module in modules:
+        registry.register(module)
+    return registry
 
 class BookfinderTest(unittest.TestCase):
 
@@ -24,5 +68,323 @@ class BookfinderTest(unittest.TestCase):
         result = min(books) if books else None
         self.assertIsNone(result)
 
+class SearchEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        book_finder.price_cache.clear()
+
+    def testParsersRunConcurrently(self):
+        parsers = make_registry(*[make_parser(f"slow{i}", price=10.0 + i, delay=0.3) for i in range(4)])
+        with patch.object(book_finder, "registry", parsers):
+            start = time.perf_counter()
+            outcome = book_finder.search(9780134685991, deadline=5)
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(outcome.books), 4)
+        self.assertEqual(outcome.timed_out, [])
+        self.assertLess(elapsed, 1.0)
+
+    def testLateParsersAreReportedAndDropped(self):
+        parsers = make_registry(make_parser("fast", price=30.0), make_parser("slow", price=5.0, delay=1.0))
+        with patch.object(book_finder, "registry", parsers):
+            outcome = book_finder.search(9780134685991, deadline=0.2)
+
+        self.assertEqual([b.title for b in outcome.books], ["fast"])
+        self.assertEqual(outcome.timed_out, ["slow"])
+
+    def testFailingParserIsSkipped(self):
+        parsers = make_registry(make_parser("missing"), make_parser("found", price=19.99))
+        with patch.object(book_finder, "registry", parsers):
+            outcome = book_finder.search(9780134685991, deadline=5)
+
+        self.assertEqual([b.title for b in outcome.books], ["found"])
+        self.assertEqual(outcome.timed_out, [])
+
+    def testDisabledParserIsNotRun(self):
+        parsers = make_registry(make_parser("cheap", price=1.0), make_parser("pricey", price=50.0))
+        parsers.set_enabled("cheap", False)
+        with patch.object(book_finder, "registry", parsers):
+            cheapest = book_finder.find_cheapest_book(9780134685991)
+
+        self.assertEqual(cheapest.title, "pricey")
+
+
+class AsyncSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        book_finder.price_cache.clear()
+
+    def testAsyncAndBlockingParsersRunTogether(self):
+        parsers = make_registry(
+            *[make_async_parser(f"async{i}", price=20.0 + i, delay=0.3) for i in range(20)],
+            make_parser("blocking", price=15.0, delay=0.3),
+        )
+        with patch.object(book_finder, "registry", parsers):
+            start = time.perf_counter()
+            outcome = asyncio.run(book_finder.asearch(9780134685991, deadline=5))
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(outcome.books), 21)
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(min(outcome.books).title, "blocking")
+
+    def testAsyncDeadlineDropsLateParsers(self):
+        parsers = make_registry(make_async_parser("fast", price=30.0), make_async_parser("slow", price=5.0, delay=1.0))
+        with patch.object(book_finder, "registry", parsers):
+            outcome = asyncio.run(book_finder.asearch(9780134685991, deadline=0.2))
+
+        self.assertEqual([b.title for b in outcome.books], ["fast"])
+        self.assertEqual(outcome.timed_out, ["slow"])
+
+
+class PriceCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        book_finder.price_cache.clear()
+
+    def countingParser(self, name, price=25.0):
+        module = make_parser(name, price=price)
+        module.calls = 0
+        parse = module.parse
+
+        def counted(isbn, condition="", medium=""):
+            module.calls += 1
+            return parse(isbn, condition, medium)
+
+        module.parse = counted
+        return module
+
+    def testRepeatSearchIsServedFromCache(self):
+        module = self.countingParser("cached")
+        with patch.object(book_finder, "registry", make_registry(module)):
+            first = book_finder.find_cheapest_book("978-0134685991")
+            second = book_finder.find_cheapest_book("0134685997")
+
+        self.assertEqual(module.calls, 1)
+        self.assertEqual(first.price, second.price)
+        self.assertEqual(book_finder.cache_stats()["retailers"]["cached"]["fresh"], 1)
+
+    def testCachedBookIsNotMutatedByCallers(self):
+        module = self.countingParser("mutated")
+        with patch.object(book_finder, "registry", make_registry(module)):
+            book_finder.find_cheapest_book(9780134685991).description = "changed"
+            again = book_finder.find_cheapest_book(9780134685991)
+
+        self.assertEqual(again.description, "No description available.")
+
+    def testConditionAndMediumAreSeparateKeys(self):
+        module = self.countingParser("keyed")
+        with patch.object(book_finder, "registry", make_registry(module)):
+            book_finder.find_cheapest_book(9780134685991, condition="new")
+            book_finder.find_cheapest_book(9780134685991, condition="used")
+
+        self.assertEqual(module.calls, 2)
+
+    def testNotFoundIsCachedButOutagesAreNot(self):
+        missing = self.countingParser("missing", price=None)
+        down = make_parser("down")
+        down.calls = 0
+
+        def unreachable(isbn, condition="", medium=""):
+            down.calls += 1
+            try:
+                raise requests.ConnectionError("connection refused")
+            except requests.ConnectionError as e:
+                raise BookError(f"Could not access site: {e}")
+
+        down.parse = unreachable
+        with patch.object(book_finder, "registry", make_registry(missing, down)):
+            book_finder.find_cheapest_book(9780134685991)
+            book_finder.find_cheapest_book(9780134685991)
+
+        self.assertEqual(missing.calls, 1)
+        self.assertEqual(down.calls, 2)
+
+    def testStaleEntryIsServedAndRefreshed(self):
+        module = self.countingParser("stale")
+        registry = make_registry(module)
+        with patch.object(book_finder, "registry", registry), \
+                patch.object(book_finder.price_cache, "stale_ttl", 60):
+            registry.get("stale").cache_ttl = 0.05
+            book_finder.find_cheapest_book(9780134685991)
+            time.sleep(0.1)
+            stale = book_finder.find_cheapest_book(9780134685991)
+            time.sleep(0.2)
+
+        self.assertEqual(stale.title, "stale")
+        self.assertEqual(module.calls, 2)
+
+
+class CoalescingTest(unittest.TestCase):
+
+    def setUp(self):
+        book_finder.price_cache.clear()
+
+    def testBurstOfSameSearchScrapesOnce(self):
+        module = make_parser("popular", price=42.0, delay=0.3)
+        module.calls = 0
+        parse = module.parse
+
+        def counted(isbn, condition="", medium=""):
+            module.calls += 1
+            return parse(isbn, condition, medium)
+
+        module.parse = counted
+        with patch.object(book_finder, "registry", make_registry(module)), \
+                ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(lambda _: book_finder.find_cheapest_book("9780134685991"), range(20)))
+
+        self.assertEqual(module.calls, 1)
+        self.assertTrue(all(r.price == 42.0 for r in results))
+        self.assertEqual(len({id(r) for r in results}), 20)
+
+
+class BatchSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        book_finder.price_cache.clear()
+
+    def testBatchYieldsEveryIsbnConcurrently(self):
+        isbns = [f"97801346859{i:02d}" for i in range(12)]
+        parsers = make_registry(make_parser("batch_parser", price=9.99, delay=0.2))
+        with patch.object(book_finder, "registry", parsers):
+            start = time.perf_counter()
+            results = dict(book_finder.find_cheapest_books(isbns))
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(set(results), set(isbns))
+        self.assertTrue(all(b.price == 9.99 for b in results.values()))
+        # 12 ISBNs in waves of BATCH_CONCURRENCY rather than one after another
+        waves = -(-len(isbns) // book_finder.BATCH_CONCURRENCY)
+        self.assertLess(elapsed, 0.2 * waves + 1.0)
+
+    def testMissingIsbnYieldsNone(self):
+        with patch.object(book_finder, "registry", make_registry(make_parser("empty_parser"))):
+            results = list(book_finder.find_cheapest_books(["9780134685991"]))
+
+        self.assertEqual(results, [("9780134685991", None)])
+
+
+class OffersTest(unittest.TestCase):
+
+    def setUp(self):
+        book_finder.offers_cache.clear()
+
+    def marketplace(self):
+        module = make_parser("market_parser")
+        module.calls = 0
+
+        def parse_offers(isbn):
+            module.calls += 1
+            return [
+                Book("a.com", "A", isbn, 10.0, Condition.USED, Medium.PHYSICAL, shipping=8.0),
+                Book("b.com", "B", isbn, 12.0, Condition.NEW, Medium.PHYSICAL, shipping=0.0),
+                Book("c.com", "C", isbn, 0, Condition.NEW, Medium.PHYSICAL),
+            ]
+
+        module.parse_offers = parse_offers
+        return module
+
+    def testOffersAreRankedByPriceAndTotal(self):
+        parsers = make_registry(self.marketplace(), make_parser("ebook_parser", price=11.0))
+        with patch.object(book_finder, "registry", parsers):
+            outcome = book_finder.find_offers(9780134685991)
+
+        self.assertEqual([o.title for o in outcome.by_price], ["A", "ebook_parser", "B"])
+        self.assertEqual([o.title for o in outcome.by_total], ["ebook_parser", "B", "A"])
+        self.assertEqual(outcome.by_price[0].retailer, "market")
+
+    def testOffersAreCachedUnfiltered(self):
+        module = self.marketplace()
+        with patch.object(book_finder, "registry", make_registry(module)):
+            book_finder.find_offers(9780134685991)
+            again = book_finder.find_offers("978-0-13-468599-1")
+
+        self.assertEqual(module.calls, 1)
+        self.assertEqual({o.condition for o in again.by_price}, {Condition.USED, Condition.NEW})
+
+
+    def testAbebooksKeepsEveryListing(self):
+        import abebook_parser
+        html = """
+        <ul>
+          <li data-test-id="listing-item">
+            <a data-test-id="listing-title-link" href="/servlet/BookDetailsPL?bi=1"><span data-test-id="listing-title">Clean Code</span></a>
+            <p data-test-id="item-price">US$ 20.50</p>
+            <span data-test-id="listing-book-condition">Used - Like New</span>
+            <span data-test-id="item-shipping-price">+ US$ 4.25 shipping</span>
+          </li>
+          <li data-test-id="listing-item">
+            <span data-test-id="listing-title">Clean Code</span>
+            <p data-test-id="item-price">US$ 31.00</p>
+            <span data-test-id="listing-book-condition">New</span>
+            <span data-test-id="item-shipping-price">FREE shipping</span>
+          </li>
+          <li data-test-id="listing-item">
+            <p data-test-id="item-price">US$ 18.00</p>
+            <span data-test-id="item-shipping-price">US$ 4.00 to U.S.A.</span>
+          </li>
+          <li data-test-id="listing-item">
+            <p data-test-id="item-price">US$ 15.00</p>
+          </li>
+        </ul>"""
+        url = abebook_parser.search_url(9780134685991, "")
+        offers = abebook_parser.offers_from_listings(abebook_parser.parse_abebooks_prices(html), 9780134685991, url)
+
+        self.assertEqual([(o.price, o.shipping, o.condition) for o in offers],
+                         [(20.5, 4.25, Condition.USED), (31.0, 0.0, Condition.NEW),
+                          (18.0, 4.0, Condition.UNKNOWN), (15.0, None, Condition.UNKNOWN)])
+        self.assertIsNone(offers[3].total)
+        self.assertEqual(offers[0].link, "https://www.abebooks.com/servlet/BookDetailsPL?bi=1")
+        self.assertEqual(offers[1].link, url)
+
+    def testUnknownShippingRanksLastByTotal(self):
+        isbn = 9780134685991
+        offers = [Book("a.com", "A", isbn, 5.0, Condition.USED, Medium.PHYSICAL, shipping=None),
+                  Book("b.com", "B", isbn, 12.0, Condition.NEW, Medium.PHYSICAL, shipping=4.0),
+                  Book("c.com", "C", isbn, 9.0, Condition.NEW, Medium.PHYSICAL, shipping=3.0)]
+        by_price, by_total = book_finder.rank_offers(offers)
+
+        self.assertEqual([o.title for o in by_price], ["A", "C", "B"])
+        self.assertEqual([o.title for o in by_total], ["C", "B", "A"])
+
+
+class ParserRegistryTest(unittest.TestCase):
+
+    def testDiscoveryRunsOnce(self):
+        registry = ParserRegistry()
+        first = registry.discover()
+        second = registry.discover()
+
+        names = [p.name for p in second]
+        self.assertEqual(len(first), len(second))
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn("abebook_parser", names)
+
+    def testCapabilitiesFollowParseSignature(self):
+        registry = ParserRegistry()
+        registry.discover()
+
+        abebooks = registry.get("abebook_parser")
+        macmillan = registry.get("macmillan_parser")
+        self.assertTrue(abebooks.supports_condition)
+        self.assertTrue(abebooks.supports_medium)
+        self.assertFalse(macmillan.supports_condition)
+        self.assertTrue(macmillan.supports_async)
+        self.assertEqual(abebooks.site, "AbeBooks")
+
+    def testInvalidParserIsRejected(self):
+        registry = ParserRegistry()
+        broken = types.ModuleType("broken_parser")
+        broken.parse = lambda isbn: None
+
+        self.assertIsNone(registry.register(broken))
+        self.assertEqual(registry.parsers(), [])
+
+    def testUnknownParserCannotBeToggled(self):
+        registry = ParserRegistry()
+        with self.assertRaises(KeyError):
+            registry.set_enabled("nope", False)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
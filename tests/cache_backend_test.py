@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from book import Book, Condition, Medium
+from cache import CacheState, TTLCache
+from cache_backend import SQLiteBackend
+import book_finder
+
+
+class SQLiteBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.sqlite")
+        self.backend = SQLiteBackend(self.path)
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def testUsesWriteAheadLog(self):
+        mode = self.backend._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def testEntriesSurviveReopen(self):
+        self.backend.set("prices", "abebook_parser|9780134685991||", b"12.99", ttl=60)
+        self.backend.close()
+
+        reopened = SQLiteBackend(self.path)
+        self.assertEqual(reopened.get("prices", "abebook_parser|9780134685991||").value, b"12.99")
+        reopened.close()
+
+    def testNamespacesAreSeparate(self):
+        self.backend.set("prices", "key", b"price", ttl=60)
+        self.assertIsNone(self.backend.get("google_search", "key"))
+
+    def testSweepRemovesExpiredEntries(self):
+        self.backend.set_many("prices", {"old": b"1", "older": b"2"}, ttl=0)
+        self.backend.set("prices", "new", b"3", ttl=60)
+        time.sleep(0.01)
+
+        self.assertEqual(self.backend.sweep(), 2)
+        self.assertIsNone(self.backend.get("prices", "old"))
+        self.assertIsNotNone(self.backend.get("prices", "new"))
+
+    def testWorkersShareWarmBooks(self):
+        def worker_cache():
+            return TTLCache(backend=self.backend, namespace="prices", stale_ttl=60,
+                            encode=book_finder._encode_book, decode=book_finder._decode_book)
+
+        cheap = Book("cheap.com", "Cheap Book", 9780134685991, 12.99, Condition.USED, Medium.PHYSICAL)
+        worker_cache().set(("abebook_parser", "9780134685991"), cheap, ttl=60)
+
+        value, state = worker_cache().get(("abebook_parser", "9780134685991"))
+        self.assertEqual(state, CacheState.FRESH)
+        self.assertEqual(value.price, 12.99)
+        self.assertEqual(value.condition, Condition.USED)
+
+    def testExpiredBackendEntryIsStale(self):
+        writer = TTLCache(backend=self.backend, namespace="prices", stale_ttl=60,
+                          encode=book_finder._encode_book, decode=book_finder._decode_book)
+        writer.set("9780134685991", None, ttl=0)
+
+        reader = TTLCache(backend=self.backend, namespace="prices", stale_ttl=60,
+                          encode=book_finder._encode_book, decode=book_finder._decode_book)
+        self.assertEqual(reader.get("9780134685991"), (None, CacheState.STALE))
+
+    def testStaleCopyKeepsTheRecordsExpiry(self):
+        writer = TTLCache(backend=self.backend, namespace="prices", stale_ttl=0.05, encode=bytes, decode=bytes)
+        writer.set("key", b"old", ttl=0)
+
+        # A reader with a longer stale window must not extend the record's
+        reader = TTLCache(backend=self.backend, namespace="prices", stale_ttl=3600, encode=bytes, decode=bytes)
+        self.assertEqual(reader.get("key"), (b"old", CacheState.STALE))
+        time.sleep(0.06)
+        self.assertEqual(reader.get("key"), (None, CacheState.MISS))
+
+    def testBackendDeleteErrorsAreLogged(self):
+        backend = MagicMock()
+        backend.delete.side_effect = RuntimeError("database is locked")
+        cache = TTLCache(backend=backend, namespace="prices")
+        cache.set("key", 1)
+
+        with self.assertLogs(level="ERROR"):
+            cache.delete("key")
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from cache import CacheState, TTLCache
+
+
+class TTLCacheTest(unittest.TestCase):
+
+    def testFreshThenStaleThenMiss(self):
+        cache = TTLCache(default_ttl=0.05, stale_ttl=0.05)
+        cache.set("isbn", 12.99)
+
+        self.assertEqual(cache.get("isbn"), (12.99, CacheState.FRESH))
+        time.sleep(0.06)
+        self.assertEqual(cache.get("isbn"), (12.99, CacheState.STALE))
+        time.sleep(0.06)
+        self.assertEqual(cache.get("isbn"), (None, CacheState.MISS))
+
+    def testLeastRecentlyUsedIsEvicted(self):
+        cache = TTLCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("b")[1], CacheState.MISS)
+        self.assertEqual(cache.get("a")[1], CacheState.FRESH)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def testMemoryCapEvicts(self):
+        cache = TTLCache(max_bytes=100, sizeof=lambda value: 40)
+        for key in range(5):
+            cache.set(key, "x")
+
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.stats()["bytes"], 100)
+
+    def testCountersTrackLookups(self):
+        cache = TTLCache()
+        cache.get("missing")
+        cache.set("present", 1)
+        cache.get("present")
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
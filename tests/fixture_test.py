@@ -0,0 +1,35 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import fixture_benchmark
+
+
+class RecordedFixtureTest(unittest.TestCase):
+    """Parser accuracy against recorded retailer pages, with no network."""
+
+    def testEveryFixtureExtractsExpectedBook(self):
+        for fixture in fixture_benchmark.load_fixtures():
+            with self.subTest(fixture=fixture["file"]):
+                result = fixture_benchmark.extract(fixture)
+                self.assertTrue(fixture_benchmark.is_accurate(fixture, result),
+                                f"expected {fixture['expected']}, got {result and (result.title, result.price)}")
+
+    def testSlowdownPastToleranceIsReported(self):
+        baseline = {"abebook_parser": {"p50_ms": 4.0, "p95_ms": 10.0, "accuracy": 1.0}}
+        report = {"abebook_parser": {"p50_ms": 4.2, "p95_ms": 14.0, "accuracy": 1.0}}
+
+        problems = fixture_benchmark.regressions(report, baseline, tolerance=0.25)
+        self.assertEqual(len(problems), 1)
+        self.assertIn("p95_ms", problems[0])
+
+    def testPercentileIsNearestRank(self):
+        samples = list(range(1, 101))
+        self.assertEqual(fixture_benchmark.percentile(samples, 50), 50)
+        self.assertEqual(fixture_benchmark.percentile(samples, 95), 95)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+import json
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import google_books_api
+from google_books_api import GoogleBooksAPI, normalize_query
+from title_index import TitleIndex
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'fixtures', 'google_books_volumes.json')
+
+
+def fake_session():
+    with open(FIXTURE) as f:
+        volumes = json.load(f)
+    response = MagicMock()
+    response.json.return_value = volumes
+    session = MagicMock()
+    session.get.return_value = response
+    return session
+
+
+class GoogleBooksCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        google_books_api.search_cache.clear()
+        google_books_api.isbn_cache.clear()
+        # Keep other tests' books from answering searches here
+        patcher = patch.object(google_books_api, "title_index", TitleIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = fake_session()
+        self.api = GoogleBooksAPI(session=self.session)
+
+    def testQueryNormalization(self):
+        self.assertEqual(normalize_query("  Clean Code:  A Handbook! "), "clean code a handbook")
+        self.assertEqual(normalize_query("CLEAN-CODE"), normalize_query("clean code"))
+
+    def testEquivalentTitlesShareOneRequest(self):
+        first = self.api.search_book_by_name("Worlds of History")
+        second = self.api.search_book_by_name("worlds of   history!")
+        self.assertEqual(self.session.get.call_count, 1)
+        self.assertEqual(first, second)
+        second[0]["title"] = "changed"
+        self.assertNotEqual(self.api.search_book_by_name("Worlds of History")[0]["title"], "changed")
+
+    def testTitleSearchWarmsIsbnCache(self):
+        books = self.api.search_book_by_name("Worlds of History")
+        self.session.get.reset_mock()
+        found = self.api.get_book_by_isbn(books[0]["isbn"])
+        self.assertEqual(found["title"], books[0]["title"])
+        self.session.get.assert_not_called()
+
+    def testFailuresAreNotCached(self):
+        self.session.get.side_effect = google_books_api.requests.ConnectionError("down")
+        self.assertEqual(self.api.search_book_by_name("Clean Code"), [])
+        self.session.get.side_effect = None
+        self.assertTrue(self.api.search_book_by_name("Clean Code"))
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def testClientIsShared(self):
+        self.assertIs(google_books_api.get_client(), google_books_api.get_client())
+
+
+if __name__ == '__main__':
+    unittest.main()
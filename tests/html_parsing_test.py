@@ -0,0 +1,123 @@
+import re
+import time
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'parsers')))
+
+from bs4 import SoupStrainer
+from book import BookError
+from html_parsing import extract, extract_within, make_soup, ParseBudgetExceeded, Selector, SelectorSpec
+import macmillan_parser
+import textbookx_parser
+
+PAGE = """
+<html><head><title>Results</title></head><body>
+  <nav><a class="btn-search-icbutton searchTextHide" href="/p">Worlds of History</a></nav>
+  <div class="promo"><span>$9.99</span></div>
+  <div class="col priceandvaluetag"><p class="text-right"><strong>$45.99</strong></p></div>
+</body></html>"""
+
+
+class MakeSoupTest(unittest.TestCase):
+
+    def testScopedParseKeepsOnlyMatches(self):
+        # While parsing, class is still the raw attribute string, so match it with a regex
+        soup = make_soup(PAGE, only=SoupStrainer("div", class_=re.compile(r"\bpriceandvaluetag\b")))
+
+        self.assertIsNone(soup.find("title"))
+        self.assertIsNone(soup.find("div", {"class": "promo"}))
+        self.assertEqual(soup.find("strong").get_text(), "$45.99")
+
+    def testMissingBackendFallsBack(self):
+        soup = make_soup(PAGE, backend="no-such-parser")
+        self.assertEqual(soup.find("title").get_text(), "Results")
+
+    def testMacmillanScopedParse(self):
+        result = macmillan_parser.parse_html(PAGE, 9781319221478, "https://www.macmillanlearning.com/")
+        self.assertEqual((result.title, result.price), ("Worlds of History", 45.99))
+
+
+class ExtractTest(unittest.TestCase):
+
+    def testEarlierStrategyWinsOverDocumentOrder(self):
+        soup = make_soup('<div class="promo">a</div><span class="price">$5</span><div class="price">$7</div>')
+        spec = SelectorSpec(Selector("div", r"price"), Selector("span", r"price"))
+
+        found = extract(soup, {"price": spec}, time.monotonic() + 5)
+        self.assertEqual(found["price"].get_text(), "$7")
+
+    def testTextSelectorClimbsToContainer(self):
+        soup = make_soup('<article><p><b>ISBN 0134685991</b></p></article>')
+        spec = SelectorSpec(Selector(text="0134685991", climb_to="article"))
+
+        self.assertEqual(extract(soup, {"product": spec}, time.monotonic() + 5)["product"].name, "article")
+
+    def testContainerAndFieldsInOneWalk(self):
+        soup = make_soup('<span class="price">$1</span>'
+                         '<li class="item"><span class="price">$3</span></li>'
+                         '<div class="product"><b>x</b><span class="price">$5</span></div>'
+                         '<span class="price">$9</span>')
+        container = SelectorSpec(Selector("div", r"product"), Selector("li", r"item"))
+        fields = {"price": SelectorSpec(Selector("span", r"price"))}
+
+        product, found = extract_within(soup, container, fields, time.monotonic() + 5)
+        self.assertEqual(product.name, "div")
+        self.assertEqual(found["price"].get_text(), "$5")
+        self.assertEqual(found["price"], extract(product, fields, time.monotonic() + 5)["price"])
+
+    def testNoContainer(self):
+        soup = make_soup('<span class="price">$1</span>')
+        product, found = extract_within(soup, SelectorSpec(Selector("article")),
+                                        {"price": SelectorSpec(Selector("span"))}, time.monotonic() + 5)
+        self.assertIsNone(product)
+        self.assertEqual(found, {"price": None})
+
+    def testDeadlineStopsTheWalk(self):
+        soup = make_soup("<p>x</p>" * 1000)
+        with self.assertRaises(ParseBudgetExceeded):
+            extract(soup, {"missing": SelectorSpec(Selector("table"))}, time.monotonic() - 1)
+
+
+class TextbookXTest(unittest.TestCase):
+
+    PAGE = "<html><body>" + "<p>menu</p>" * 200 + """
+      <div class="search-results"><div class="book-entry">
+        <a class="title" href="/book/9780134685991">Clean Code</a> price: 18.00
+      </div></div></body></html>"""
+
+    def testFallsBackToResultsContainer(self):
+        result = textbookx_parser.parse_html(self.PAGE, 9780134685991, "https://www.textbookx.com/")
+
+        self.assertEqual((result.title, result.price), ("Clean Code", 18.0))
+        self.assertEqual(result.link, "https://www.textbookx.com/book/9780134685991")
+
+    def testFindsUnlabelledContainerByIsbn(self):
+        page = "<html><body>" + "<p>menu</p>" * 200 + """
+          <section><div><h3>Clean Code</h3><span>ISBN 0134685991</span><span class="price">$21.50</span></div></section>
+          </body></html>"""
+        result = textbookx_parser.parse_html(page, 9780134685991, "https://www.textbookx.com/")
+
+        self.assertEqual((result.title, result.price), ("Clean Code", 21.5))
+
+    def testReadsOnlyTheStartOfHugePages(self):
+        with patch.object(textbookx_parser, "MAX_SCAN_CHARS", 2000), \
+                patch.object(textbookx_parser.structured_data, "extract_product", return_value=None) as scan, \
+                patch.object(textbookx_parser, "make_soup", wraps=textbookx_parser.make_soup) as soup:
+            with self.assertRaises(BookError):
+                textbookx_parser.parse_html(self.PAGE, 9780134685991, "https://www.textbookx.com/")
+
+        self.assertEqual(len(scan.call_args.args[0]), 2000)
+        self.assertTrue(all(len(call.args[0]) <= 2000 for call in soup.call_args_list))
+
+    def testGivesUpPastBudget(self):
+        with patch.object(textbookx_parser, "PARSE_BUDGET", -1):
+            with self.assertRaisesRegex(BookError, "longer than"):
+                textbookx_parser.parse_html(self.PAGE, 9780134685991, "https://www.textbookx.com/")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
 import unittest
 import sys
 import os
+from unittest.mock import patch, MagicMock
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+import fetch_html as transport
 from fetch_html import fetch_html
 
 class TestFetchHTMLReal(unittest.TestCase):
@@ -19,5 +21,85 @@ class TestFetchHTMLReal(unittest.TestCase):
         self.assertIn("Books", html)
         self.assertTrue(len(html) > 100, "HTML seems too short — maybe not fetched properly.")
 
+class TestTransport(unittest.TestCase):
+    def test_session_is_shared(self):
+        self.assertIs(transport.get_session(), transport.get_session())
+
+    def test_session_pools_and_retries(self):
+        adapter = transport.get_session().get_adapter("https://www.abebooks.com/")
+        self.assertEqual(adapter._pool_maxsize, transport.POOL_MAXSIZE)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+        self.assertIn("gzip", transport.get_session().headers["Accept-Encoding"])
+
+    def test_per_host_timeout(self):
+        self.assertEqual(transport.timeout_for("https://www.textbookx.com/fastsearch2.php?s=1"),
+                         transport.HOST_TIMEOUTS["www.textbookx.com"])
+        self.assertEqual(transport.timeout_for("https://example.org/"), transport.DEFAULT_TIMEOUT)
+
+    def test_fetch_uses_host_timeout(self):
+        session = MagicMock()
+        session.get.return_value.text = "<html></html>"
+        with patch.object(transport, "get_session", return_value=session):
+            html = fetch_html("https://www.vitalsource.com/textbooks?q=1")
+
+        self.assertEqual(html, "<html></html>")
+        self.assertEqual(session.get.call_args.kwargs["timeout"], transport.HOST_TIMEOUTS["www.vitalsource.com"])
+
+    def test_host_concurrency_is_capped(self):
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_get(*args, **kwargs):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+            response = MagicMock()
+            response.text = "ok"
+            return response
+
+        session = MagicMock()
+        session.get.side_effect = slow_get
+        with patch.object(transport, "get_session", return_value=session), \
+                patch.object(transport, "_host_slots", {}), \
+                patch.object(transport, "HOST_CONCURRENCY", 2), \
+                ThreadPoolExecutor(max_workers=6) as pool:
+            list(pool.map(lambda _: fetch_html("https://www.abebooks.com/"), range(6)))
+
+        self.assertLessEqual(max(peak), 2)
+
+    def test_async_host_concurrency_is_capped(self):
+        import asyncio
+
+        active = []
+        peak = []
+
+        async def slow_get(*args, **kwargs):
+            active.append(1)
+            peak.append(len(active))
+            await asyncio.sleep(0.05)
+            active.pop()
+            response = MagicMock()
+            response.text = "ok"
+            return response
+
+        async def fetch_all():
+            return await asyncio.gather(*(transport.afetch_html("https://www.abebooks.com/") for _ in range(6)))
+
+        client = MagicMock()
+        client.get.side_effect = slow_get
+        with patch.object(transport, "get_async_client", return_value=client), \
+                patch.object(transport, "HOST_CONCURRENCY", 2):
+            self.assertEqual(asyncio.run(fetch_all()), ["ok"] * 6)
+
+        self.assertLessEqual(max(peak), 2)
+
 if __name__ == "__main__":
     unittest.main()
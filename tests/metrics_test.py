@@ -0,0 +1,85 @@
+import unittest
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import metrics
+from metrics import Counter, Histogram, MetricsRegistry
+
+
+class RenderTest(unittest.TestCase):
+
+    def testCounterText(self):
+        counter = Counter("things_total", "Things", ("kind",))
+        counter.inc(kind="a")
+        counter.inc(2, kind='b"c')
+        self.assertEqual(counter.render(), [
+            "# HELP things_total Things",
+            "# TYPE things_total counter",
+            'things_total{kind="a"} 1',
+            'things_total{kind="b\\"c"} 2',
+        ])
+
+    def testHistogramBucketsAreCumulative(self):
+        histogram = Histogram("wait_seconds", "Waits", ("stage",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="x")
+        histogram.observe(0.5, stage="x")
+        histogram.observe(3.0, stage="x")
+        lines = histogram.render()
+        self.assertIn('wait_seconds_bucket{stage="x",le="0.1"} 1', lines)
+        self.assertIn('wait_seconds_bucket{stage="x",le="1"} 2', lines)
+        self.assertIn('wait_seconds_bucket{stage="x",le="+Inf"} 3', lines)
+        self.assertIn('wait_seconds_count{stage="x"} 3', lines)
+
+    def testRegistryJoinsMetrics(self):
+        registry = MetricsRegistry()
+        registry.register(Counter("a_total", "A")).inc()
+        self.assertTrue(registry.render().endswith("a_total 1\n"))
+
+
+class StageTimerTest(unittest.TestCase):
+
+    def testExceptionMarksError(self):
+        before = metrics.STAGE_TOTAL.value(stage="test_stage", retailer="", outcome="error")
+        with self.assertRaises(ValueError):
+            with metrics.timed("test_stage", retailer=""):
+                raise ValueError("boom")
+        self.assertEqual(metrics.STAGE_TOTAL.value(stage="test_stage", retailer="", outcome="error"), before + 1)
+
+    def testRetailerCallSplitsFetchAndParse(self):
+        site = "metrics-test-retailer"
+        with metrics.retailer_call(site) as call:
+            with metrics.timed("fetch"):
+                time.sleep(0.02)
+            time.sleep(0.01)
+            call.outcome = "found"
+        self.assertEqual(metrics.STAGE_TOTAL.value(stage="fetch", retailer=site, outcome="ok"), 1)
+        self.assertEqual(metrics.STAGE_TOTAL.value(stage="parse", retailer=site, outcome="found"), 1)
+        self.assertGreaterEqual(call.fetch_seconds, 0.02)
+
+    def testNoParseSampleWithoutPage(self):
+        site = "metrics-test-offline"
+        with metrics.retailer_call(site) as call:
+            with metrics.timed("fetch") as timer:
+                timer.outcome = "throttled"
+            call.outcome = "unavailable"
+        self.assertEqual(metrics.STAGE_TOTAL.value(stage="retailer", retailer=site, outcome="unavailable"), 1)
+        self.assertEqual(metrics.STAGE_TOTAL.value(stage="parse", retailer=site, outcome="unavailable"), 0)
+
+
+class MetricsRouteTest(unittest.TestCase):
+
+    def testEndpointServesTextFormat(self):
+        from flask_server import app
+        metrics.observe("search", 0.1, "found")
+        response = app.test_client().get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertIn(b"# TYPE bookmark_stage_duration_seconds histogram", response.data)
+        self.assertIn(b'bookmark_stage_total{stage="search",retailer="",outcome="found"}', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import sys
+import os
+import json
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import fetch_html as transport
+from mock_retailers import MockConfig, create_app
+
+
+class MockRetailersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = MockConfig()
+        self.client = create_app(self.config).test_client()
+
+    def testServesRecordedPageForIsbn(self):
+        response = self.client.get("/www.textbookx.com/fastsearch2.php?s=9780134685991")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Clean Code", response.data)
+
+    def testGoogleIsbnQueryIsFiltered(self):
+        response = self.client.get("/www.googleapis.com/books/v1/volumes?q=isbn:9781319221478")
+        items = json.loads(response.data)["items"]
+        self.assertEqual([i["volumeInfo"]["title"] for i in items], ["Worlds of History, Volume 1"])
+
+    def testErrorRate(self):
+        self.config.host_error_rate["www.abebooks.com"] = 1.0
+        self.assertEqual(self.client.get("/www.abebooks.com/servlet/SearchResults?kn=1").status_code, 503)
+        self.assertEqual(self.client.get("/www.vitalsource.com/textbooks?q=1").status_code, 200)
+
+
+class UpstreamOverrideTest(unittest.TestCase):
+
+    def testRequestsAreRoutedToStandIn(self):
+        with patch.object(transport, "UPSTREAM_BASE", "http://127.0.0.1:9100/"):
+            self.assertEqual(transport.upstream_url("https://www.abebooks.com/servlet/SearchResults?kn=1"),
+                             "http://127.0.0.1:9100/www.abebooks.com/servlet/SearchResults?kn=1")
+
+    def testNoOverrideByDefault(self):
+        with patch.object(transport, "UPSTREAM_BASE", ""):
+            self.assertEqual(transport.upstream_url("https://www.abebooks.com/x"), "https://www.abebooks.com/x")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+import time
+import threading
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import book_finder
+import prefetch
+from bookfinder_test import make_parser, make_registry
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class PrefetchTest(unittest.TestCase):
+
+    def setUp(self):
+        book_finder.price_cache.clear()
+        prefetch._recent.clear()
+        self.google = MagicMock()
+        self.google.search_book_by_name.side_effect = lambda title: [{"isbn": "9780134685991", "title": title}]
+        self.parsers = make_registry(make_parser("prefetch_parser", price=25.0))
+        for target, value in ((prefetch.google_books_api, "get_client"), (book_finder, "registry")):
+            patcher = patch.object(target, value, (lambda: self.google) if value == "get_client" else self.parsers)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Let queued jobs finish while the fakes are still in place
+        self.addCleanup(wait_for, lambda: prefetch.stats()["pending"] == 0)
+
+    def testRecommendedTitleIsPricedInBackground(self):
+        done = prefetch.stats().get("found", 0)
+        self.assertEqual(prefetch.prefetch_titles(["Clean Code"]), 1)
+        self.assertTrue(wait_for(lambda: prefetch.stats().get("found", 0) == done + 1))
+
+        parser = self.parsers.get("prefetch_parser")
+        hit, cached = book_finder._cached(parser, "9780134685991")
+        self.assertTrue(hit)
+        self.assertEqual(cached.price, 25.0)
+        self.google.search_book_by_name.assert_called_once_with("Clean Code")
+
+    def testSameTitleIsNotPrefetchedTwice(self):
+        self.assertEqual(prefetch.prefetch_titles(["Clean Code", "clean code!", ""]), 1)
+
+    def testFullQueueDropsTitles(self):
+        with patch.object(prefetch, "_pending", prefetch.PREFETCH_QUEUE):
+            self.assertEqual(prefetch.prefetch_titles(["Refactoring"]), 0)
+
+    def testDisabled(self):
+        with patch.object(prefetch, "PREFETCH_ENABLED", False):
+            self.assertEqual(prefetch.prefetch_titles(["Refactoring"]), 0)
+
+    def testDefersToStreamingSearch(self):
+        slow = make_registry(make_parser("slow_parser", price=30.0, delay=0.3))
+        started_at = []
+        self.google.search_book_by_name.side_effect = lambda title: started_at.append(time.monotonic()) or []
+        streamed = []
+
+        def stream():
+            # What the socket handler runs for a search with stream: true
+            with patch.object(book_finder, "registry", slow):
+                book_finder.search(9780134685991, on_result=lambda parser, found: streamed.append(found))
+            streamed.append(time.monotonic())
+
+        user = threading.Thread(target=stream)
+        user.start()
+        self.assertTrue(wait_for(lambda: book_finder.active_searches() == 1))
+        prefetch.prefetch_titles(["Design Patterns"])
+        user.join()
+
+        self.assertTrue(wait_for(lambda: started_at))
+        self.assertEqual(book_finder.active_searches(), 0)
+        self.assertGreaterEqual(started_at[0], streamed[-1])
+
+    def testWaitsForUserSearches(self):
+        with patch.object(prefetch, "PREFETCH_MAX_DEFER", 0.3), \
+                patch.object(book_finder, "active_searches", return_value=1):
+            started = time.monotonic()
+            prefetch._wait_for_idle()
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()
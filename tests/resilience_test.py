@@ -0,0 +1,143 @@
+import unittest
+import sys
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'parsers')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import requests
+import book_finder
+import fetch_html
+import textbookx_parser
+from book import BookError
+from resilience import BreakerState, CircuitBreaker, TokenBucket
+from bookfinder_test import make_parser, make_registry
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def testBurstThenRefill(self):
+        bucket = TokenBucket(rate=20, capacity=2)
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertFalse(bucket.acquire(timeout=0))
+        self.assertTrue(bucket.acquire(timeout=0.2))
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def testOpensAfterConsecutiveFailures(self):
+        breaker = CircuitBreaker("textbookx_parser", failure_threshold=3, reset_timeout=60)
+        for _ in range(3):
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+
+        self.assertEqual(breaker.state, BreakerState.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def testSuccessResetsFailureCount(self):
+        breaker = CircuitBreaker("textbookx_parser", failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, BreakerState.CLOSED)
+
+    def testHalfOpenNeedsEveryProbeToSucceed(self):
+        breaker = CircuitBreaker("textbookx_parser", failure_threshold=1, reset_timeout=0.05, probes=2)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.state, BreakerState.HALF_OPEN)
+        breaker.record_success()
+        self.assertEqual(breaker.state, BreakerState.HALF_OPEN)
+        breaker.record_success()
+        self.assertEqual(breaker.state, BreakerState.CLOSED)
+
+    def testFailedProbeReopens(self):
+        breaker = CircuitBreaker("textbookx_parser", failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, BreakerState.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def testReleasedProbeCanBeRetried(self):
+        breaker = CircuitBreaker("textbookx_parser", failure_threshold=1, reset_timeout=0.05, probes=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.release()
+
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, BreakerState.CLOSED)
+
+
+class BookFinderBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        book_finder.price_cache.clear()
+        book_finder.breakers.clear()
+
+    def tearDown(self):
+        book_finder.breakers.clear()
+
+    def testFailingRetailerIsSkipped(self):
+        down = make_parser("down_parser")
+        down.calls = 0
+
+        def unreachable(isbn, condition="", medium=""):
+            down.calls += 1
+            try:
+                raise requests.ConnectionError("503 Service Unavailable")
+            except requests.ConnectionError as e:
+                raise BookError(f"Could not access site: {e}")
+
+        down.parse = unreachable
+        parsers = make_registry(down, make_parser("up_parser", price=20.0))
+        with patch.object(book_finder, "registry", parsers), \
+                patch.object(book_finder, "BREAKER_FAILURES", 2):
+            for i in range(4):
+                book_finder.find_cheapest_book(f"97801346859{i:02d}")
+
+        self.assertEqual(down.calls, 2)
+        self.assertEqual(book_finder.breaker_states()["down_parser"]["state"], "open")
+        self.assertEqual(book_finder.breaker_states()["up_parser"]["state"], "closed")
+
+    def testNotFoundDoesNotTripBreaker(self):
+        parsers = make_registry(make_parser("missing_parser"))
+        with patch.object(book_finder, "registry", parsers), \
+                patch.object(book_finder, "BREAKER_FAILURES", 2):
+            for i in range(4):
+                book_finder.find_cheapest_book(f"97801346859{i:02d}")
+
+        self.assertEqual(book_finder.breaker_states()["missing_parser"]["state"], "closed")
+
+    def testOwnRateLimitDoesNotTripBreaker(self):
+        session = MagicMock()
+        drained = TokenBucket(rate=0.001, capacity=0)
+        parsers = make_registry(textbookx_parser)
+        with patch.object(book_finder, "registry", parsers), \
+                patch.object(book_finder, "BREAKER_FAILURES", 2), \
+                patch.object(fetch_html, "_host_buckets", {"www.textbookx.com": drained}), \
+                patch.object(fetch_html, "get_session", return_value=session):
+            for i in range(5):
+                self.assertIsNone(book_finder.find_cheapest_book(f"97801346859{i:02d}"))
+
+        session.get.assert_not_called()
+        self.assertEqual(book_finder.breaker_states()["textbookx_parser"]["state"], "closed")
+        # Throttled answers are not remembered as "not found"
+        parser = parsers.get("textbookx_parser")
+        self.assertFalse(book_finder._cached(parser, "9780134685900")[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ import os
 
 # Ensure we can find src directory
 sys.path.insert(0, os.path.abspath("./src"))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 # Set working directory to project root for template access
 # This ensures templates are found in both local and CI environments
@@ -56,6 +57,39 @@ class TestServer(unittest.TestCase):
         response = self.client.get("/")
         self.assertIn(b'id="go_button"', response.data)
         
+    def test_parsers_are_listed(self):
+        response = self.client.get("/api/parsers")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(len(response.get_json()["parsers"]) > 0)
+
+    def test_parser_toggle_requires_admin_token(self):
+        response = self.client.post("/api/parsers/abebook_parser", json={"enabled": False})
+        self.assertEqual(response.status_code, 403)
+
+    def test_health_lists_excluded_retailers(self):
+        response = self.client.get("/api/health")
+        self.assertIn("excluded_retailers", response.get_json())
+
+    def test_batch_rejects_empty_list(self):
+        response = self.client.post("/api/search/batch", json={"isbns": []})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_streams_one_line_per_isbn(self):
+        import json
+        from unittest.mock import patch
+        import book_finder
+        from bookfinder_test import make_parser, make_registry
+
+        book_finder.price_cache.clear()
+        parsers = make_registry(make_parser("route_parser", price=5.0))
+        with patch.object(book_finder, "registry", parsers):
+            response = self.client.post("/api/search/batch", json={"isbns": ["9780134685991", "not-an-isbn"]})
+            lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertEqual(lines[0], {"isbn": "not-an-isbn", "error": "Invalid ISBN format"})
+        self.assertEqual(lines[1]["book"]["price"], 5.0)
+
     def test_results_page_has_basic_structure(self):
         response = self.client.get("/results?query=test")
         if response.status_code == 200:
@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from book import Book, Condition, Medium
+from cache_backend import SQLiteBackend
+from session_store import SessionStore
+
+
+def make_book(price=12.99):
+    return Book("example.com", "Clean Code", "9780134685991", price, Condition.NEW, Medium.PHYSICAL,
+                description="A handbook", image="cover.jpg")
+
+
+class SessionStoreTest(unittest.TestCase):
+
+    def testEntriesExpire(self):
+        store = SessionStore(ttl=0.05)
+        store.set("abc", make_book())
+        self.assertEqual(store.get("abc").price, 12.99)
+        time.sleep(0.08)
+        self.assertIsNone(store.get("abc"))
+
+    def testLeastRecentlyUsedIsEvicted(self):
+        store = SessionStore(max_entries=2)
+        store.set("a", make_book(1))
+        store.set("b", make_book(2))
+        store.get("a")
+        store.set("c", make_book(3))
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("a").price, 1)
+        self.assertEqual(len(store), 2)
+
+    def testMissingCookie(self):
+        self.assertIsNone(SessionStore().get(None))
+
+
+class SharedSessionStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = SQLiteBackend(os.path.join(self.tmp.name, "cache.sqlite"))
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def testWorkersSeeEachOthersResults(self):
+        worker_a = SessionStore(backend=self.backend)
+        worker_b = SessionStore(backend=self.backend)
+        found = make_book()
+        found.search_id = "trace-1"
+        worker_a.set("abc", found)
+
+        shared = worker_b.get("abc")
+        self.assertEqual((shared.title, shared.price, shared.description), ("Clean Code", 12.99, "A handbook"))
+        self.assertEqual(shared.search_id, "trace-1")
+
+    def testNewerResultFromAnotherWorkerWins(self):
+        worker_a = SessionStore(backend=self.backend)
+        worker_b = SessionStore(backend=self.backend)
+        worker_a.set("abc", make_book(30))
+        worker_b.set("abc", make_book(10))
+        self.assertEqual(worker_a.get("abc").price, 10)
+
+    def testBackendDeleteFailureIsLogged(self):
+        backend = MagicMock()
+        backend.delete.side_effect = OSError("database is locked")
+        store = SessionStore(backend=backend)
+        store.set("abc", make_book())
+        with self.assertLogs(level="ERROR"):
+            store.delete("abc")
+        backend.get.return_value = None
+        self.assertIsNone(store.get("abc"))
+
+
+if __name__ == '__main__':
+    unittest.main()
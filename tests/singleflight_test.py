@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from singleflight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def testConcurrentCallsShareOneExecution(self):
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def scrape():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return 12.99
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            leader = pool.submit(flight.do, "9780134685991", scrape)
+            started.wait()
+            followers = [pool.submit(flight.do, "9780134685991", scrape) for _ in range(9)]
+            results = [leader.result()] + [f.result() for f in followers]
+
+        self.assertEqual(results, [12.99] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.coalesced, 9)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def testDifferentKeysRunSeparately(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do("a", lambda: 1), 1)
+        self.assertEqual(flight.do("b", lambda: 2), 2)
+        self.assertEqual(flight.coalesced, 0)
+
+    def testErrorsReachEveryWaiter(self):
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("retailer exploded")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "key", failing)
+            started.wait()
+            follower = pool.submit(flight.do, "key", failing)
+            with self.assertRaises(ValueError):
+                leader.result()
+            with self.assertRaises(ValueError):
+                follower.result()
+
+        # The key is released, so the next call runs again
+        self.assertEqual(flight.do("key", lambda: "ok"), "ok")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import sys
+import os
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from flask_server import app, socketio
+import book_finder
+from bookfinder_test import make_parser, make_registry
+
+
+class StreamingSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        book_finder.price_cache.clear()
+        app.config["TESTING"] = True
+        self.parsers = make_registry(
+            make_parser("fast_parser", price=30.0),
+            make_parser("slow_parser", price=10.0, delay=0.2),
+            make_parser("missing_parser"),
+        )
+
+    def search(self, **payload):
+        client = socketio.test_client(app)
+        with patch.object(book_finder, "registry", self.parsers):
+            client.emit("Go_button_pushed", {"search": "9780134685991", **payload})
+        received = client.get_received()
+        client.disconnect()
+        return received
+
+    def testStreamingEmitsEachRetailerThenCompletes(self):
+        events = self.search(stream=True)
+        names = [e["name"] for e in events]
+
+        self.assertEqual(names.count("partial_result"), 3)
+        self.assertLess(names.index("partial_result"), names.index("search_complete"))
+        self.assertLess(names.index("search_complete"), names.index("search_results"))
+        self.assertEqual(names[-1], "redirect")
+
+        best = [e["args"][0]["book"]["price"] for e in events if e["name"] == "best_so_far"]
+        self.assertEqual(best, [30.0, 10.0])
+        complete = next(e["args"][0] for e in events if e["name"] == "search_complete")
+        self.assertEqual(complete["book"]["price"], 10.0)
+
+    def testNonStreamingSendsOnlyFinalResult(self):
+        names = [e["name"] for e in self.search()]
+
+        self.assertNotIn("partial_result", names)
+        self.assertIn("search_results", names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'parsers')))
+
+import structured_data
+import textbookx_parser
+import vitalsource_parser
+
+PADDING = "<p>" + "filler " * 200 + "</p>"
+
+JSON_LD_PAGE = """<html><head><title>Clean Code | VitalSource</title>
+<script type="application/ld+json">
+{"@context": "https://schema.org", "@graph": [
+  {"@type": "WebPage", "name": "Search"},
+  {"@type": ["Product", "Book"], "name": "Clean Code", "isbn": "9780134685991",
+   "url": "https://www.vitalsource.com/products/clean-code",
+   "offers": [{"@type": "Offer", "price": "44.99", "priceCurrency": "USD"},
+              {"@type": "Offer", "price": 31.49, "priceCurrency": "USD"}]}
+]}
+</script></head><body>Related: $5.00""" + PADDING + "</body></html>"
+
+
+class ExtractProductTest(unittest.TestCase):
+
+    def testJsonLdTakesLowestOffer(self):
+        data = structured_data.extract_product(JSON_LD_PAGE)
+
+        self.assertEqual((data.source, data.title, data.price), ("json-ld", "Clean Code", 31.49))
+        self.assertEqual(data.link, "https://www.vitalsource.com/products/clean-code")
+
+    def testOpenGraphPriceWithPageTitle(self):
+        page = """<title>Clean Code</title>
+        <meta property="product:price:amount" content="1,020.00">
+        <meta property="product:price:currency" content="USD">"""
+        data = structured_data.extract_product(page)
+
+        self.assertEqual((data.source, data.title, data.price), ("opengraph", "Clean Code", 1020.0))
+
+    def testMicrodata(self):
+        page = ('<div itemscope itemtype="https://schema.org/Book"><h1 itemprop="name">Clean Code</h1>'
+                '<meta itemprop="price" content="29.99"></div>')
+        self.assertEqual(structured_data.extract_product(page).source, "microdata")
+
+    def testMicrodataReadsOneProductScope(self):
+        page = """<nav itemscope itemtype="https://schema.org/WebSite"><a itemprop="name" href="/">Bookstore Home</a></nav>
+        <div itemscope itemtype="https://schema.org/Book">
+          <h2 itemprop="name">Clean Code</h2><span itemprop="isbn">9780134685991</span>
+          <div itemprop="author" itemscope itemtype="https://schema.org/Person"><span itemprop="name">Robert C. Martin</span></div>
+          <div itemprop="offers" itemscope itemtype="https://schema.org/Offer">
+            <span itemprop="price">31.50</span><meta itemprop="priceCurrency" content="USD"></div>
+        </div>
+        <div itemscope itemtype="https://schema.org/Book"><h2 itemprop="name">Other Book</h2>
+          <span itemprop="isbn">9781319221478</span><span itemprop="price">4.99</span></div>"""
+        data = structured_data.extract_product(page)
+
+        self.assertEqual((data.title, data.price, data.currency, data.isbn),
+                         ("Clean Code", 31.5, "USD", "9780134685991"))
+        self.assertTrue(structured_data.describes_isbn(data, 9780134685991))
+        self.assertFalse(structured_data.describes_isbn(data, 9781319221478))
+
+    def testMicrodataWithoutIsbnOnListingPageIsNotTrusted(self):
+        card = '<li itemscope itemtype="https://schema.org/Product"><b itemprop="name">{}</b><i itemprop="price">{}</i></li>'
+        listing = "<ul>" + card.format("First", "9.99") + card.format("Second", "19.99") + "</ul>"
+
+        self.assertIsNone(structured_data.from_microdata(listing))
+        self.assertEqual(structured_data.from_microdata(card.format("Only", "9.99")).title, "Only")
+        self.assertIsNone(structured_data.from_microdata('<span itemprop="price">4.99</span>'))
+
+    def testOtherCurrencyIgnored(self):
+        page = '<meta property="og:price:amount" content="20"><meta property="og:price:currency" content="EUR">'
+        self.assertIsNone(structured_data.extract_product(page))
+
+    def testIsbn10MatchesIsbn13(self):
+        data = structured_data.extract_product(JSON_LD_PAGE)._replace(isbn="0-13-468599-7")
+        self.assertTrue(structured_data.describes_isbn(data, 9780134685991))
+        self.assertFalse(structured_data.describes_isbn(data, 9781319221478))
+
+
+class ParserFastPathTest(unittest.TestCase):
+
+    def testVitalsourceUsesJsonLd(self):
+        before = structured_data.path_stats().get("vitalsource_parser", {}).get("json-ld", 0)
+        result = vitalsource_parser.parse_html(JSON_LD_PAGE, 9780134685991, "https://www.vitalsource.com/textbooks?q=1")
+
+        self.assertEqual((result.title, result.price), ("Clean Code", 31.49))
+        self.assertEqual(structured_data.path_stats()["vitalsource_parser"]["json-ld"], before + 1)
+
+    def testTextbookxFallsBackToDomForOtherIsbn(self):
+        page = JSON_LD_PAGE.replace("</body>", '<div class="product-item"><h2>Worlds of History</h2>'
+                                               '<span class="price">$52.00</span></div></body>')
+        result = textbookx_parser.parse_html(page, 9781319221478, "https://www.textbookx.com/")
+
+        self.assertEqual((result.title, result.price), ("Worlds of History", 52.0))
+        self.assertGreaterEqual(structured_data.path_stats()["textbookx_parser"]["dom"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
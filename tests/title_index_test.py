@@ -0,0 +1,169 @@
+import unittest
+import sys
+import os
+import json
+import time
+import random
+import string
+import difflib
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import google_books_api
+import title_index
+from title_index import TitleIndex
+
+
+def info(title, isbn_13, author="Robert C. Martin", isbn_10=None):
+    return {"title": title, "author": author, "isbn": isbn_13, "isbn_13": isbn_13, "isbn_10": isbn_10,
+            "thumbnail": f"http://img/{isbn_13}", "description": "About " + title}
+
+
+class TitleIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TitleIndex()
+        self.index.add_many([
+            info("Clean Code: A Handbook of Agile Software Craftsmanship", "9780132350884", isbn_10="0132350882"),
+            info("Clean Architecture", "9780134494166"),
+            info("The Clean Coder", "9780137081073"),
+            info("Calculus: Early Transcendentals", "9781285741550", author="James Stewart"),
+        ])
+
+    def titles(self, query, **kwargs):
+        return [s["title"] for s in self.index.suggest(query, **kwargs)]
+
+    def testTitlePrefixComesFirst(self):
+        self.assertEqual(self.titles("clean c")[0], "Clean Code: A Handbook of Agile Software Craftsmanship")
+        self.assertIn("The Clean Coder", self.titles("clean c"))
+
+    def testWordsAnywhereAndAuthor(self):
+        self.assertEqual(self.titles("agile handbook"), ["Clean Code: A Handbook of Agile Software Craftsmanship"])
+        self.assertEqual(self.titles("stewart calc"), ["Calculus: Early Transcendentals"])
+
+    def testMisspelledWord(self):
+        self.assertEqual(self.titles("calculsu early"), ["Calculus: Early Transcendentals"])
+
+    def testIsbnPrefix(self):
+        self.assertEqual(self.titles("97812857"), ["Calculus: Early Transcendentals"])
+
+    def testSuggestionFields(self):
+        suggestion = self.index.suggest("clean architecture")[0]
+        self.assertEqual(set(suggestion), set(title_index.SUGGEST_FIELDS))
+        self.assertEqual(suggestion["isbn"], "9780134494166")
+
+    def testLookupNeedsExactNormalizedTitle(self):
+        self.index.add_many([info("Clean Architecture", "9780134494166")], query="Clean Architecture")
+        self.assertEqual(self.index.lookup("clean architecture!")["isbn"], "9780134494166")
+        self.assertIsNone(self.index.lookup("clean"))
+        self.assertEqual(self.index.lookup("0132350882")["isbn"], "9780132350884")
+
+    def testSharedTitleNeedsAMatchingSearch(self):
+        editions = [info("Biology", "9780134093413", author="Campbell"), info("Biology", "9781259188138", author="Raven")]
+        self.index.add_many(editions)
+        self.assertIsNone(self.index.lookup("biology"))
+
+        # A search for exactly that title vouches for the first matching result
+        self.index.add_many(reversed(editions), query="Biology")
+        self.assertEqual(self.index.lookup("BIOLOGY")["author"], "Raven")
+
+    def testUnrelatedSearchDoesNotVouch(self):
+        self.index.add_many([info("Biology", "9780134093413"), info("Biology", "9781259188138")], query="campbell")
+        self.assertIsNone(self.index.lookup("biology"))
+
+    def testSingleSideResultDoesNotVouch(self):
+        self.index.add_many([info("Campbell Biology", "9780134093413"), info("Biology", "9781259188138")],
+                            query="campbell biology")
+        self.assertIsNone(self.index.lookup("biology"))
+        self.assertEqual(self.index.lookup("Campbell Biology")["isbn"], "9780134093413")
+
+    def testLeastRecentlySeenIsForgotten(self):
+        small = TitleIndex(max_entries=2)
+        small.add(info("First", "1"))
+        small.add(info("Second", "2"))
+        small.add(info("First", "1"))
+        small.add(info("Third", "3"))
+        self.assertEqual(len(small), 2)
+        self.assertIsNone(small.lookup("2"))
+        self.assertEqual([s["title"] for s in small.suggest("t")], ["Third"])
+        self.assertEqual(small.lookup("1")["isbn"], "1")
+
+    def testNewBooksReachFullPrefixes(self):
+        for i in range(3 * title_index.TOP_K):
+            self.index.add(info(f"Chemistry {i}", str(9780000000000 + i)))
+        self.index.add(info("Chemical Principles", "9781464183959"))
+        self.assertEqual(self.titles("ch", limit=1), ["Chemical Principles"])
+
+        # Seeing an old book again brings it back to the front
+        self.index.add(info("Chemistry 0", "9780000000000"))
+        self.assertEqual(self.titles("ch", limit=1), ["Chemistry 0"])
+
+    def testSearchResultsRankInGoogleOrder(self):
+        self.index.add_many([info("Clean Code", "9780136083252"), info("Clean Code Workbook", "9780000000001")],
+                            query="clean code")
+        self.assertEqual(self.titles("clean code")[0], "Clean Code")
+
+    def testSuggestIsFast(self):
+        # A catalogue-sized vocabulary, since typo correction scales with the number of known words
+        rng = random.Random(7)
+        vocabulary = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+                      for _ in range(20000)]
+        big = TitleIndex()
+        big.add_many({"title": " ".join(rng.sample(vocabulary, 3)), "author": " ".join(rng.sample(vocabulary, 2)),
+                      "isbn_13": str(9780000000000 + i)} for i in range(8000))
+        queries = [vocabulary[1][:3], f"{vocabulary[2]} {vocabulary[3][:2]}", vocabulary[4][:-1] + "q",
+                   "zzzzzqx", "aaaa bbbb cccc", "97800000012"]
+        started = time.perf_counter()
+        for query in queries:
+            big.suggest(query)
+        self.assertLess((time.perf_counter() - started) / len(queries), 0.02)
+
+    def testTypoCorrectionRunsOutsideTheLock(self):
+        real = difflib.get_close_matches
+
+        def check(*args, **kwargs):
+            self.assertFalse(self.index._lock.locked())
+            return real(*args, **kwargs)
+
+        with patch.object(title_index.difflib, "get_close_matches", side_effect=check) as fuzzy:
+            self.assertEqual(self.titles("calculsu"), ["Calculus: Early Transcendentals"])
+        fuzzy.assert_called_once()
+
+
+class GoogleBooksIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        google_books_api.search_cache.clear()
+        google_books_api.isbn_cache.clear()
+        with open(os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'fixtures', 'google_books_volumes.json')) as f:
+            volumes = json.load(f)
+        self.session = MagicMock()
+        self.session.get.return_value.json.return_value = volumes
+        self.api = google_books_api.GoogleBooksAPI(session=self.session)
+
+    def testSearchedTitleSkipsGoogle(self):
+        with patch.object(google_books_api, "title_index", TitleIndex()):
+            books = self.api.search_book_by_name("Clean Code")
+            google_books_api.search_cache.clear()
+            self.session.get.reset_mock()
+            self.assertEqual(self.api.search_book_by_name("CLEAN CODE!")[0]["isbn"], books[0]["isbn"])
+            self.session.get.assert_not_called()
+
+            # Only a side result of that search, so Google is asked
+            self.api.search_book_by_name(books[1]["title"])
+            self.session.get.assert_called_once()
+
+    def testSuggestEndpoint(self):
+        from flask_server import app
+        with patch.object(title_index, "index", TitleIndex()):
+            title_index.index.add(info("Clean Architecture", "9780134494166"))
+            client = app.test_client()
+            body = client.get("/api/suggest?q=clean%20arch").get_json()
+            self.assertEqual(body["suggestions"][0]["isbn"], "9780134494166")
+            self.assertEqual(client.get("/api/suggest?q=").get_json()["suggestions"], [])
+            self.assertEqual(client.get("/api/suggest?q=x&limit=lots").status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
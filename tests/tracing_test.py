@@ -0,0 +1,125 @@
+import unittest
+import sys
+import os
+import threading
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import tracing
+import metrics
+
+
+def names(span_dict):
+    return [c["name"] for c in span_dict["children"]]
+
+
+class TracingTest(unittest.TestCase):
+
+    def testSpansNestUnderTheirParent(self):
+        with tracing.start_trace("search", query="x") as trace:
+            with tracing.span("google_books"):
+                pass
+            with tracing.span("rank", offers=2):
+                tracing.event("note")
+        tree = trace.to_dict()
+        self.assertTrue(tree["complete"])
+        self.assertEqual(tree["root"]["tags"], {"query": "x"})
+        self.assertEqual(names(tree["root"]), ["google_books", "rank"])
+        self.assertEqual(names(tree["root"]["children"][1]), ["note"])
+        self.assertGreaterEqual(tree["root"]["duration_ms"], 0)
+
+    def testErrorIsRecordedOnSpan(self):
+        with tracing.start_trace("search") as trace:
+            with self.assertRaises(ValueError):
+                with tracing.span("fetch"):
+                    raise ValueError("refused")
+        self.assertEqual(trace.to_dict()["root"]["children"][0]["error"], "ValueError: refused")
+
+    def testSpanOutsideTraceIsNoop(self):
+        with tracing.span("fetch") as span:
+            self.assertIsNone(span)
+
+    def testPropagateCarriesTraceToThread(self):
+        with tracing.start_trace("search") as trace:
+            def work():
+                with tracing.span("retailer"):
+                    pass
+            thread = threading.Thread(target=tracing.propagate(work))
+            thread.start()
+            thread.join()
+        self.assertEqual(names(trace.to_dict()["root"]), ["retailer"])
+
+    def testResumeAddsToEarlierTrace(self):
+        with tracing.start_trace("search") as trace:
+            pass
+        with tracing.resume(trace.trace_id, "recommendations"):
+            with tracing.span("ai"):
+                pass
+        self.assertEqual(names(trace.to_dict()["root"]), ["recommendations"])
+        with tracing.resume("missing", "recommendations") as span:
+            self.assertIsNone(span)
+
+    def testOldTracesAreForgotten(self):
+        with patch.object(tracing, "TRACE_LIMIT", 2):
+            ids = []
+            for _ in range(3):
+                with tracing.start_trace("search") as trace:
+                    ids.append(trace.trace_id)
+        self.assertIsNone(tracing.get_trace(ids[0]))
+        self.assertIsNotNone(tracing.get_trace(ids[2]))
+
+    def testRetailerCallShowsFetchAndParse(self):
+        with tracing.start_trace("search") as trace:
+            with metrics.retailer_call("example.com") as call:
+                with metrics.timed("fetch"):
+                    pass
+                call.outcome = "found"
+        retailer = trace.to_dict()["root"]["children"][0]
+        self.assertEqual(retailer["tags"], {"retailer": "example.com", "outcome": "found"})
+        self.assertEqual(names(retailer), ["fetch", "parse"])
+
+
+class SearchTraceTest(unittest.TestCase):
+
+    def setUp(self):
+        from flask_server import app, socketio
+        import book_finder
+        from bookfinder_test import make_parser, make_registry
+        self.app, self.socketio, self.book_finder = app, socketio, book_finder
+        book_finder.price_cache.clear()
+        self.parsers = make_registry(make_parser("traced_parser", price=20.0), make_parser("traced_missing"))
+
+    def search(self):
+        client = self.socketio.test_client(self.app)
+        with patch.object(self.book_finder, "registry", self.parsers):
+            client.emit("Go_button_pushed", {"search": "9780134685991"})
+        received = client.get_received()
+        client.disconnect()
+        return next(e["args"][0] for e in received if e["name"] == "search_results")
+
+    def testTraceIsRetrievableBySearchId(self):
+        results = self.search()
+        self.assertNotIn("trace", results)
+
+        response = self.app.test_client().get(f"/api/trace/{results['search_id']}")
+        self.assertEqual(response.status_code, 200)
+        root = response.get_json()["root"]
+        self.assertEqual(names(root), ["search"])
+        stages = root["children"][0]["children"]
+        retailers = sorted(s["tags"]["outcome"] for s in stages if s["name"] == "retailer")
+        self.assertEqual(retailers, ["found", "not_found"])
+        self.assertIn("rank", [s["name"] for s in stages])
+
+    def testDebugModeAttachesTrace(self):
+        with patch.dict(self.app.config, {"DEBUG": True}):
+            results = self.search()
+        self.assertEqual(results["trace"]["search_id"], results["search_id"])
+
+    def testUnknownSearchId(self):
+        self.assertEqual(self.app.test_client().get("/api/trace/nope").status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()